@@ -0,0 +1,43 @@
+import os
+
+# ── upstream services ──────────────────────────────────────────────────
+
+# Two face APIs: aeroface-rec (the Expo app's enrolment API, started by
+# start-backend.ps1 on :8000) and the face-service (galleries, frame
+# verification, presence)
+UPSTREAMS = {
+    "face_rec": os.getenv("AEROFACE_REC_URL", "http://localhost:8000"),
+    "face": os.getenv("FACE_SERVICE_URL", "http://localhost:8005"),
+    "verification": os.getenv("VERIFICATION_SERVICE_URL", "http://localhost:8001"),
+    "booking": os.getenv("BOOKING_SERVICE_URL", "http://localhost:8002"),
+    "crm": os.getenv("CRM_SERVICE_URL", "http://localhost:8003"),
+    "auth": os.getenv("AUTH_SERVICE_URL", "http://localhost:8004"),
+}
+
+# Keep-alive connections per upstream; beyond POOL_MAX requests queue for
+# a connection instead of opening more sockets against the service
+POOL_MAX = int(os.getenv("GATEWAY_POOL_MAX", "32"))
+POOL_KEEPALIVE = int(os.getenv("GATEWAY_POOL_KEEPALIVE", "16"))
+KEEPALIVE_EXPIRY = float(os.getenv("GATEWAY_KEEPALIVE_EXPIRY", "30"))
+CONNECT_TIMEOUT = float(os.getenv("GATEWAY_CONNECT_TIMEOUT", "3"))
+UPSTREAM_TIMEOUT = float(os.getenv("GATEWAY_UPSTREAM_TIMEOUT", "30"))
+MAX_BODY = int(os.getenv("GATEWAY_MAX_BODY", str(16 * 1024 * 1024)))
+
+# ── response cache (seconds; 0 disables) ───────────────────────────────
+
+CACHE_MAX_ENTRIES = int(os.getenv("GATEWAY_CACHE_MAX_ENTRIES", "10000"))
+CACHE_TTL_STATUS = float(os.getenv("GATEWAY_CACHE_TTL_STATUS", "5"))
+CACHE_TTL_PRESENCE = float(os.getenv("GATEWAY_CACHE_TTL_PRESENCE", "2"))
+CACHE_TTL_LOUNGES = float(os.getenv("GATEWAY_CACHE_TTL_LOUNGES", "30"))
+CACHE_TTL_HEALTH = float(os.getenv("GATEWAY_CACHE_TTL_HEALTH", "2"))
+
+# ── rate limits (requests/second and burst; 0 disables) ────────────────
+
+RATE_CLIENT = float(os.getenv("GATEWAY_RATE_CLIENT", "10"))
+BURST_CLIENT = float(os.getenv("GATEWAY_BURST_CLIENT", "20"))
+RATE_LOUNGE = float(os.getenv("GATEWAY_RATE_LOUNGE", "50"))
+BURST_LOUNGE = float(os.getenv("GATEWAY_BURST_LOUNGE", "100"))
+RATE_MAX_KEYS = int(os.getenv("GATEWAY_RATE_MAX_KEYS", "50000"))
+# Clients are told apart by address. Set behind a trusted load balancer
+# so that is their real address rather than the balancer's
+TRUST_FORWARDED_FOR = os.getenv("GATEWAY_TRUST_FORWARDED_FOR", "false").lower() == "true"
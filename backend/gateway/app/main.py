@@ -0,0 +1,23 @@
+from fastapi import FastAPI
+
+from app import proxy
+from app.middleware import rate_limit
+from app.middleware.rate_limit import RateLimitMiddleware
+from app.routes import auth_routes, booking_routes, crm_routes, face_routes, verification_routes
+
+app = FastAPI(title="AeroFace Gateway")
+app.add_middleware(RateLimitMiddleware)
+
+for module in (face_routes, verification_routes, booking_routes, crm_routes, auth_routes):
+    app.include_router(module.router)
+
+
+@app.get("/gateway/health")
+def gateway_health():
+    # /health itself is the face service's, which existing clients poll
+    return {"status": "ok", **proxy.stats(), "rate_limit": rate_limit.stats()}
+
+
+@app.on_event("shutdown")
+async def close_upstreams():
+    await proxy.close_upstreams()
@@ -0,0 +1,142 @@
+"""
+In-process token-bucket rate limiting per client and per lounge.
+
+A client is its address (the first X-Forwarded-For hop when
+GATEWAY_TRUST_FORWARDED_FOR is set). The gateway does not validate
+bearer tokens, so they are not used as keys: a client could mint a new
+one per request and never run out of tokens.
+
+Kiosks name their lounge in ?lounge_id=, the X-Lounge-Id header or the
+/presence/{lounge_id} path; those requests also draw from the lounge's
+bucket, so one lounge's kiosks cannot starve the others. Over-limit
+requests get 429 with Retry-After before reaching any upstream.
+"""
+import math
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs
+
+from app import config
+from app.utils.response_formatter import error_response
+
+EXEMPT_PATHS = {"/health", "/gateway/health"}
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens, updated):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class RateLimiter:
+    """
+    `rate` tokens per second up to `burst`, one bucket per key. The least
+    recently used buckets are dropped past `max_keys`; a dropped key just
+    starts again with a full bucket.
+    """
+
+    def __init__(self, rate, burst, max_keys=50000):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self.limited = 0
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def acquire(self, key, now=None):
+        """0.0 if a token was taken, else seconds until one is available."""
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.burst, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+        if bucket.tokens >= 1.0:
+            bucket.tokens -= 1.0
+            return 0.0
+        self.limited += 1
+        return (1.0 - bucket.tokens) / self.rate
+
+    def refund(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.tokens = min(self.burst, bucket.tokens + 1.0)
+
+    def stats(self):
+        return {"rate": self.rate, "burst": self.burst, "keys": len(self._buckets), "limited": self.limited}
+
+
+client_limiter = RateLimiter(config.RATE_CLIENT, config.BURST_CLIENT, config.RATE_MAX_KEYS)
+lounge_limiter = RateLimiter(config.RATE_LOUNGE, config.BURST_LOUNGE, config.RATE_MAX_KEYS)
+
+
+def _header(scope, name):
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def client_key(scope):
+    if config.TRUST_FORWARDED_FOR:
+        forwarded = _header(scope, b"x-forwarded-for")
+        if forwarded:
+            return "addr:" + forwarded.split(",")[0].strip()
+    client = scope.get("client")
+    return "addr:" + (client[0] if client else "unknown")
+
+
+def lounge_key(scope):
+    query = scope.get("query_string", b"")
+    if b"lounge_id=" in query:
+        values = parse_qs(query.decode("latin-1")).get("lounge_id")
+        if values and values[0]:
+            return values[0]
+    lounge = _header(scope, b"x-lounge-id")
+    if lounge:
+        return lounge
+    path = scope["path"]
+    if path.startswith("/presence/"):
+        return path[len("/presence/"):].split("/", 1)[0] or None
+    return None
+
+
+class RateLimitMiddleware:
+    """ASGI middleware; cheaper than BaseHTTPMiddleware on the hot path."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        wait = 0.0
+        client = client_key(scope) if client_limiter.enabled else None
+        if client is not None:
+            wait = client_limiter.acquire(client)
+        lounge = lounge_key(scope) if not wait and lounge_limiter.enabled else None
+        if lounge is not None:
+            wait = lounge_limiter.acquire(lounge)
+            if wait and client is not None:
+                client_limiter.refund(client)  # the request never ran
+
+        if wait:
+            response = error_response(429, "Too many requests", retry_after=max(1, math.ceil(wait)))
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+def stats():
+    return {"client": client_limiter.stats(), "lounge": lounge_limiter.stats()}
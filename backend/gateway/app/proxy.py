@@ -0,0 +1,260 @@
+"""
+Reverse proxy core: one keep-alive connection pool per upstream service,
+coalescing of identical in-flight GETs and a TTL cache for cacheable reads.
+
+Everything here runs on the gateway's event loop, so the cache and the
+in-flight table need no locks.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+import httpx
+from fastapi import Request, Response
+
+from app import config
+from app.utils.response_formatter import error_response
+
+# Per-connection headers (RFC 9110 §7.6.1) plus the ones httpx recomputes
+HOP_BY_HOP = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te",
+    "trailer", "transfer-encoding", "upgrade", "host", "content-length",
+}
+# httpx hands back decompressed bodies
+RESPONSE_SKIP = HOP_BY_HOP | {"content-encoding"}
+
+logger = logging.getLogger("gateway.proxy")
+
+
+class Upstream:
+    """A service behind the gateway and its pooled HTTP/1.1 client."""
+
+    def __init__(self, name, base_url):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            limits=httpx.Limits(
+                max_connections=config.POOL_MAX,
+                max_keepalive_connections=config.POOL_KEEPALIVE,
+                keepalive_expiry=config.KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(config.UPSTREAM_TIMEOUT, connect=config.CONNECT_TIMEOUT),
+        )
+        self.requests = 0
+        self.errors = 0
+
+    async def send(self, method, path, query, headers, body):
+        self.requests += 1
+        try:
+            response = await self.client.request(
+                method, path, params=query or None, headers=headers, content=body or None,
+            )
+        except httpx.HTTPError:
+            self.errors += 1
+            raise
+        headers = [(k, v) for k, v in response.headers.multi_items() if k.lower() not in RESPONSE_SKIP]
+        return Cached(response.status_code, headers, response.content, 0.0)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class Cached(NamedTuple):
+    status: int
+    headers: list  # [(name, value)]
+    body: bytes
+    expires: float
+
+
+class ResponseCache:
+    """
+    TTL + LRU cache of upstream responses. Keys start with the upstream
+    name and path so writes can drop what they make stale.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry.expires < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry, ttl):
+        self._entries[key] = entry._replace(expires=time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, upstream, path_prefix):
+        stale = [k for k in self._entries if k[0] == upstream and k[1].startswith(path_prefix)]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+class Coalescer:
+    """
+    Identical GETs that arrive while one is already in flight wait for
+    that request's response instead of sending their own.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self.coalesced = 0
+
+    async def run(self, key, fetch):
+        """fetch()'s result, and whether it was shared with an earlier caller."""
+        task = self._inflight.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fetch())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # A waiter that disconnects must not cancel the shared request
+        return await asyncio.shield(task), shared
+
+    def stats(self):
+        return {"inflight": len(self._inflight), "coalesced": self.coalesced}
+
+
+upstreams = {name: Upstream(name, url) for name, url in config.UPSTREAMS.items()}
+cache = ResponseCache(config.CACHE_MAX_ENTRIES)
+coalescer = Coalescer()
+
+
+async def close_upstreams():
+    await asyncio.gather(*(u.close() for u in upstreams.values()))
+
+
+def _request_headers(request):
+    # X-Forwarded-For is rebuilt below, not copied: sent twice, the
+    # upstream would see the client's hops twice
+    headers = [
+        (k, v) for k, v in request.headers.items()
+        if k.lower() not in HOP_BY_HOP and k.lower() != "x-forwarded-for"
+    ]
+    client = request.client.host if request.client else ""
+    forwarded = request.headers.get("x-forwarded-for")
+    headers.append(("x-forwarded-for", f"{forwarded}, {client}" if forwarded else client))
+    return headers
+
+
+def _cache_key(upstream, path, request):
+    # Different credentials may see different data; never share across them
+    auth = request.headers.get("authorization", "")
+    return (
+        upstream,
+        path,
+        request.url.query,
+        hashlib.sha1(auth.encode()).hexdigest() if auth else "",
+    )
+
+
+def _cacheable(entry):
+    if entry.status != 200:
+        return False
+    for name, value in entry.headers:
+        if name.lower() == "cache-control" and ("no-store" in value or "private" in value):
+            return False
+    return True
+
+
+def _response(entry, cache_state):
+    response = Response(content=entry.body, status_code=entry.status)
+    for name, value in entry.headers:
+        response.headers.append(name, value)
+    response.headers["x-cache"] = cache_state
+    return response
+
+
+async def proxy(request: Request, upstream_name, cache_ttl=0.0, invalidate=(), path=None):
+    """
+    Forward `request` to `path` (default: the same path) on `upstream_name`.
+
+    GETs are coalesced and, with cache_ttl > 0, served from cache for that
+    many seconds. `invalidate` lists path prefixes on the same upstream to
+    drop from the cache once a write succeeds.
+    """
+    upstream = upstreams[upstream_name]
+    method = request.method
+    path = path or request.url.path
+    query = list(request.query_params.multi_items())
+
+    if method == "GET":
+        key = _cache_key(upstream_name, path, request)
+        if cache_ttl > 0:
+            entry = cache.get(key)
+            if entry is not None:
+                return _response(entry, "HIT")
+
+        headers = _request_headers(request)
+
+        async def fetch():
+            entry = await upstream.send(method, path, query, headers, None)
+            if cache_ttl > 0 and _cacheable(entry):
+                cache.put(key, entry, cache_ttl)
+            return entry
+
+        try:
+            entry, shared = await coalescer.run(key, fetch)
+        except httpx.HTTPError as exc:
+            return _upstream_error(upstream_name, exc)
+        return _response(entry, "COALESCED" if shared else "MISS")
+
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > config.MAX_BODY:
+        return error_response(413, "Request body too large")
+    body = await request.body()
+    if len(body) > config.MAX_BODY:
+        return error_response(413, "Request body too large")
+    try:
+        entry = await upstream.send(method, path, query, _request_headers(request), body)
+    except httpx.HTTPError as exc:
+        return _upstream_error(upstream_name, exc)
+    if entry.status < 400:
+        for prefix in invalidate:
+            cache.invalidate(upstream_name, prefix)
+    return _response(entry, "BYPASS")
+
+
+def _upstream_error(name, exc):
+    if isinstance(exc, httpx.TimeoutException):
+        return error_response(504, f"{name} service timed out")
+    logger.warning("%s upstream error: %r", name, exc)
+    return error_response(502, f"{name} service unavailable", retry_after=1)
+
+
+def stats():
+    return {
+        "cache": cache.stats(),
+        "coalescer": coalescer.stats(),
+        "upstreams": {
+            name: {"url": u.base_url, "requests": u.requests, "errors": u.errors}
+            for name, u in upstreams.items()
+        },
+    }
@@ -0,0 +1,9 @@
+from fastapi import APIRouter, Request
+from app.proxy import proxy
+
+router = APIRouter()
+
+
+@router.api_route("/auth{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+async def auth(path: str, request: Request):
+    return await proxy(request, "auth")
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Request
+from app import config
+from app.proxy import proxy
+
+router = APIRouter()
+
+METHODS = ["GET", "POST", "PUT", "PATCH", "DELETE"]
+
+
+@router.get("/lounges")
+async def lounges(request: Request):
+    return await proxy(request, "booking", cache_ttl=config.CACHE_TTL_LOUNGES)
+
+
+@router.get("/lounges/{lounge_id}")
+async def lounge(lounge_id: str, request: Request):
+    return await proxy(request, "booking", cache_ttl=config.CACHE_TTL_LOUNGES)
+
+
+@router.api_route("/lounges{path:path}", methods=METHODS[1:])
+async def lounge_writes(path: str, request: Request):
+    return await proxy(request, "booking", invalidate=("/lounges",))
+
+
+@router.api_route("/bookings{path:path}", methods=METHODS)
+async def bookings(path: str, request: Request):
+    return await proxy(request, "booking")
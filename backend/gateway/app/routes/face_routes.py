@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Request
+from app import config
+from app.proxy import proxy
+
+router = APIRouter()
+
+# Enrolment changes what /status and /embedding return for that user
+ENROLMENT_READS = ("/status/", "/embedding/")
+
+
+# ── aeroface-rec ───────────────────────────────────────────────────────
+# The Expo app's enrolment API (faceApi.ts) and the kiosks' original
+# /verify and /health
+
+
+@router.post("/register")
+async def register_legacy(request: Request):
+    return await proxy(request, "face_rec", invalidate=ENROLMENT_READS)
+
+
+@router.get("/status/{user_id}")
+async def status(user_id: str, request: Request):
+    # Polled by the app while enrolment is pending
+    return await proxy(request, "face_rec", cache_ttl=config.CACHE_TTL_STATUS)
+
+
+@router.get("/embedding/{user_id}")
+async def embedding(user_id: str, request: Request):
+    return await proxy(request, "face_rec")
+
+
+@router.post("/verify")
+async def verify(request: Request):
+    return await proxy(request, "face_rec")
+
+
+@router.get("/health")
+async def face_health(request: Request):
+    # Kiosks and the lounge web app poll this as "is the face API up"
+    return await proxy(request, "face_rec", cache_ttl=config.CACHE_TTL_HEALTH)
+
+
+# ── face-service ───────────────────────────────────────────────────────
+
+
+@router.post("/face/register")
+async def register_face(request: Request):
+    return await proxy(request, "face")
+
+
+@router.post("/verify/frame")
+async def verify_frame(request: Request):
+    return await proxy(request, "face")
+
+
+@router.get("/presence")
+async def presence_all(request: Request):
+    return await proxy(request, "face", cache_ttl=config.CACHE_TTL_PRESENCE)
+
+
+@router.get("/presence/{lounge_id}")
+async def presence(lounge_id: str, request: Request):
+    return await proxy(request, "face", cache_ttl=config.CACHE_TTL_PRESENCE)
+
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Request
+from app.proxy import proxy
+
+router = APIRouter()
+
+
+@router.post("/boarding-pass/scan")
+async def scan(request: Request):
+    return await proxy(request, "verification")
+
+
+@router.post("/boarding-pass/scan/batch")
+async def scan_batch(request: Request):
+    return await proxy(request, "verification")
+
+
+@router.post("/boarding-pass/parse")
+async def parse(request: Request):
+    return await proxy(request, "verification")
@@ -0,0 +1,7 @@
+from fastapi.responses import JSONResponse
+
+
+def error_response(status_code, detail, retry_after=None):
+    """Errors raised by the gateway itself, shaped like FastAPI's {"detail": ...}."""
+    headers = {"Retry-After": str(retry_after)} if retry_after is not None else None
+    return JSONResponse(status_code=status_code, content={"detail": detail}, headers=headers)
@@ -0,0 +1,147 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app import config, proxy
+from app.main import app
+from app.middleware import rate_limit
+from app.middleware.rate_limit import RateLimiter
+
+
+class Upstream:
+    """Stands in for a service: records requests, answers from `reply`."""
+
+    def __init__(self):
+        self.requests = []
+        self.release = None  # an asyncio.Event that holds every request
+        self.reply = lambda request: httpx.Response(200, json={"n": len(self.requests)})
+
+    async def __call__(self, request):
+        self.requests.append(request)
+        if self.release is not None:
+            await self.release.wait()
+        return self.reply(request)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    fake = Upstream()
+    monkeypatch.setattr(proxy, "cache", proxy.ResponseCache())
+    monkeypatch.setattr(proxy, "coalescer", proxy.Coalescer())
+    monkeypatch.setattr(rate_limit, "client_limiter", RateLimiter(rate=0, burst=1))
+    monkeypatch.setattr(rate_limit, "lounge_limiter", RateLimiter(rate=0, burst=1))
+    for name, target in proxy.upstreams.items():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(fake), base_url=target.base_url)
+        monkeypatch.setattr(target, "client", client)
+    return fake
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = Clock()
+    # Only the cache's clock: the event loop keeps the real one
+    monkeypatch.setattr(proxy, "time", SimpleNamespace(monotonic=fake.monotonic))
+    return fake
+
+
+def call(*requests):
+    """Send (method, path, kwargs) requests to the gateway concurrently."""
+    async def go():
+        transport = httpx.ASGITransport(app=app, client=("198.51.100.7", 4000))
+        async with httpx.AsyncClient(transport=transport, base_url="http://gw") as client:
+            return await asyncio.gather(*(client.request(m, p, **kw) for m, p, kw in requests))
+    return asyncio.run(go())
+
+
+def test_identical_gets_in_flight_share_one_upstream_request(upstream, monkeypatch):
+    monkeypatch.setattr(config, "CACHE_TTL_PRESENCE", 0)
+
+    async def go():
+        upstream.release = asyncio.Event()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://gw") as client:
+            pending = asyncio.gather(*(client.get("/presence") for _ in range(3)))
+            while not upstream.requests:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.05)  # let the others reach the coalescer
+            upstream.release.set()
+            return await pending
+    responses = asyncio.run(go())
+
+    assert len(upstream.requests) == 1
+    assert sorted(r.headers["x-cache"] for r in responses) == ["COALESCED", "COALESCED", "MISS"]
+    assert all(r.json() == {"n": 1} for r in responses)
+
+
+def test_cached_get_expires_after_its_ttl(upstream, clock, monkeypatch):
+    monkeypatch.setattr(config, "CACHE_TTL_STATUS", 5)
+
+    first, = call(("GET", "/status/u1", {}))
+    clock.now += 4
+    second, = call(("GET", "/status/u1", {}))
+    clock.now += 2
+    third, = call(("GET", "/status/u1", {}))
+
+    assert [r.headers["x-cache"] for r in (first, second, third)] == ["MISS", "HIT", "MISS"]
+    assert len(upstream.requests) == 2
+
+
+def test_successful_write_invalidates_the_reads_it_changes(upstream, monkeypatch):
+    monkeypatch.setattr(config, "CACHE_TTL_STATUS", 60)
+    call(("GET", "/status/u1", {}))
+    assert call(("GET", "/status/u1", {}))[0].headers["x-cache"] == "HIT"
+
+    upstream.reply = lambda request: httpx.Response(400, json={"detail": "bad"})
+    call(("POST", "/register", {"content": b"x"}))
+    assert call(("GET", "/status/u1", {}))[0].headers["x-cache"] == "HIT"  # failed write
+
+    upstream.reply = lambda request: httpx.Response(200, json={})
+    call(("POST", "/register", {"content": b"x"}))
+    assert call(("GET", "/status/u1", {}))[0].headers["x-cache"] == "MISS"
+
+
+def test_error_responses_are_not_cached(upstream, monkeypatch):
+    monkeypatch.setattr(config, "CACHE_TTL_STATUS", 60)
+    upstream.reply = lambda request: httpx.Response(503)
+
+    call(("GET", "/status/u1", {}))
+    call(("GET", "/status/u1", {}))
+
+    assert len(upstream.requests) == 2
+
+
+@pytest.mark.parametrize("exc, status, retry_after", [
+    (httpx.ReadTimeout("slow"), 504, None),
+    (httpx.ConnectError("refused"), 502, "1"),
+])
+def test_upstream_failures_map_to_gateway_errors(upstream, exc, status, retry_after):
+    def fail(request):
+        raise exc
+    upstream.reply = fail
+
+    get, post = call(("GET", "/presence", {}), ("POST", "/verify/frame", {"content": b"jpeg"}))
+
+    for response in (get, post):
+        assert response.status_code == status
+        assert response.headers.get("retry-after") == retry_after
+        assert "face service" in response.json()["detail"]
+
+
+def test_client_address_is_forwarded_to_the_service(upstream):
+    # face-service scopes its probe cache by the last hop (FACE_TRUSTED_PROXIES)
+    call(("POST", "/verify/frame", {"content": b"jpeg"}),
+         ("POST", "/verify/frame", {"content": b"jpeg", "headers": {"x-forwarded-for": "203.0.113.9"}}))
+
+    forwarded = sorted(r.headers["x-forwarded-for"] for r in upstream.requests)
+    assert forwarded == ["198.51.100.7", "203.0.113.9, 198.51.100.7"]
+    assert all(r.url.path == "/verify/frame" for r in upstream.requests)
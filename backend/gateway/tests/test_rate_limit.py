@@ -0,0 +1,112 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app import config
+from app.middleware import rate_limit
+from app.middleware.rate_limit import RateLimiter, RateLimitMiddleware, client_key, lounge_key
+
+
+def scope(path="/verify", query=b"", headers=(), client=("10.0.0.1", 5000)):
+    return {
+        "type": "http",
+        "path": path,
+        "query_string": query,
+        "headers": [(k.encode(), v.encode()) for k, v in headers],
+        "client": client,
+    }
+
+
+def test_burst_then_refill():
+    limiter = RateLimiter(rate=2, burst=3)
+
+    assert [limiter.acquire("k", now=0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire("k", now=0.0) == pytest.approx(0.5)
+    assert limiter.acquire("k", now=0.5) == 0.0
+    assert limiter.acquire("k", now=100.0) == 0.0  # refills to burst, not beyond
+    assert limiter.stats()["limited"] == 1
+
+
+def test_keys_have_separate_buckets_and_old_ones_are_dropped():
+    limiter = RateLimiter(rate=1, burst=1, max_keys=2)
+    limiter.acquire("a", now=0.0)
+    limiter.acquire("b", now=0.0)
+    limiter.acquire("c", now=0.0)
+
+    assert limiter.stats()["keys"] == 2
+    assert limiter.acquire("a", now=0.0) == 0.0  # evicted, starts full again
+    assert limiter.acquire("c", now=0.0) > 0
+
+
+def test_refund_returns_a_token():
+    limiter = RateLimiter(rate=1, burst=1)
+    limiter.acquire("k", now=0.0)
+    limiter.refund("k")
+
+    assert limiter.acquire("k", now=0.0) == 0.0
+
+
+def test_client_key_ignores_bearer_tokens(monkeypatch):
+    monkeypatch.setattr(config, "TRUST_FORWARDED_FOR", False)
+
+    first = client_key(scope(headers=[("authorization", "Bearer one")]))
+    second = client_key(scope(headers=[("authorization", "Bearer two")]))
+
+    assert first == second == "addr:10.0.0.1"
+
+
+def test_forwarded_for_only_when_trusted(monkeypatch):
+    request = scope(headers=[("x-forwarded-for", "203.0.113.9, 10.0.0.1")])
+
+    monkeypatch.setattr(config, "TRUST_FORWARDED_FOR", False)
+    assert client_key(request) == "addr:10.0.0.1"
+    monkeypatch.setattr(config, "TRUST_FORWARDED_FOR", True)
+    assert client_key(request) == "addr:203.0.113.9"
+
+
+@pytest.mark.parametrize("request_scope, expected", [
+    (scope(query=b"lounge_id=L1&x=1"), "L1"),
+    (scope(headers=[("x-lounge-id", "L2")]), "L2"),
+    (scope(path="/presence/L3/occupants"), "L3"),
+    (scope(query=b"lounge_id="), None),
+    (scope(), None),
+])
+def test_lounge_key_sources(request_scope, expected):
+    assert lounge_key(request_scope) == expected
+
+
+async def ok(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def run(requests):
+    async def go():
+        transport = httpx.ASGITransport(app=RateLimitMiddleware(ok))
+        async with httpx.AsyncClient(transport=transport, base_url="http://gw") as client:
+            return [await client.get(path, params=params) for path, params in requests]
+    return asyncio.run(go())
+
+
+def test_middleware_answers_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(rate_limit, "client_limiter", RateLimiter(rate=0.5, burst=1))
+    monkeypatch.setattr(rate_limit, "lounge_limiter", RateLimiter(rate=0, burst=1))
+
+    first, second, health = run([("/verify", None), ("/verify", None), ("/health", None)])
+
+    assert first.status_code == 200
+    assert second.status_code == 429
+    assert second.headers["retry-after"] == "2"
+    assert health.status_code == 200
+
+
+def test_lounge_limit_refunds_the_client_token(monkeypatch):
+    clients = RateLimiter(rate=1, burst=5)
+    monkeypatch.setattr(rate_limit, "client_limiter", clients)
+    monkeypatch.setattr(rate_limit, "lounge_limiter", RateLimiter(rate=1, burst=1))
+
+    responses = run([("/verify", {"lounge_id": "L1"})] * 3)
+
+    assert [r.status_code for r in responses] == [200, 429, 429]
+    assert clients._buckets["addr:127.0.0.1"].tokens == pytest.approx(4, abs=0.1)
@@ -0,0 +1,27 @@
+from datetime import datetime
+from uuid import UUID
+
+from fastapi import APIRouter, HTTPException
+
+from app.application.crm_usecases import overview, run_rollups, series
+from app.schemas.analytics_schema import OverviewResponse, SeriesResponse
+
+router = APIRouter(prefix="/crm")
+
+
+@router.get("/lounges/{lounge_id}/overview", response_model=OverviewResponse)
+def lounge_overview(lounge_id: UUID):
+    return overview(str(lounge_id))
+
+
+@router.get("/lounges/{lounge_id}/series", response_model=SeriesResponse)
+def lounge_series(lounge_id: UUID, start: datetime, end: datetime, granularity: str = "day"):
+    try:
+        return series(str(lounge_id), start, end, granularity)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.post("/rollups/run")
+def rollups_run():
+    return run_rollups()
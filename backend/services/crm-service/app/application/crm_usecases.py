@@ -0,0 +1,136 @@
+import os
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+from psycopg2.pool import ThreadedConnectionPool
+
+from app.application.rollup_engine import RollupEngine
+from app.domain.analytics import Bucket, merge_buckets
+from app.infrastructure.analytics_repository import (
+    connect,
+    fetch_cursors,
+    fetch_daily,
+    fetch_hourly,
+    fetch_totals,
+)
+
+load_dotenv()
+
+# The engine folds new events every ROLLUP_INTERVAL seconds, at most
+# ROLLUP_CHUNK per transaction, and leaves the last ROLLUP_LAG seconds for
+# the next run so it does not queue behind in-flight writers
+ROLLUP_ENABLED = os.getenv("CRM_ROLLUP_ENABLED", "true").lower() == "true"
+ROLLUP_INTERVAL = float(os.getenv("CRM_ROLLUP_INTERVAL", "30"))
+ROLLUP_CHUNK = int(os.getenv("CRM_ROLLUP_CHUNK", "5000"))
+ROLLUP_LAG = float(os.getenv("CRM_ROLLUP_LAG", "120"))
+DB_POOL_MAX = int(os.getenv("CRM_DB_POOL_MAX", "4"))
+
+# Widest range each series granularity will serve in one request
+MAX_SERIES_SPAN = {"hour": timedelta(days=31), "day": timedelta(days=3 * 366)}
+
+rollup_engine = RollupEngine(connect, interval=ROLLUP_INTERVAL, chunk=ROLLUP_CHUNK, lag=ROLLUP_LAG)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+@contextmanager
+def _connection():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(1, DB_POOL_MAX, os.environ["DATABASE_URL"],
+                                               application_name="crm-service")
+    conn = _pool.getconn()
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+        _pool.putconn(conn, close=conn.closed != 0)
+
+
+def close_pool():
+    global _pool
+    if _pool is not None:
+        _pool.closeall()
+        _pool = None
+
+
+# ── dashboard ──────────────────────────────────────────────────────────
+# Everything below reads the rollup tables only; how much attendance
+# history a lounge has does not change the cost of a dashboard load.
+
+
+def overview(lounge_id, now=None):
+    """Today, the last 7 days, month to date and all time for one lounge."""
+    now = now or datetime.utcnow()
+    today = now.date()
+    tomorrow = today + timedelta(days=1)
+    week_start = today - timedelta(days=6)
+    month_start = today.replace(day=1)
+    with _connection() as conn:
+        hours = [Bucket.from_row(r) for r in fetch_hourly(conn, lounge_id, datetime.combine(today, datetime.min.time()),
+                                                          datetime.combine(tomorrow, datetime.min.time()))]
+        days = fetch_daily(conn, lounge_id, min(week_start, month_start), tomorrow)
+        totals = fetch_totals(conn, lounge_id)
+        cursors = fetch_cursors(conn)
+    return {
+        "lounge_id": lounge_id,
+        "today": merge_buckets(hours).to_dict(),
+        "last_7_days": merge_buckets(Bucket.from_row(r) for r in days if r["day"] >= week_start).to_dict(),
+        "month_to_date": merge_buckets(Bucket.from_row(r) for r in days if r["day"] >= month_start).to_dict(),
+        "all_time": (Bucket.from_row(totals) if totals else Bucket()).to_dict(),
+        "as_of": _as_of(cursors),
+    }
+
+
+def series(lounge_id, start, end, granularity="day"):
+    """
+    One point per hour or day in [start, end), empty buckets included so
+    charts need no gap filling. Raises ValueError for unusable ranges.
+    """
+    if granularity not in MAX_SERIES_SPAN:
+        raise ValueError("granularity must be 'hour' or 'day'")
+    if granularity == "day":
+        start = start if isinstance(start, date) and not isinstance(start, datetime) else start.date()
+        end = end if isinstance(end, date) and not isinstance(end, datetime) else end.date()
+        step, key = timedelta(days=1), "day"
+    else:
+        start = _as_datetime(start).replace(minute=0, second=0, microsecond=0)
+        end = _as_datetime(end)
+        step, key = timedelta(hours=1), "bucket_start"
+    if end <= start:
+        raise ValueError("end must be after start")
+    if end - start > MAX_SERIES_SPAN[granularity]:
+        raise ValueError(f"range too wide for {granularity} granularity")
+
+    with _connection() as conn:
+        fetch = fetch_daily if granularity == "day" else fetch_hourly
+        rows = {r[key]: Bucket.from_row(r) for r in fetch(conn, lounge_id, start, end)}
+        cursors = fetch_cursors(conn)
+
+    points = []
+    at = start
+    while at < end:
+        points.append({"start": at.isoformat(), **rows.get(at, Bucket()).to_dict()})
+        at += step
+    return {"lounge_id": lounge_id, "granularity": granularity, "points": points, "as_of": _as_of(cursors)}
+
+
+def run_rollups():
+    """Fold pending events now instead of waiting for the next tick."""
+    return {"run": rollup_engine.run_once(), **rollup_engine.stats()}
+
+
+def _as_datetime(value):
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+    return datetime.combine(value, datetime.min.time())
+
+
+def _as_of(cursors):
+    """How far each stream has been folded; newer events are not shown yet."""
+    return {stream: c["last_ts"].isoformat() if c["last_ts"] else None for stream, c in cursors.items()}
@@ -0,0 +1,183 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from app.domain.analytics import Bucket, HyperLogLog
+from app.infrastructure.analytics_repository import (
+    add_buckets,
+    database_now,
+    fetch_checkins,
+    fetch_checkouts,
+    fetch_members,
+    fetch_transactions,
+    lock_cursor,
+    save_cursor,
+)
+
+HOURLY, DAILY, TOTALS = "lounge_rollups_hourly", "lounge_rollups_daily", "lounge_rollup_totals"
+
+
+def _hour(ts):
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+class RollupEngine:
+    """
+    Folds new attendance and payment events into the migration 017
+    buckets (hourly, daily and all-time per lounge).
+
+    Three streams are read in keyset order behind their own cursor:
+    check-ins (visits, member sketches), check-outs (dwell time, filed
+    under the check-in hour) and lounge_transactions (completed revenue,
+    filed under transaction_date). Each chunk's bucket deltas and the
+    advanced cursor commit together, so a crash never double counts.
+    Events newer than `lag` seconds are left for the next run, so the
+    engine rarely waits on writers still inside their transaction. Rows
+    that land behind the cursor anyway (late commits, backfills), and
+    edits and deletes of events already folded, are applied by the
+    migration's triggers, not here.
+    """
+
+    def __init__(self, connect, interval=30.0, chunk=5000, lag=120.0):
+        self._connect = connect
+        self.interval = interval
+        self.chunk = chunk
+        self.lag = timedelta(seconds=lag)
+        self.folded = {"attendance_checkin": 0, "attendance_checkout": 0, "transactions": 0}
+        self.last_run = None
+        self.last_error = None
+        self._conn = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _connection(self):
+        if self._conn is None or self._conn.closed:
+            self._conn = self._connect()
+        return self._conn
+
+    # ── per-stream folds ───────────────────────────────────────────────
+
+    def _fold(self, conn, stream, fetch, until, collect):
+        """One chunk of `stream`. Returns the number of events read."""
+        last_ts, last_id = lock_cursor(conn, stream)
+        rows = fetch(conn, last_ts, last_id, until, self.chunk)
+        if not rows:
+            conn.rollback()
+            return 0
+        hourly, daily, totals = defaultdict(Bucket), defaultdict(Bucket), defaultdict(Bucket)
+        cursor_ts, cursor_id = collect(rows, hourly, daily, totals)
+        for table, buckets in ((HOURLY, hourly), (DAILY, daily), (TOTALS, totals)):
+            self._merge_members(conn, table, buckets)
+            add_buckets(conn, table, buckets)
+        save_cursor(conn, stream, cursor_ts, cursor_id)
+        conn.commit()
+        self.folded[stream] += len(rows)
+        return len(rows)
+
+    @staticmethod
+    def _merge_members(conn, table, buckets):
+        keys = [key for key, bucket in buckets.items() if bucket.members is not None]
+        for key, stored in fetch_members(conn, table, keys).items():
+            if stored:
+                buckets[key].members.update(HyperLogLog.from_bytes(stored))
+
+    @staticmethod
+    def _checkins(rows, hourly, daily, totals):
+        for _, lounge_id, user_id, checkin_time in rows:
+            if lounge_id is None:
+                continue  # sessions logged before migration 014
+            for bucket in (hourly[(lounge_id, _hour(checkin_time))],
+                           daily[(lounge_id, checkin_time.date())], totals[(lounge_id,)]):
+                bucket.add_visit(user_id)
+        return rows[-1][3], rows[-1][0]
+
+    @staticmethod
+    def _checkouts(rows, hourly, daily, totals):
+        for _, lounge_id, checkin_time, checkout_time in rows:
+            if lounge_id is None:
+                continue
+            seconds = (checkout_time - checkin_time).total_seconds()
+            for bucket in (hourly[(lounge_id, _hour(checkin_time))],
+                           daily[(lounge_id, checkin_time.date())], totals[(lounge_id,)]):
+                bucket.add_dwell(seconds)
+        return rows[-1][3], rows[-1][0]
+
+    @staticmethod
+    def _transactions(rows, hourly, daily, totals):
+        for _, lounge_id, amount, status, transaction_date, _ in rows:
+            if status != "completed" or transaction_date is None:
+                continue
+            for bucket in (hourly[(lounge_id, _hour(transaction_date))],
+                           daily[(lounge_id, transaction_date.date())], totals[(lounge_id,)]):
+                bucket.add_revenue(amount)
+        return rows[-1][5], rows[-1][0]
+
+    # ── driving ────────────────────────────────────────────────────────
+
+    def run_once(self):
+        """Fold everything up to now - lag. Returns events folded per stream."""
+        with self._lock:
+            conn = self._connection()
+            try:
+                now, local_now = database_now(conn)
+                conn.rollback()
+                streams = (
+                    ("attendance_checkin", fetch_checkins, local_now - self.lag, self._checkins),
+                    ("attendance_checkout", fetch_checkouts, local_now - self.lag, self._checkouts),
+                    ("transactions", fetch_transactions, now - self.lag, self._transactions),
+                )
+                counts = {}
+                for stream, fetch, until, collect in streams:
+                    counts[stream] = 0
+                    while True:
+                        read = self._fold(conn, stream, fetch, until, collect)
+                        counts[stream] += read
+                        if read < self.chunk:
+                            break
+            except Exception:
+                try:
+                    conn.close()
+                finally:
+                    self._conn = None
+                raise
+            self.last_run = time.time()
+            return counts
+
+    def _run(self):
+        while True:
+            try:
+                counts = self.run_once()
+                self.last_error = None
+                if any(counts.values()):
+                    print(f"[rollups] folded {counts}")
+            except Exception as exc:
+                self.last_error = str(exc)
+                print(f"[rollups] run failed: {exc}")
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="rollup-engine", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def stats(self):
+        return {
+            "interval": self.interval,
+            "folded": dict(self.folded),
+            "last_run": self.last_run,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,215 @@
+import os
+
+import psycopg2
+from psycopg2.extras import RealDictCursor, execute_values
+
+from app.domain.analytics import COUNTERS
+
+# Keyset starting points for streams that have never been folded
+_FIRST_ID = {"attendance_checkin": "0", "attendance_checkout": "0",
+             "transactions": "00000000-0000-0000-0000-000000000000"}
+
+TABLE_KEYS = {
+    "lounge_rollups_hourly": ("lounge_id", "bucket_start"),
+    "lounge_rollups_daily": ("lounge_id", "day"),
+    "lounge_rollup_totals": ("lounge_id",),
+}
+
+
+def connect(dsn=None):
+    return psycopg2.connect(dsn or os.environ["DATABASE_URL"], application_name="crm-service")
+
+
+# ── stream cursors (migration 017) ─────────────────────────────────────
+
+
+def lock_cursor(conn, stream):
+    """
+    (last_ts, last_id) of `stream`, last_ts None before the first fold.
+    Locked until the caller commits: one engine folds a stream at a time,
+    and the correction triggers wait for the fold in flight before
+    deciding what it already covered.
+    """
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT CASE WHEN isfinite(last_ts) THEN last_ts END, last_id "
+        "FROM lounge_rollup_cursors WHERE stream = %s FOR UPDATE",
+        (stream,),
+    )
+    last_ts, last_id = cur.fetchone()
+    cur.close()
+    return last_ts, last_id or _FIRST_ID[stream]
+
+
+def save_cursor(conn, stream, last_ts, last_id):
+    cur = conn.cursor()
+    cur.execute(
+        "UPDATE lounge_rollup_cursors SET last_ts = %s, last_id = %s, updated_at = NOW() WHERE stream = %s",
+        (last_ts, str(last_id), stream),
+    )
+    cur.close()
+
+
+# ── event streams ──────────────────────────────────────────────────────
+# Each reads the next `limit` events after the cursor, up to `until`
+# (a little behind NOW(), so rows from slow-committing transactions are
+# not skipped), in keyset order.
+
+
+def fetch_checkins(conn, after_ts, after_id, until, limit):
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT id, lounge_id::text, user_id, checkin_time FROM attendance_log
+        WHERE (checkin_time, id) > (COALESCE(%s::timestamp, '-infinity'), %s::bigint) AND checkin_time < %s
+        ORDER BY checkin_time, id LIMIT %s
+        """,
+        (after_ts, after_id, until, limit),
+    )
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+
+def fetch_checkouts(conn, after_ts, after_id, until, limit):
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT id, lounge_id::text, checkin_time, checkout_time FROM attendance_log
+        WHERE checkout_time IS NOT NULL
+          AND (checkout_time, id) > (COALESCE(%s::timestamp, '-infinity'), %s::bigint) AND checkout_time < %s
+        ORDER BY checkout_time, id LIMIT %s
+        """,
+        (after_ts, after_id, until, limit),
+    )
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+
+def fetch_transactions(conn, after_ts, after_id, until, limit):
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT id::text, lounge_id::text, amount, status,
+               transaction_date AT TIME ZONE 'UTC', created_at
+        FROM lounge_transactions
+        WHERE (created_at, id) > (COALESCE(%s::timestamptz, '-infinity'), %s::uuid) AND created_at < %s
+        ORDER BY created_at, id LIMIT %s
+        """,
+        (after_ts, after_id, until, limit),
+    )
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+
+def database_now(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT NOW(), LOCALTIMESTAMP")
+    now = cur.fetchone()
+    cur.close()
+    return now
+
+
+# ── buckets ────────────────────────────────────────────────────────────
+
+
+def fetch_members(conn, table, keys):
+    """Stored member sketches for the bucket keys about to be written."""
+    if not keys:
+        return {}
+    key_columns = TABLE_KEYS[table]
+    cur = conn.cursor()
+    if len(key_columns) == 1:
+        cur.execute(f"SELECT lounge_id::text, members FROM {table} WHERE lounge_id = ANY(%s::uuid[])",
+                    ([k[0] for k in keys],))
+        found = {(lounge,): members for lounge, members in cur.fetchall()}
+    else:
+        second = key_columns[1]
+        found = {}
+        execute_values(
+            cur,
+            f"SELECT r.lounge_id::text, r.{second}, r.members FROM {table} r "
+            f"JOIN (VALUES %s) AS k (lounge_id, {second}) "
+            f"ON r.lounge_id = k.lounge_id::uuid AND r.{second} = k.{second}",
+            list(keys),
+        )
+        for lounge, bucket, members in cur.fetchall():
+            found[(lounge, bucket)] = members
+    cur.close()
+    return found
+
+
+def add_buckets(conn, table, buckets, page_size=500):
+    """
+    Add `buckets` ({key tuple: Bucket}) into `table`. Counters are added;
+    a bucket's members sketch, when set, replaces the stored one, so the
+    caller merges sketches first (fetch_members). Does not commit.
+    """
+    if not buckets:
+        return
+    key_columns = TABLE_KEYS[table]
+    columns = (*key_columns, *COUNTERS, "members")
+    updates = ", ".join(f"{c} = r.{c} + EXCLUDED.{c}" for c in COUNTERS)
+    rows = [
+        (*key, *bucket.counters(),
+         psycopg2.Binary(bucket.members.to_bytes()) if bucket.members is not None else None)
+        for key, bucket in buckets.items()
+    ]
+    cur = conn.cursor()
+    execute_values(
+        cur,
+        f"""
+        INSERT INTO {table} AS r ({", ".join(columns)}) VALUES %s
+        ON CONFLICT ({", ".join(key_columns)}) DO UPDATE SET
+            {updates},
+            members = COALESCE(EXCLUDED.members, r.members),
+            updated_at = NOW()
+        """,
+        rows,
+        page_size=page_size,
+    )
+    cur.close()
+
+
+# ── dashboard reads ────────────────────────────────────────────────────
+
+
+def fetch_hourly(conn, lounge_id, start, end):
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur.execute(
+        "SELECT * FROM lounge_rollups_hourly WHERE lounge_id = %s AND bucket_start >= %s AND bucket_start < %s "
+        "ORDER BY bucket_start",
+        (lounge_id, start, end),
+    )
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+
+def fetch_daily(conn, lounge_id, start, end):
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur.execute(
+        "SELECT * FROM lounge_rollups_daily WHERE lounge_id = %s AND day >= %s AND day < %s ORDER BY day",
+        (lounge_id, start, end),
+    )
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+
+def fetch_totals(conn, lounge_id):
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur.execute("SELECT * FROM lounge_rollup_totals WHERE lounge_id = %s", (lounge_id,))
+    row = cur.fetchone()
+    cur.close()
+    return row
+
+
+def fetch_cursors(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT stream, CASE WHEN isfinite(last_ts) THEN last_ts END, updated_at FROM lounge_rollup_cursors")
+    rows = {stream: {"last_ts": ts, "updated_at": updated} for stream, ts, updated in cur.fetchall()}
+    cur.close()
+    return rows
@@ -0,0 +1,24 @@
+from fastapi import FastAPI
+
+from app.api.routes import router
+from app.application.crm_usecases import ROLLUP_ENABLED, close_pool, rollup_engine
+
+app = FastAPI(title="AeroFace CRM Service")
+app.include_router(router)
+
+
+@app.on_event("startup")
+def start_rollups():
+    if ROLLUP_ENABLED:
+        rollup_engine.start()
+
+
+@app.on_event("shutdown")
+def stop_rollups():
+    rollup_engine.stop()
+    close_pool()
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok", "rollups": {"enabled": ROLLUP_ENABLED, **rollup_engine.stats()}}
@@ -0,0 +1,32 @@
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+
+class BucketSummary(BaseModel):
+    visits: int
+    unique_members: int
+    avg_dwell_minutes: Optional[float] = None
+    dwell_histogram: Dict[str, int]
+    revenue: float
+    transactions: int
+
+
+class OverviewResponse(BaseModel):
+    lounge_id: str
+    today: BucketSummary
+    last_7_days: BucketSummary
+    month_to_date: BucketSummary
+    all_time: BucketSummary
+    as_of: Dict[str, Optional[str]]
+
+
+class SeriesPoint(BucketSummary):
+    start: str
+
+
+class SeriesResponse(BaseModel):
+    lounge_id: str
+    granularity: str
+    points: List[SeriesPoint]
+    as_of: Dict[str, Optional[str]]
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The service imports itself as `app.…` from its own directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
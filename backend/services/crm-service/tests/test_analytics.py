@@ -0,0 +1,96 @@
+from decimal import Decimal
+
+import pytest
+
+from app.domain.analytics import COUNTERS, DWELL_COLUMNS, Bucket, HyperLogLog, dwell_bin, merge_buckets
+
+
+@pytest.mark.parametrize("seconds, expected", [
+    (-5, 0), (0, 0), (899, 0), (900, 1), (1799, 1), (1800, 2), (7200, 4), (14399, 4), (14400, 5), (10 ** 6, 5),
+])
+def test_dwell_bin_bounds_match_the_sql_function(seconds, expected):
+    # rollup_dwell_bin() in migration 017: bins close below 15/30/60/120/240 minutes
+    assert dwell_bin(seconds) == expected
+
+
+def test_hyperloglog_counts_small_and_large_sets():
+    small = HyperLogLog()
+    for member in ["a", "b", "c", "a"]:
+        small.add(member)
+    large = HyperLogLog()
+    for member in range(50_000):
+        large.add(member)
+
+    assert small.count() == 3
+    assert large.count() == pytest.approx(50_000, rel=0.1)
+    assert HyperLogLog().count() == 0
+
+
+def test_hyperloglog_merge_is_a_union():
+    left, right = HyperLogLog(), HyperLogLog()
+    for member in range(0, 3000):
+        left.add(member)
+    for member in range(2000, 5000):
+        right.add(member)
+
+    assert left.update(right).count() == pytest.approx(5000, rel=0.1)
+
+
+def test_hyperloglog_bytes_round_trip():
+    sketch = HyperLogLog()
+    sketch.add("member")
+
+    restored = HyperLogLog.from_bytes(memoryview(sketch.to_bytes()))
+
+    assert len(sketch.to_bytes()) == HyperLogLog.M
+    assert (restored.registers == sketch.registers).all()
+    assert HyperLogLog.from_bytes(None).count() == 0
+
+
+def test_bucket_accumulates_and_summarizes():
+    bucket = Bucket()
+    bucket.add_visit("u1")
+    bucket.add_visit("u1")
+    bucket.add_dwell(600)
+    bucket.add_dwell(3000)
+    bucket.add_revenue("12.50")
+
+    summary = bucket.to_dict()
+
+    assert summary["visits"] == 2
+    assert summary["unique_members"] == 1
+    assert summary["avg_dwell_minutes"] == 30.0
+    assert summary["dwell_histogram"] == {"<15m": 1, "15-30m": 0, "30-60m": 1, "1-2h": 0, "2-4h": 0, "4h+": 0}
+    assert summary["revenue"] == 12.5
+    assert Bucket().to_dict()["avg_dwell_minutes"] is None
+
+
+def test_merge_adds_counters_without_aliasing_sketches():
+    hour = Bucket()
+    hour.add_visit("u1")
+    hour.add_dwell(100)
+    other = Bucket()
+    other.add_visit("u2")
+    other.add_revenue(5)
+
+    total = merge_buckets([hour, other, Bucket()])
+    total.add_visit("u3")
+
+    assert total.counters() == (3, 1, 100, 1, 0, 0, 0, 0, 0, Decimal(5), 1)
+    assert total.members.count() == 3
+    assert hour.members.count() == 1
+
+
+def test_from_row_reads_the_rollup_columns():
+    source = Bucket()
+    source.add_visit("u1")
+    source.add_dwell(4000)
+    source.add_revenue("3.10")
+    row = dict(zip(COUNTERS, source.counters()), members=source.members.to_bytes())
+
+    bucket = Bucket.from_row(row)
+
+    assert bucket.counters() == source.counters()
+    assert bucket.dwell == [row[c] for c in DWELL_COLUMNS]
+    assert bucket.members.count() == 1
+    assert Bucket.from_row({**row, "members": None}).members is None
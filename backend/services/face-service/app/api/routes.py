@@ -1,8 +1,17 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request
 from app.detection.detector import detect_single_face
 from app.liveness.liveness_detector import check_liveness
-from app.embedding.generator import generate_embedding
-from typing import List
+from app.embedding.batcher import get_embedder
+from app.embedding.engine import get_engine
+from app.application.face_usecases import enroll_face, identify_face, presence, probe_cache, replay_decision
+from app.application.probe_cache import dhash
+from app.application.pipeline import stage
+from app.schemas.face_schema import PresenceResponse, VerifyRequest, VerifyResponse
+from typing import List, Optional
+import asyncio
+import base64
+import binascii
+import os
 import uuid
 
 router = APIRouter()
@@ -11,6 +20,20 @@ ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png"}
 MIN_IMAGES = 1
 MAX_IMAGES = 5
 
+# Peers whose X-Forwarded-For is believed (the gateway's address); behind
+# it, every kiosk would otherwise share the gateway's address
+TRUSTED_PROXIES = {h.strip() for h in os.getenv("FACE_TRUSTED_PROXIES", "").split(",") if h.strip()}
+
+
+def _lounge_id(value):
+    # Checked here so a malformed id is a 400, not a database error
+    if value is None:
+        return None
+    try:
+        return str(uuid.UUID(value))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid lounge_id (not UUID)")
+
 
 def _validate_image(file: UploadFile):
     if not file.filename:
@@ -27,14 +50,15 @@ def _validate_image(file: UploadFile):
 @router.post("/face/register")
 async def register_face(
     user_id: str = Form(...),
-    images: List[UploadFile] = File(...)
+    images: List[UploadFile] = File(...),
+    lounge_id: Optional[str] = Form(None)
 ):
-    print("RAW user_id:", repr(user_id))
     # ---- validate user_id ----
     try:
         uuid.UUID(user_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid user_id (not UUID)")
+    lounge_id = _lounge_id(lounge_id)
 
     # ---- validate images count ----
     if len(images) < MIN_IMAGES:
@@ -50,24 +74,108 @@ async def register_face(
         )
 
     # ---- validate each image ----
-    faces = []
-    for img in images:
-        content = await img.read()
-        face = detect_single_face(content)
-        faces.append(face)
+    # CPU-heavy stages run off the event loop, under per-stage limits
+    contents = [memoryview(await img.read()) for img in images]
+    detect = stage("detect")
+    faces = list(await asyncio.gather(*(detect.run(detect_single_face, c) for c in contents)))
 
     # Liveness on face crops
-    liveness = check_liveness(faces)
+    liveness = await stage("liveness").run(check_liveness, faces)
     if not liveness["is_live"]:
         raise HTTPException(400, "Liveness check failed (possible spoof)")
 
-    # Generate embedding from first face
-    embedding = generate_embedding(faces[0])
+    # Embed every submitted face in one forward pass
+    async with stage("embed").slot():
+        embeddings = await get_embedder().embed_async(faces)
+
+    # Fuse all captures into the stored template(s)
+    templates = await stage("store").run(
+        enroll_face, user_id, embeddings, lounge_id, get_engine().model_name, faces
+    )
 
     return {
         "status": "face_registered",
         "user_id": user_id,
         "faces_detected": len(faces),
+        "embeddings_generated": len(embeddings),
+        "templates_stored": templates,
         "liveness_score": liveness["liveness_score"],
-        "embedding_dim": len(embedding)
-    }
\ No newline at end of file
+        "embedding_dim": embeddings.shape[1]
+    }
+
+
+async def _verify(content, lounge_id, kiosk):
+    face = await stage("detect").run(detect_single_face, content)
+    # Every frame is checked, cached decision or not: a replayed photo must
+    # not ride on the decision made for the live face before it
+    liveness = await stage("liveness").run(check_liveness, [face])
+    if not liveness["is_live"]:
+        return {"matched": False, "status": "liveness_failed", "user_id": None,
+                "confidence": 0.0, "message": "Liveness check failed (possible spoof)"}
+
+    # The same person still in front of this kiosk: reuse its decision
+    scope = (lounge_id, kiosk)
+    face_hash = dhash(face)
+    cached = probe_cache.get(scope, face_hash)
+    if cached is not None:
+        return replay_decision(cached, lounge_id)
+
+    # Shares forward passes with whatever other kiosks are verifying right now
+    async with stage("embed").slot():
+        embedding = (await get_embedder().embed_async([face]))[0]
+
+    # Search only the lounge's own subscribers when a lounge is given
+    decision = await stage("search").run(identify_face, embedding, lounge_id)
+    probe_cache.put(scope, face_hash, decision)
+    return decision
+
+
+def _client_address(request: Request):
+    peer = request.client.host if request.client else None
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded and peer in TRUSTED_PROXIES:
+        # The last hop is the one the trusted proxy appended; earlier
+        # hops come from the client and could name any kiosk
+        return forwarded.split(",")[-1].strip() or peer
+    return peer
+
+
+def _kiosk(request: Request, kiosk_id):
+    # Kiosks that do not name themselves are told apart by address
+    return kiosk_id or _client_address(request)
+
+
+@router.post("/verify", response_model=VerifyResponse)
+async def verify_face(req: VerifyRequest, request: Request):
+    try:
+        content = base64.b64decode(req.image_base64, validate=True)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid base64 image")
+    return await _verify(content, _lounge_id(req.lounge_id), _kiosk(request, req.kiosk_id))
+
+
+@router.post("/verify/frame", response_model=VerifyResponse)
+async def verify_frame(request: Request, lounge_id: Optional[str] = None, kiosk_id: Optional[str] = None):
+    # Raw JPEG/PNG body (Content-Type: image/*): no base64 inflation or
+    # JSON parse, and the body buffer is decoded in place
+    content = await request.body()
+    if not content:
+        raise HTTPException(status_code=400, detail="Empty image body")
+    return await _verify(content, _lounge_id(lounge_id), _kiosk(request, kiosk_id))
+
+
+@router.get("/presence")
+def presence_counts():
+    # Served from memory; the lounge dashboard polls this
+    return {"lounges": presence.counts()}
+
+
+@router.get("/presence/{lounge_id}", response_model=PresenceResponse)
+def lounge_presence(lounge_id: str):
+    lounge_id = _lounge_id(lounge_id)
+    occupants = presence.occupants(lounge_id)
+    return {
+        "lounge_id": lounge_id,
+        "count": len(occupants),
+        "occupants": [{"user_id": u, "checkin_time": t} for u, t in occupants],
+    }
@@ -0,0 +1,332 @@
+import os
+from functools import partial
+
+import cv2
+from dotenv import load_dotenv
+
+from app.application.presence import PresenceEngine
+from app.application.probe_cache import ProbeCache
+from app.infrastructure.attendance_recorder import AttendanceRecorder
+from app.infrastructure.attendance_repository import fetch_open_sessions
+from app.infrastructure.db import ConnectionPool, connect
+from app.infrastructure.gallery_snapshot import SnapshotGallery
+from app.infrastructure.gallery_sync import GallerySync
+from app.infrastructure.reembed_repository import fetch_job, store_enrolment_crops
+from app.infrastructure.vector_repository import (
+    DEFAULT_TABLE,
+    fetch_all_embeddings,
+    fetch_embedding_dim,
+    fetch_exact_rows,
+    fetch_lounge_embeddings,
+    upsert_face_template,
+    upsert_face_templates,
+)
+from app.embedding.engine import get_engine, model_name as default_model_name, model_spec, set_model_name
+from app.observability.metrics import registry, timed
+from app.similarity.matcher import GalleryIndex
+from app.similarity.shards import LoungeShardCache
+from app.similarity.templates import TemplateGallery, fuse_templates
+
+load_dotenv()
+
+MATCH_THRESHOLD = float(os.getenv("FACE_MATCH_THRESHOLD", "0.7"))
+# Retry against the whole network when a lounge's own shard has no match
+GLOBAL_FALLBACK = os.getenv("FACE_GLOBAL_FALLBACK", "false").lower() == "true"
+# Optional memory-mapped snapshot (app/infrastructure/gallery_snapshot.py) that
+# backs the global gallery instead of a full face_embeddings load
+GALLERY_SNAPSHOT = os.getenv("FACE_GALLERY_SNAPSHOT")
+# Resident format of in-memory shards: float32, float16 or int8, plus how
+# many compact-scan candidates to re-score against exact rows read from
+# the database (0 = none; costs one indexed query per identify)
+GALLERY_DTYPE = os.getenv("FACE_GALLERY_DTYPE", "float32")
+GALLERY_RERANK = int(os.getenv("FACE_GALLERY_RERANK", "0"))
+# Enrolment keeps up to this many sub-templates per user; shards score them
+# with "max" or "mean" (1 = fused template only)
+MAX_TEMPLATES = int(os.getenv("FACE_MAX_TEMPLATES", "3"))
+TEMPLATE_AGGREGATE = os.getenv("FACE_TEMPLATE_AGGREGATE", "max")
+# Re-embedding job (app/embedding/reembed.py) whose target this service
+# switches to once it completes; until then reads stay on face_embeddings
+REEMBED_JOB = os.getenv("FACE_REEMBED_JOB")
+# Keep enrolment crops (JPEG) so a later model change can be re-embedded
+KEEP_ENROLMENT_CROPS = os.getenv("FACE_KEEP_ENROLMENT_CROPS", "false").lower() == "true"
+
+
+# Request-path queries share a bounded pool; GallerySync and the attendance
+# flusher each keep one long-lived connection of their own on top of it
+db_pool = ConnectionPool(
+    connect,
+    max_size=int(os.getenv("FACE_DB_POOL_MAX", "8")),
+    min_size=int(os.getenv("FACE_DB_POOL_MIN", "1")),
+    timeout=float(os.getenv("FACE_DB_POOL_TIMEOUT", "5")),
+    max_idle=float(os.getenv("FACE_DB_POOL_MAX_IDLE", "300")),
+)
+
+
+def _query(fetch, *args):
+    return db_pool.run(fetch, *args)
+
+
+def _resolve_gallery():
+    """
+    (table, model) to read: the re-embedding job's target once its status is
+    complete, otherwise face_embeddings and FACE_MODEL_NAME. Probes and
+    gallery therefore always come from the same model; the switch happens
+    on the first start after the job finishes.
+    """
+    if REEMBED_JOB:
+        try:
+            job = _query(fetch_job, REEMBED_JOB)
+        except Exception as exc:
+            print(f"[gallery] could not read re-embedding job {REEMBED_JOB}: {exc}")
+            job = None
+        if job is not None and job["status"] == "complete":
+            print(f"[gallery] job {REEMBED_JOB} complete, reading face_embeddings_next ({job['target_model']})")
+            return "face_embeddings_next", job["target_model"]
+    return DEFAULT_TABLE, default_model_name()
+
+
+# Until configure_gallery() runs at startup; importing this module never
+# touches the database
+GALLERY_TABLE, MODEL_NAME = DEFAULT_TABLE, default_model_name()
+
+
+class GalleryMismatch(Exception):
+    """The embedding model does not fit the gallery column; the API maps it to 503."""
+
+
+_gallery_dim = None
+
+
+def gallery_dim():
+    """Declared dimension of GALLERY_TABLE.embedding (0 = unconstrained), read once."""
+    global _gallery_dim
+    if _gallery_dim is None:
+        _gallery_dim = _query(fetch_embedding_dim, GALLERY_TABLE) or 0
+    return _gallery_dim
+
+
+def check_model_dim(dim=None):
+    """
+    Refuse a model whose vectors GALLERY_TABLE cannot hold (pgvector would
+    reject every enrolment, and shards would reject every probe). `dim`
+    defaults to the loaded engine's, else the model's known size.
+    """
+    engine = get_engine()
+    dim = dim or engine.dim or model_spec(MODEL_NAME)[1]
+    expected = gallery_dim()
+    if dim and expected and dim != expected:
+        raise GalleryMismatch(
+            f"{MODEL_NAME} produces {dim}-D embeddings but {GALLERY_TABLE}.embedding is vector({expected}); "
+            f"set FACE_MODEL_NAME to a {expected}-D model or re-embed into face_embeddings_next"
+        )
+
+
+global_snapshot = None
+
+
+@timed("shard_load")
+def _load_shard(lounge_id):
+    return _query(fetch_lounge_embeddings, lounge_id, GALLERY_TABLE)
+
+
+@timed("shard_load")
+def _load_global():
+    if global_snapshot is not None:
+        return global_snapshot
+    return _query(fetch_all_embeddings, GALLERY_TABLE)
+
+
+def _exact_rows(keys):
+    return _query(fetch_exact_rows, keys, GALLERY_TABLE)
+
+
+shard_cache = LoungeShardCache(
+    load_shard=_load_shard,
+    load_global=_load_global,
+    max_shards=int(os.getenv("FACE_MAX_SHARDS", "64")),
+    idle_ttl=float(os.getenv("FACE_SHARD_IDLE_TTL", "900")),
+    make_index=(
+        partial(TemplateGallery, aggregate=TEMPLATE_AGGREGATE, max_templates=MAX_TEMPLATES,
+                dtype=GALLERY_DTYPE, rerank=GALLERY_RERANK, exact_rows=_exact_rows)
+        if MAX_TEMPLATES > 1
+        else partial(GalleryIndex, dtype=GALLERY_DTYPE, rerank=GALLERY_RERANK, exact_rows=_exact_rows)
+    ),
+)
+
+# Shards load lazily, so the sync only streams deltas into resident ones
+gallery_sync = GallerySync(
+    connect,
+    shard_cache,
+    interval=float(os.getenv("FACE_SYNC_INTERVAL", "5")),
+    load_snapshot=False,
+    table=GALLERY_TABLE,
+)
+
+
+
+def configure_gallery():
+    """
+    Startup, before the model is built: pick the table and model to serve
+    (_resolve_gallery) and map FACE_GALLERY_SNAPSHOT if it still applies.
+    """
+    global GALLERY_TABLE, MODEL_NAME, global_snapshot
+    GALLERY_TABLE, MODEL_NAME = _resolve_gallery()
+    set_model_name(MODEL_NAME)
+    gallery_sync.table = GALLERY_TABLE
+    if GALLERY_SNAPSHOT and GALLERY_TABLE != DEFAULT_TABLE:
+        # Snapshots are built from face_embeddings, i.e. the old model
+        print("[gallery] ignoring FACE_GALLERY_SNAPSHOT after re-embedding cutover; rebuild it")
+    elif GALLERY_SNAPSHOT:
+        global_snapshot = SnapshotGallery.open(GALLERY_SNAPSHOT)
+        # Mapping is instant; hold it from the start and replay every change
+        # written since the snapshot was built
+        shard_cache.global_index()
+        gallery_sync.resume(global_snapshot.snapshot.watermark, global_snapshot.snapshot.ids)
+
+
+# Lounge occupancy: matches at a lounge check users in, absence checks them
+# out; transitions are written behind to attendance_log
+attendance = AttendanceRecorder(connect, os.getenv("FACE_ATTENDANCE_SPOOL", "attendance_spool.jsonl"))
+
+
+def _persist_presence(event):
+    if event.kind == "checkin":
+        attendance.check_in(event.user_id, event.lounge_id, event.at)
+    else:
+        attendance.check_out(event.user_id, event.lounge_id, event.checkin_time, event.at)
+
+
+presence = PresenceEngine(
+    debounce=float(os.getenv("FACE_PRESENCE_DEBOUNCE", "30")),
+    dwell=float(os.getenv("FACE_PRESENCE_DWELL", "1800")),
+    on_event=_persist_presence,
+)
+
+
+def start_presence():
+    try:
+        loaded = presence.load(_query(fetch_open_sessions))
+        print(f"[presence] restored {loaded} open sessions")
+    except Exception as exc:
+        print(f"[presence] rebuild failed, starting empty: {exc}")
+    attendance.start()
+    presence.start(float(os.getenv("FACE_PRESENCE_SWEEP", "30")))
+
+
+def stop_presence():
+    presence.stop()
+    attendance.stop()
+
+
+def _store_enrolment(conn, user_id, fused, templates, lounge_id, model_name, crops):
+    if crops is not None:
+        store_enrolment_crops(conn, user_id, crops, lounge_id)
+    # Commits the crops and the template together
+    upsert_face_template(conn, user_id, fused, templates, lounge_id, model_name, table=GALLERY_TABLE)
+
+
+def enroll_face(user_id, embeddings, lounge_id=None, model_name=None, faces=None):
+    """
+    Fuse one enrolment's embeddings and store them; GallerySync picks the
+    row up. With FACE_KEEP_ENROLMENT_CROPS the face crops are kept too, for
+    re-embedding under a future model. Returns the number of templates kept.
+    """
+    check_model_dim(embeddings.shape[1])
+    fused, templates = fuse_templates(embeddings, max_templates=MAX_TEMPLATES)
+    model_name = model_name or MODEL_NAME
+    crops = None
+    if KEEP_ENROLMENT_CROPS and faces is not None:
+        crops = [cv2.imencode(".jpg", face, [cv2.IMWRITE_JPEG_QUALITY, 95])[1].tobytes() for face in faces]
+    with timed("db_write"):
+        db_pool.run(_store_enrolment, user_id, fused, templates, lounge_id, model_name, crops)
+    return len(templates)
+
+
+def enroll_faces(enrolments, model_name=None):
+    """
+    Batch enrolment: `enrolments` of (user_id, embeddings, lounge_id) are
+    fused one by one and written in a single bulk upsert and commit.
+    Returns the number of users stored.
+    """
+    model_name = model_name or MODEL_NAME
+    rows = []
+    for user_id, embeddings, lounge_id in enrolments:
+        check_model_dim(embeddings.shape[1])
+        fused, templates = fuse_templates(embeddings, max_templates=MAX_TEMPLATES)
+        rows.append((user_id, fused, templates, lounge_id, model_name))
+    with timed("db_write"):
+        return db_pool.run(partial(upsert_face_templates, table=GALLERY_TABLE), rows)
+
+
+# Consecutive frames of the same face at one kiosk reuse its decision for a
+# few seconds
+probe_cache = ProbeCache(
+    ttl=float(os.getenv("FACE_PROBE_CACHE_TTL", "3")),
+    max_entries=int(os.getenv("FACE_PROBE_CACHE_SIZE", "4096")),
+    max_distance=int(os.getenv("FACE_PROBE_CACHE_DISTANCE", "6")),
+)
+
+
+def identify_face(embedding, lounge_id=None, fallback=GLOBAL_FALLBACK):
+    """
+    Match an embedding against a lounge's subscribers (or everyone). A
+    FACE_GLOBAL_FALLBACK match outside the lounge is not a grant: it comes
+    back unmatched with status "other_lounge" and the user id, for the
+    caller to decide on.
+    """
+    match = shard_cache.best_match(lounge_id, embedding, MATCH_THRESHOLD, fallback)
+    if match is None:
+        return {"matched": False, "status": "not_recognized", "user_id": None, "confidence": 0.0,
+                "message": "Face not recognized"}
+    user_id, similarity, scope = match
+    if lounge_id and scope != "lounge":
+        return {"matched": False, "status": "other_lounge", "user_id": user_id, "confidence": similarity,
+                "message": "Not a member of this lounge"}
+    if lounge_id:
+        presence.observe(user_id, lounge_id)
+    return {"matched": True, "status": "granted", "user_id": user_id, "confidence": similarity,
+            "message": "Access granted"}
+
+
+def replay_decision(decision, lounge_id):
+    """A probe-cache hit: the decision stands and the person is still here."""
+    if decision["matched"] and lounge_id:
+        presence.observe(decision["user_id"], lounge_id)
+    return decision
+
+
+# ── metrics ────────────────────────────────────────────────────────────
+
+def _hit_ratio(cache):
+    lookups = cache.hits + cache.misses
+    return cache.hits / lookups if lookups else 0.0
+
+
+registry.counter(
+    "face_cache_hits_total", "Cache hits", ("cache",),
+    collect=lambda: {"probe": probe_cache.hits, "shard": shard_cache.hits},
+)
+registry.counter(
+    "face_cache_misses_total", "Cache misses", ("cache",),
+    collect=lambda: {"probe": probe_cache.misses, "shard": shard_cache.misses},
+)
+registry.gauge(
+    "face_cache_hit_ratio", "Hits over lookups since start", ("cache",),
+    collect=lambda: {"probe": _hit_ratio(probe_cache), "shard": _hit_ratio(shard_cache)},
+)
+registry.gauge("face_probe_cache_entries", "Kiosks with a cached identity decision", collect=lambda: len(probe_cache))
+registry.gauge(
+    "face_gallery_identities", "Enrolled identities per resident shard", ("shard",),
+    collect=shard_cache.sizes,
+)
+registry.gauge("face_gallery_shards", "Lounge shards held in memory", collect=lambda: len(shard_cache))
+registry.gauge("face_attendance_pending", "Attendance events not yet written", collect=lambda: attendance.pending)
+registry.counter("face_attendance_dead_letters_total", "Attendance events the database rejected",
+                 collect=lambda: attendance.dead_letters)
+registry.gauge("face_presence_occupants", "People present per lounge", ("lounge_id",), collect=presence.counts)
+registry.gauge(
+    "face_db_pool_connections", "Pooled database connections by state", ("state",),
+    collect=lambda: {"in_use": db_pool.in_use, "idle": db_pool.idle},
+)
+registry.counter("face_db_pool_timeouts_total", "Requests that found the pool exhausted",
+                 collect=lambda: db_pool.timeouts)
@@ -0,0 +1,118 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+
+from app.observability.metrics import registry, stage_seconds, stage_wait_seconds
+
+
+class StageOverloaded(Exception):
+    """Raised when a stage's queue is full; the API maps it to 503."""
+
+    def __init__(self, stage):
+        super().__init__(f"{stage} stage is overloaded")
+        self.stage = stage
+
+
+class Stage:
+    """
+    Admission control for one pipeline stage (detect, liveness, ...).
+
+    At most `concurrency` calls run at once and at most `max_queue` more
+    may wait for a slot; anything beyond that, or anything that waits longer
+    than `queue_timeout` seconds, is rejected with StageOverloaded instead of
+    piling up behind a slow request. Blocking work is pushed onto the shared
+    thread pool so the event loop keeps serving /health and other kiosks.
+    Queue wait and time holding the slot go to face_stage_wait_seconds and
+    face_stage_seconds.
+    """
+
+    def __init__(self, name, concurrency, max_queue, queue_timeout, executor):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._executor = executor
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.inflight = 0
+        self.rejected = 0
+
+    @property
+    def waiting(self):
+        return max(0, self.inflight - self.concurrency)
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.inflight >= self.concurrency + self.max_queue:
+            self.rejected += 1
+            raise StageOverloaded(self.name)
+        self.inflight += 1
+        try:
+            queued = time.perf_counter()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise StageOverloaded(self.name)
+            started = time.perf_counter()
+            stage_wait_seconds.observe(started - queued, stage=self.name)
+            try:
+                yield
+            finally:
+                self._semaphore.release()
+                stage_seconds.observe(time.perf_counter() - started, stage=self.name)
+        finally:
+            self.inflight -= 1
+
+    async def run(self, fn, *args, **kwargs):
+        """Run a blocking callable on the pool under this stage's limits."""
+        async with self.slot():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, str(default)))
+
+
+_cpus = os.cpu_count() or 4
+_queue = _env_int("FACE_STAGE_QUEUE", 32)
+_timeout = float(os.getenv("FACE_STAGE_QUEUE_TIMEOUT", "2.0"))
+
+STAGE_LIMITS = {
+    "detect": _env_int("FACE_DETECT_CONCURRENCY", _cpus),
+    "liveness": _env_int("FACE_LIVENESS_CONCURRENCY", _cpus),
+    # Embedding is batched by MicroBatcher; this only caps requests in flight
+    "embed": _env_int("FACE_EMBED_CONCURRENCY", 4 * _cpus),
+    "search": _env_int("FACE_SEARCH_CONCURRENCY", 2),
+    "store": _env_int("FACE_STORE_CONCURRENCY", 4),
+}
+
+executor = ThreadPoolExecutor(
+    max_workers=sum(v for k, v in STAGE_LIMITS.items() if k != "embed"),
+    thread_name_prefix="face-stage",
+)
+stages = {
+    name: Stage(name, limit, _queue, _timeout, executor)
+    for name, limit in STAGE_LIMITS.items()
+}
+
+
+def stage(name):
+    return stages[name]
+
+
+registry.gauge(
+    "face_stage_inflight", "Requests running or queued per stage", ("stage",),
+    collect=lambda: {name: s.inflight for name, s in stages.items()},
+)
+registry.gauge(
+    "face_stage_waiting", "Requests queued for a stage slot", ("stage",),
+    collect=lambda: {name: s.waiting for name, s in stages.items()},
+)
+registry.counter(
+    "face_stage_rejected_total", "Requests rejected with 503 per stage", ("stage",),
+    collect=lambda: {name: s.rejected for name, s in stages.items()},
+)
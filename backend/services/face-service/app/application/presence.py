@@ -0,0 +1,182 @@
+import threading
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+
+class PresenceEvent(NamedTuple):
+    kind: str  # "checkin" | "checkout"
+    user_id: str
+    lounge_id: str
+    checkin_time: datetime
+    at: datetime
+
+
+class Visit:
+    __slots__ = ("checkin_time", "last_seen")
+
+    def __init__(self, checkin_time, last_seen=None):
+        self.checkin_time = checkin_time
+        self.last_seen = last_seen or checkin_time
+
+
+class PresenceEngine:
+    """
+    Who is in which lounge right now, held in memory.
+
+    Sightings (face matches with a lounge) drive the state:
+
+      * the first sighting of an absent user checks them in;
+      * further sightings in the same lounge only refresh `last_seen`, they
+        never check anyone out;
+      * a sighting in another lounge checks out of the old one and into
+        the new one, unless it comes within `debounce` seconds of the last
+        sighting in the old one: kiosks of neighbouring lounges catching
+        the same person, or a one-frame misidentification, cannot flap
+        them between lounges;
+      * users not seen for `dwell` seconds are checked out by expire() (the
+        sweeper thread), with their last sighting as the check-out time;
+      * an explicit leave() within `debounce` seconds of check-in is ignored
+        so an exit camera catching someone at the door cannot flap them.
+
+    Each transition is returned and passed to `on_event`, which persists
+    it. Counts and membership lookups are dict operations, O(1).
+    """
+
+    def __init__(self, debounce=30.0, dwell=1800.0, on_event=None):
+        self.debounce = timedelta(seconds=debounce)
+        self.dwell = timedelta(seconds=dwell)
+        self.on_event = on_event
+        self._lounges = {}  # lounge_id -> {user_id: Visit}
+        self._where = {}  # user_id -> lounge_id
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ── state changes ──────────────────────────────────────────────────
+
+    def load(self, sessions, now=None):
+        """Rebuild from open (user_id, lounge_id, checkin_time) sessions."""
+        # Restored visitors get a full dwell window to be seen again
+        now = now or datetime.now()
+        with self._lock:
+            self._lounges.clear()
+            self._where.clear()
+            # Oldest first, so a user's latest session wins
+            for user_id, lounge_id, checkin_time in sorted(sessions, key=lambda s: s[2]):
+                self._drop(user_id)
+                self._enter(user_id, lounge_id, Visit(checkin_time, max(checkin_time, now)))
+        return len(self._where)
+
+    def _enter(self, user_id, lounge_id, visit):
+        self._lounges.setdefault(lounge_id, {})[user_id] = visit
+        self._where[user_id] = lounge_id
+
+    def _drop(self, user_id):
+        lounge_id = self._where.pop(user_id, None)
+        if lounge_id is None:
+            return None, None
+        occupants = self._lounges[lounge_id]
+        visit = occupants.pop(user_id)
+        if not occupants:
+            del self._lounges[lounge_id]
+        return lounge_id, visit
+
+    def _emit(self, events):
+        if self.on_event is not None:
+            for event in events:
+                self.on_event(event)
+        return events
+
+    def observe(self, user_id, lounge_id, at=None):
+        """Record a sighting; returns the check-in/out events it caused."""
+        at = at or datetime.now()
+        events = []
+        with self._lock:
+            current = self._where.get(user_id)
+            if current == lounge_id:
+                visit = self._lounges[lounge_id][user_id]
+                visit.last_seen = max(visit.last_seen, at)
+                return events
+            if current is not None:
+                if at - self._lounges[current][user_id].last_seen < self.debounce:
+                    return events
+                _, visit = self._drop(user_id)
+                events.append(PresenceEvent("checkout", user_id, current, visit.checkin_time, at))
+            self._enter(user_id, lounge_id, Visit(at))
+            events.append(PresenceEvent("checkin", user_id, lounge_id, at, at))
+        return self._emit(events)
+
+    def leave(self, user_id, at=None):
+        """Explicit exit (e.g. an exit-gate camera)."""
+        at = at or datetime.now()
+        with self._lock:
+            lounge_id = self._where.get(user_id)
+            if lounge_id is None:
+                return []
+            visit = self._lounges[lounge_id][user_id]
+            if at - visit.checkin_time < self.debounce:
+                return []
+            self._drop(user_id)
+            events = [PresenceEvent("checkout", user_id, lounge_id, visit.checkin_time, at)]
+        return self._emit(events)
+
+    def expire(self, now=None):
+        """Check out everyone unseen for longer than `dwell`."""
+        now = now or datetime.now()
+        cutoff = now - self.dwell
+        events = []
+        with self._lock:
+            stale = [
+                (user_id, lounge_id)
+                for lounge_id, occupants in self._lounges.items()
+                for user_id, visit in occupants.items()
+                if visit.last_seen < cutoff
+            ]
+            for user_id, lounge_id in stale:
+                _, visit = self._drop(user_id)
+                events.append(PresenceEvent("checkout", user_id, lounge_id, visit.checkin_time, visit.last_seen))
+        return self._emit(events)
+
+    # ── queries ────────────────────────────────────────────────────────
+
+    def count(self, lounge_id):
+        return len(self._lounges.get(lounge_id, ()))
+
+    def counts(self):
+        with self._lock:
+            return {lounge_id: len(occupants) for lounge_id, occupants in self._lounges.items()}
+
+    def is_present(self, user_id, lounge_id=None):
+        current = self._where.get(user_id)
+        return current is not None and (lounge_id is None or current == lounge_id)
+
+    def lounge_of(self, user_id) -> Optional[str]:
+        return self._where.get(user_id)
+
+    def occupants(self, lounge_id):
+        """[(user_id, checkin_time), ...] for one lounge, earliest first."""
+        with self._lock:
+            occupants = self._lounges.get(lounge_id, {})
+            return sorted(((u, v.checkin_time) for u, v in occupants.items()), key=lambda o: o[1])
+
+    # ── sweeper ────────────────────────────────────────────────────────
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.expire()
+            except Exception as exc:
+                print(f"[presence] expire failed: {exc}")
+
+    def start(self, interval=30.0):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(interval,), name="presence-sweeper", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+def dhash(face_img, size=16):
+    """
+    Difference hash of a crop: grayscale, shrink to (size+1) x size and
+    record whether each pixel is brighter than its right neighbour.
+    JPEG noise and small shifts between consecutive frames flip few bits.
+    """
+    gray = face_img if face_img.ndim == 2 else cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class ProbeCache:
+    """
+    Short-lived memo of the identity decision for the face currently in
+    front of each kiosk.
+
+    A kiosk posts a frame every scan tick, so a person waiting at the gate
+    produces a run of near-identical crops. Each (lounge, kiosk) scope
+    keeps one track: the decision made for the last embedded frame and
+    the hash of the latest frame that followed it. A frame hits only when
+    it is within `max_distance` bits of that latest frame, i.e. it
+    continues the same run; any other face at the kiosk misses and its
+    decision replaces the track. A decision expires `ttl` seconds after
+    it was made however often it hits, so a kiosk is re-identified at
+    least that often. At most `max_entries` kiosks are tracked (LRU).
+    """
+
+    def __init__(self, ttl=3.0, max_entries=4096, max_distance=6):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self._tracks = OrderedDict()  # scope -> [expires, latest hash, decision]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def get(self, scope, face_hash):
+        now = time.monotonic()
+        with self._lock:
+            track = self._tracks.get(scope)
+            decision = None
+            if track is not None:
+                expires, latest, cached = track
+                if expires < now:
+                    del self._tracks[scope]
+                elif bin(latest ^ face_hash).count("1") <= self.max_distance:
+                    # Follow the run as it drifts, frame to frame
+                    track[1] = face_hash
+                    self._tracks.move_to_end(scope)
+                    decision = cached
+            if decision is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return decision
+
+    def put(self, scope, face_hash, decision):
+        with self._lock:
+            self._tracks.pop(scope, None)
+            self._tracks[scope] = [time.monotonic() + self.ttl, face_hash, decision]
+            while len(self._tracks) > self.max_entries:
+                self._tracks.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._tracks.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._tracks),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
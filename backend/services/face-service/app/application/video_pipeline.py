@@ -0,0 +1,107 @@
+import time
+from collections import deque
+
+import cv2
+
+from app.detection.tracker import FaceTracker
+
+
+class TrackingRecognizer:
+    """
+    Track-then-recognize loop for the camera scripts.
+
+    The detector runs every `detect_every` frames and the tracker carries
+    boxes forward in between. Only tracks the tracker flags (new faces,
+    low-confidence matches, periodic refreshes) are cropped, embedded in one
+    batch and searched in one batch; every other track reuses its cached
+    identity, so a person standing at the gate costs one embedding instead
+    of one per second, and everyone in frame is recognised, not just the
+    first face.
+
+    With `liveness` set, each track keeps its last `liveness_frames` crops
+    and is only embedded once it has that many and they pass the check
+    together, so the motion stage sees real consecutive frames. A track
+    that fails stays unidentified until its next retry.
+    """
+
+    def __init__(self, detect, embed_batch, search_batch, threshold=0.7,
+                 detect_every=3, crop_size=None, tracker=None,
+                 liveness=None, liveness_frames=3):
+        self.detect = detect  # frame -> [(x, y, w, h), ...]
+        self.embed_batch = embed_batch  # [crop, ...] -> (n, dim)
+        self.search_batch = search_batch  # (n, dim), k -> [[(user_id, sim)], ...]
+        self.threshold = threshold
+        self.detect_every = max(1, detect_every)
+        # (width, height) to resize crops to; None hands embed_batch the
+        # raw box, which EmbeddingEngine letterboxes without distortion
+        self.crop_size = crop_size
+        self.tracker = tracker or FaceTracker()
+        self.liveness = liveness  # [crop, ...] of one track -> {"is_live": ...}
+        self.liveness_frames = max(1, liveness_frames)
+        self.frames = 0
+        self.detections = 0
+        self.embeddings = 0
+        self.spoofs = 0
+        self._since_detect = 0
+        self._recent = {}  # track id -> deque of its latest crops
+
+    def _crop(self, frame, box):
+        fh, fw = frame.shape[:2]
+        x, y, w, h = box
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(fw, x + w), min(fh, y + h)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        crop = frame[y0:y1, x0:x1]
+        if self.crop_size:
+            crop = cv2.resize(crop, self.crop_size)
+        return crop
+
+    def process(self, frame, now=None):
+        """Advance one frame; returns the tracks visible in it."""
+        now = time.time() if now is None else now
+        self.frames += 1
+        self._since_detect += 1
+        if self._since_detect >= self.detect_every or not self.tracker.tracks:
+            boxes = [tuple(int(v) for v in box) for box in self.detect(frame)]
+            self.tracker.update(boxes, now, frames=self._since_detect)
+            self.detections += 1
+            self._since_detect = 0
+        else:
+            self.tracker.predict()
+        if self.liveness is not None:
+            self._remember(frame)
+
+        todo, crops = [], []
+        for track in self.tracker.pending(now):
+            crop = self._crop(frame, track.box)
+            if crop is None:
+                continue
+            if self.liveness is not None:
+                recent = self._recent.get(track.id, ())
+                if len(recent) < self.liveness_frames:
+                    continue  # not enough frames yet; still pending next frame
+                if not self.liveness(list(recent))["is_live"]:
+                    self.spoofs += 1
+                    track.assign(None, 0.0, now)
+                    continue
+            todo.append(track)
+            crops.append(crop)
+        if crops:
+            hits = self.search_batch(self.embed_batch(crops), 1)
+            self.embeddings += len(crops)
+            for track, hit in zip(todo, hits):
+                user_id, similarity = hit[0] if hit else (None, 0.0)
+                if similarity < self.threshold:
+                    user_id = None
+                track.assign(user_id, similarity, now)
+        return self.tracker.active()
+
+    def _remember(self, frame):
+        for track_id in self._recent.keys() - self.tracker.tracks.keys():
+            del self._recent[track_id]
+        for track in self.tracker.active():
+            crop = self._crop(frame, track.box)
+            if crop is not None:
+                # Copied: the camera may hand back the same buffer next frame
+                self._recent.setdefault(track.id, deque(maxlen=self.liveness_frames)).append(crop.copy())
@@ -0,0 +1,217 @@
+import os
+import threading
+from typing import List, NamedTuple
+
+import cv2
+import numpy as np
+
+from app.embedding.engine import model_name, model_spec
+
+
+class FaceDetectionError(Exception):
+    """Unusable upload (undecodable or no face); the API maps it to 400."""
+
+
+class Detection(NamedTuple):
+    x: int
+    y: int
+    w: int
+    h: int
+    score: float
+
+    @property
+    def area(self):
+        return self.w * self.h
+
+
+class BaseDetector:
+    """
+    Common detect() flow for every backend: downscale the frame so its long
+    side is at most `max_side`, run the backend, map boxes back to full
+    resolution, drop faces smaller than `min_face` pixels and return the
+    rest best-first (highest score, then largest).
+    """
+
+    def __init__(self, max_side=640, min_face=40):
+        self.max_side = max_side
+        self.min_face = min_face
+
+    def _detect(self, image, min_size):
+        """Backend hook: (x, y, w, h, score) boxes in `image` coordinates."""
+        raise NotImplementedError
+
+    def detect(self, image) -> List[Detection]:
+        h, w = image.shape[:2]
+        scale = min(1.0, self.max_side / max(h, w)) if self.max_side else 1.0
+        small = image
+        if scale < 1.0:
+            small = cv2.resize(image, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        min_size = max(1, int(self.min_face * scale))
+        found = []
+        for x, y, bw, bh, score in self._detect(small, min_size):
+            x, y, bw, bh = (int(round(v / scale)) for v in (x, y, bw, bh))
+            # Clip to the frame so callers can slice crops directly
+            x, y = max(0, x), max(0, y)
+            bw, bh = min(bw, w - x), min(bh, h - y)
+            if bw >= self.min_face and bh >= self.min_face:
+                found.append(Detection(x, y, bw, bh, float(score)))
+        found.sort(key=lambda d: (d.score, d.area), reverse=True)
+        return found
+
+
+class HaarDetector(BaseDetector):
+    """OpenCV Haar cascade; no confidences, so faces are ranked by size."""
+
+    def __init__(self, max_side=640, min_face=40, scale_factor=1.1, min_neighbors=5):
+        super().__init__(max_side, min_face)
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+    def _detect(self, image, min_size):
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        boxes = self.cascade.detectMultiScale(
+            gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+            minSize=(min_size, min_size),
+        )
+        return [(x, y, w, h, 1.0) for (x, y, w, h) in boxes]
+
+
+class YuNetDetector(BaseDetector):
+    """OpenCV's YuNet CNN (cv2.FaceDetectorYN); needs the .onnx model file."""
+
+    def __init__(self, model_path, max_side=640, min_face=40, score_threshold=0.8,
+                 nms_threshold=0.3, top_k=50):
+        super().__init__(max_side, min_face)
+        self.net = cv2.FaceDetectorYN.create(
+            model_path, "", (320, 320), score_threshold, nms_threshold, top_k
+        )
+        self._input_size = (320, 320)
+
+    def _detect(self, image, min_size):
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        size = (image.shape[1], image.shape[0])
+        if size != self._input_size:
+            self.net.setInputSize(size)
+            self._input_size = size
+        _, faces = self.net.detect(image)
+        if faces is None:
+            return []
+        # Rows: x, y, w, h, 5 landmark pairs, score
+        return [(f[0], f[1], f[2], f[3], f[14]) for f in faces]
+
+
+def create_detector(backend=None):
+    """
+    Build the configured backend. FACE_DETECTOR picks "yunet" or "haar";
+    YuNet falls back to Haar when FACE_YUNET_MODEL is missing.
+    """
+    backend = (backend or os.getenv("FACE_DETECTOR", "yunet")).lower()
+    max_side = int(os.getenv("FACE_DETECT_MAX_SIDE", "640"))
+    min_face = int(os.getenv("FACE_MIN_FACE", "40"))
+    model_path = os.getenv("FACE_YUNET_MODEL", "")
+    if backend == "yunet" and model_path and os.path.exists(model_path) and hasattr(cv2, "FaceDetectorYN"):
+        return YuNetDetector(model_path, max_side, min_face)
+    return HaarDetector(max_side, min_face)
+
+
+# OpenCV detectors are not safe to share between threads, and the detect
+# stage runs on a thread pool, so each thread gets its own instance
+_local = threading.local()
+
+
+def get_detector():
+    detector = getattr(_local, "detector", None)
+    if detector is None:
+        detector = _local.detector = create_detector()
+    return detector
+
+
+# ── decode ──────────────────────────────────────────────────────────
+
+# JPEG start-of-frame markers (baseline, progressive, lossless, ...)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_REDUCED = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+# For detection, JPEGs are decoded at 1/2, 1/4 or 1/8 scale while the long
+# side stays at least this large; libjpeg skips the discarded DCT detail,
+# so it is both a faster decode and a smaller frame for the detector
+DECODE_MIN_SIDE = int(os.getenv("FACE_DECODE_MIN_SIDE", "640"))
+
+
+def jpeg_size(buf):
+    """(width, height) from a JPEG header without decoding, or None."""
+    if len(buf) < 4 or buf[0] != 0xFF or buf[1] != 0xD8:
+        return None
+    i = 2
+    while i + 9 < len(buf):
+        if buf[i] != 0xFF:
+            return None
+        marker = buf[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in _SOF_MARKERS:
+            height = (buf[i + 5] << 8) | buf[i + 6]
+            width = (buf[i + 7] << 8) | buf[i + 8]
+            return width, height
+        if 0xD0 <= marker <= 0xD9 or marker == 0x01:
+            i += 2
+            continue
+        i += 2 + ((buf[i + 2] << 8) | buf[i + 3])
+    return None
+
+
+def _decode_flags(view, min_side):
+    size = jpeg_size(view) if min_side else None
+    if size is not None:
+        for factor, reduced in _REDUCED:
+            if max(size) // factor >= min_side:
+                return reduced
+    return cv2.IMREAD_COLOR
+
+
+def decode_image(content, min_side=None):
+    """
+    Decode bytes/bytearray/memoryview straight from the caller's buffer
+    (np.frombuffer does not copy), at reduced scale for large JPEGs.
+    """
+    min_side = DECODE_MIN_SIDE if min_side is None else min_side
+    view = memoryview(content)
+    image = cv2.imdecode(np.frombuffer(view, dtype=np.uint8), _decode_flags(view, min_side))
+    if image is None:
+        raise FaceDetectionError("Could not decode image")
+    return image
+
+
+def _crop_min_side():
+    # The embedding model letterboxes crops to its input, so a crop at least
+    # that large loses nothing to the reduced-scale decode
+    size, _ = model_spec(model_name())
+    return max(size) if size else 0
+
+
+def detect_single_face(content, min_side=None):
+    """
+    Decode an upload and return the best face crop (BGR), a view into the
+    decoded frame rather than a copy. Detection runs on the reduced-scale
+    decode, and the crop is cut from it too unless its short side is below
+    `min_side` (default: the embedding model's input size); only then is
+    the upload decoded again at full scale for that crop.
+    """
+    image = decode_image(content)
+    faces = get_detector().detect(image)
+    if not faces:
+        raise FaceDetectionError("No face detected")
+    best = faces[0]
+    min_side = _crop_min_side() if min_side is None else min_side
+    if min(best.w, best.h) >= min_side or _decode_flags(memoryview(content), DECODE_MIN_SIDE) == cv2.IMREAD_COLOR:
+        return image[best.y:best.y + best.h, best.x:best.x + best.w]
+    full = decode_image(content, 0)
+    sy = full.shape[0] / image.shape[0]
+    sx = full.shape[1] / image.shape[1]
+    top, left = int(best.y * sy), int(best.x * sx)
+    bottom = min(full.shape[0], int(round((best.y + best.h) * sy)))
+    right = min(full.shape[1], int(round((best.x + best.w) * sx)))
+    return full[top:bottom, left:right]
@@ -1,15 +1,23 @@
+import os
+import sys
+
 import cv2
 import numpy as np
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from app.detection.detector import YuNetDetector, create_detector
+
 class FaceDetector:
-    def __init__(self, model_path=None):
-        # You can use YuNet or Haar cascades. Here, Haar cascades for simplicity.
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    def __init__(self, model_path=None, backend=None):
+        # YuNet when a model file is given (or configured), Haar otherwise
+        if model_path:
+            self.detector = YuNetDetector(model_path)
+        else:
+            self.detector = create_detector(backend)
 
     def detect_faces(self, image):
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        faces = self.face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5)
-        return faces
+        # (x, y, w, h) boxes, best face first
+        return [(d.x, d.y, d.w, d.h) for d in self.detector.detect(image)]
 
 if __name__ == "__main__":
     detector = FaceDetector()
@@ -0,0 +1,151 @@
+import itertools
+import time
+
+import numpy as np
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+def centroid_distance(a, b):
+    """Centre distance relative to the smaller box side (1.0 = one face away)."""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    dx = (ax + aw / 2) - (bx + bw / 2)
+    dy = (ay + ah / 2) - (by + bh / 2)
+    return float(np.hypot(dx, dy)) / max(1, min(aw, ah, bw, bh))
+
+
+class Track:
+    """One face followed across frames, with its cached identity."""
+
+    def __init__(self, track_id, box, now):
+        self.id = track_id
+        self.box = tuple(int(v) for v in box)
+        # Last detected box and frames since; velocity is measured between
+        # detections, never from the predicted box
+        self.observed = self.box
+        self.unobserved_frames = 0
+        self.velocity = (0.0, 0.0)
+        self.created = now
+        self.last_seen = now
+        self.missed = 0
+        self.user_id = None
+        self.similarity = 0.0
+        self.last_embedded = None
+        self.embeddings = 0
+
+    @property
+    def identified(self):
+        return self.user_id is not None
+
+    def predict(self):
+        # Constant-velocity step between detector runs
+        x, y, w, h = self.box
+        vx, vy = self.velocity
+        self.box = (int(x + vx), int(y + vy), w, h)
+
+    def observe(self, box, now, frames=1):
+        old_x, old_y = self.observed[:2]
+        self.box = self.observed = tuple(int(v) for v in box)
+        steps = max(1, self.unobserved_frames + frames)
+        self.velocity = ((self.box[0] - old_x) / steps, (self.box[1] - old_y) / steps)
+        self.unobserved_frames = 0
+        self.last_seen = now
+        self.missed = 0
+
+    def miss(self, frames=1):
+        self.missed += 1
+        self.unobserved_frames += frames
+
+    def assign(self, user_id, similarity, now):
+        self.user_id = user_id
+        self.similarity = float(similarity)
+        self.last_embedded = now
+        self.embeddings += 1
+
+
+class FaceTracker:
+    """
+    Associates detections with existing tracks by IoU, falling back to
+    centroid distance for fast movers, and decides which tracks need a
+    (re-)embedding:
+
+      * new tracks, immediately;
+      * tracks whose last match scored below `confident`, every `retry` s;
+      * confident tracks, every `refresh` s, in case two people swapped
+        places inside one box.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_centroid=0.75, max_missed=5,
+                 confident=0.8, retry=0.5, refresh=10.0):
+        self.iou_threshold = iou_threshold
+        self.max_centroid = max_centroid
+        self.max_missed = max_missed
+        self.confident = confident
+        self.retry = retry
+        self.refresh = refresh
+        self.tracks = {}
+        self._ids = itertools.count(1)
+
+    def predict(self):
+        for track in self.tracks.values():
+            track.predict()
+
+    def update(self, boxes, now=None, frames=1):
+        """
+        Match this detector pass (`frames` frames since the last one) to
+        the live tracks; unmatched boxes open tracks, tracks unmatched for
+        more than `max_missed` passes are dropped.
+        """
+        now = time.time() if now is None else now
+        tracks = list(self.tracks.values())
+        pairs = []
+        for ti, track in enumerate(tracks):
+            for bi, box in enumerate(boxes):
+                overlap = iou(track.box, box)
+                if overlap >= self.iou_threshold:
+                    pairs.append((1.0 + overlap, ti, bi))
+                else:
+                    distance = centroid_distance(track.box, box)
+                    if distance <= self.max_centroid:
+                        pairs.append((1.0 - distance, ti, bi))
+        # Greedy, best pair first; good enough for a handful of faces
+        pairs.sort(reverse=True)
+        used_tracks, used_boxes = set(), set()
+        for _, ti, bi in pairs:
+            if ti in used_tracks or bi in used_boxes:
+                continue
+            used_tracks.add(ti)
+            used_boxes.add(bi)
+            tracks[ti].observe(boxes[bi], now, frames)
+        for ti, track in enumerate(tracks):
+            if ti not in used_tracks:
+                track.miss(frames)
+                if track.missed > self.max_missed:
+                    del self.tracks[track.id]
+        for bi, box in enumerate(boxes):
+            if bi not in used_boxes:
+                track = Track(next(self._ids), box, now)
+                self.tracks[track.id] = track
+        return self.active()
+
+    def active(self):
+        return [t for t in self.tracks.values() if t.missed == 0]
+
+    def needs_embedding(self, track, now):
+        if track.last_embedded is None:
+            return True
+        wait = self.refresh if track.similarity >= self.confident else self.retry
+        return now - track.last_embedded >= wait
+
+    def pending(self, now=None):
+        now = time.time() if now is None else now
+        return [t for t in self.active() if self.needs_embedding(t, now)]
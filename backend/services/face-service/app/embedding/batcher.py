@@ -0,0 +1,181 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+
+import numpy as np
+
+from app.embedding.engine import get_engine, model_name, model_spec
+from app.observability.metrics import embed_batch_size, registry, timed
+
+
+class MicroBatcher:
+    """
+    Coalesces face crops from one or many concurrent requests into a single
+    model forward pass.
+
+    The first queued crop opens a window of `max_wait` seconds; everything
+    that arrives inside it (up to `max_batch` crops) runs through
+    `embed_batch` together. A lone request therefore pays at most
+    `max_wait` extra latency, while a burst is served a full batch at a time.
+    """
+
+    def __init__(self, embed_batch, max_batch=16, max_wait=0.005):
+        self._embed_batch = embed_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.faces = 0
+        self.last_batch_size = 0
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join()
+                self._thread = None
+
+    def submit(self, faces):
+        """Queue crops; returns one Future per crop resolving to its embedding."""
+        self.start()
+        futures = []
+        for face in faces:
+            future = Future()
+            self._queue.put((face, future))
+            futures.append(future)
+        return futures
+
+    def embed(self, faces):
+        """Blocking (n, dim) embeddings for a list of crops."""
+        return np.stack([f.result() for f in self.submit(faces)])
+
+    async def embed_async(self, faces):
+        """Awaitable variant for the FastAPI handlers; never blocks the loop."""
+        futures = [asyncio.wrap_future(f) for f in self.submit(faces)]
+        return np.stack(await asyncio.gather(*futures))
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # re-deliver the stop signal after this batch
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            # Claim each future; a waiter cancelled while queued (client gone,
+            # stage timeout) drops out here and costs no forward pass
+            batch = [(face, future) for face, future in self._collect(first)
+                     if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            futures = [future for _, future in batch]
+            embed_batch_size.observe(len(batch))
+            try:
+                with timed("forward"):
+                    embeddings = self._embed_batch([face for face, _ in batch])
+            except Exception as exc:
+                for future in futures:
+                    _settle(future, exception=exc)
+                continue
+            for future, embedding in zip(futures, embeddings):
+                _settle(future, result=embedding)
+            self.batches += 1
+            self.faces += len(batch)
+            self.last_batch_size = len(batch)
+
+
+def _settle(future, result=None, exception=None):
+    """Resolve a future unless something already did; never raises."""
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+_batcher = None
+_pool = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher():
+    """Process-wide batcher over the shared EmbeddingEngine."""
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = MicroBatcher(
+                get_engine().embed_batch,
+                max_batch=int(os.getenv("FACE_BATCH_MAX", "16")),
+                max_wait=float(os.getenv("FACE_BATCH_WAIT_MS", "5")) / 1000,
+            )
+    return _batcher
+
+
+def get_embedder():
+    """
+    What the API embeds through: the in-process MicroBatcher, or with
+    FACE_INFERENCE_WORKERS > 0 a shared-memory InferencePool of that many
+    pinned processes (each with its own model).
+    """
+    global _pool
+    workers = int(os.getenv("FACE_INFERENCE_WORKERS", "0"))
+    if workers <= 0:
+        return get_batcher()
+    with _batcher_lock:
+        if _pool is None:
+            from app.embedding.worker_pool import InferencePool
+
+            name = model_name()
+            size = os.getenv("FACE_MODEL_INPUT")
+            dim = os.getenv("FACE_MODEL_DIM")
+            _pool = InferencePool(
+                workers,
+                model_name=name,
+                input_size=(int(size), int(size)) if size else model_spec(name)[0],
+                dim=int(dim) if dim else model_spec(name)[1],
+                slots=int(os.getenv("FACE_INFERENCE_SLOTS", "256")),
+                max_batch=int(os.getenv("FACE_BATCH_MAX", "16")),
+                max_wait=float(os.getenv("FACE_BATCH_WAIT_MS", "5")) / 1000,
+                timeout=float(os.getenv("FACE_INFERENCE_TIMEOUT", "30")),
+            )
+    return _pool
+
+
+def _queue_depth():
+    # Only report an embedder that exists; a scrape must not start one
+    embedder = _pool if _pool is not None else _batcher
+    return embedder.pending if embedder is not None else 0
+
+
+registry.gauge("face_embed_queue_depth", "Crops waiting for a forward pass", collect=_queue_depth)
@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# Input (height, width) and embedding size of the DeepFace models, so the
+# worker pool and the gallery checks know them without building the model
+MODEL_SPECS = {
+    "VGG-Face": ((224, 224), 4096),
+    "Facenet": ((160, 160), 128),
+    "Facenet512": ((160, 160), 512),
+    "OpenFace": ((96, 96), 128),
+    "DeepFace": ((152, 152), 4096),
+    "DeepID": ((55, 47), 160),
+    "ArcFace": ((112, 112), 512),
+    "Dlib": ((150, 150), 128),
+    "SFace": ((112, 112), 128),
+    "GhostFaceNet": ((112, 112), 512),
+}
+# face_embeddings.embedding is vector(512) (migration 011)
+DEFAULT_MODEL = "ArcFace"
+
+
+def model_spec(name):
+    """(input_size, dim) of a DeepFace model, or (None, None) if unknown."""
+    return MODEL_SPECS.get(name, (None, None))
+
+
+def letterbox(face_img, size):
+    """
+    Fit a BGR crop into a black (h, w, 3) uint8 canvas keeping its aspect
+    ratio, the same way DeepFace's resize_image pads faces.
+    """
+    target_h, target_w = size
+    h, w = face_img.shape[:2]
+    factor = min(target_h / h, target_w / w)
+    resized = cv2.resize(face_img, (max(1, int(w * factor)), max(1, int(h * factor))))
+    out = np.zeros((target_h, target_w, 3), dtype=np.uint8)
+    top = (target_h - resized.shape[0]) // 2
+    left = (target_w - resized.shape[1]) // 2
+    out[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    return out
+
+
+def to_model_input(crops):
+    # Stored embeddings were produced from RGB input (generate_embedding used
+    # to convert before calling DeepFace), so flip channels while scaling
+    return crops[..., ::-1].astype(np.float32) / 255.0
+
+
+class EmbeddingEngine:
+    """
+    Holds one face-recognition model for the life of the process.
+
+    DeepFace (and with it TensorFlow) is imported on load() rather than at
+    module import, the model is built once and warmed up with a dummy
+    batch, and inference runs straight on already-cropped faces, skipping
+    DeepFace.represent's detection/alignment wrapper.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL):
+        self.model_name = model_name
+        self.load_seconds = None
+        self.input_size = None  # (height, width)
+        self.dim = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self):
+        return self._model is not None
+
+    def load(self):
+        with self._lock:
+            if self._model is not None:
+                return self
+            start = time.perf_counter()
+            from deepface import DeepFace
+
+            client = DeepFace.build_model(self.model_name)
+            # Newer DeepFace wraps the Keras model in a client object
+            model = getattr(client, "model", client)
+            shape = getattr(client, "input_shape", None) or model.input_shape
+            if len(shape) == 4:
+                shape = shape[1:3]
+            self.input_size = (int(shape[0]), int(shape[1]))
+            self._model = model
+            warm = self._forward(np.zeros((1, *self.input_size, 3), dtype=np.float32))
+            self.dim = warm.shape[1]
+            self.load_seconds = time.perf_counter() - start
+            print(f"[embedding] {self.model_name} loaded in {self.load_seconds:.2f}s "
+                  f"(input {self.input_size}, {self.dim}-D)")
+        return self
+
+    def _forward(self, batch):
+        return np.asarray(self._model(batch, training=False), dtype=np.float32)
+
+    def preprocess(self, face_img):
+        return to_model_input(letterbox(face_img, self.input_size)[None])[0]
+
+    def embed_batch(self, faces):
+        """(n, dim) float32 embeddings for a list of BGR face crops."""
+        if not self.is_loaded:
+            self.load()
+        if not len(faces):
+            return np.zeros((0, self.dim), dtype=np.float32)
+        batch = np.stack([letterbox(face, self.input_size) for face in faces])
+        return self._forward(to_model_input(batch))
+
+    def embed(self, face_img):
+        return self.embed_batch([face_img])[0]
+
+
+_engine = None
+_engine_lock = threading.Lock()
+_model_name = None
+
+
+def set_model_name(name):
+    """Override FACE_MODEL_NAME (e.g. after a re-embedding cutover); call before first use."""
+    global _model_name
+    _model_name = name
+
+
+def model_name():
+    return _model_name or os.getenv("FACE_MODEL_NAME", DEFAULT_MODEL)
+
+
+def get_engine():
+    """Process-wide engine; the model is chosen with FACE_MODEL_NAME."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = EmbeddingEngine(model_name())
+    return _engine
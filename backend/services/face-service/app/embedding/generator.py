@@ -3,9 +3,25 @@
 
 # Registration logic (store embedding)
 from dotenv import load_dotenv
-def store_user_embedding(user_id, embedding, conn):
+def store_user_embedding(user_id, embedding, conn, commit=True):
+    # Pass commit=False to batch several writes into the caller's transaction
     cur = conn.cursor()
     cur.execute("UPDATE public.users SET embedding = %s WHERE id = %s", (embedding, user_id))
+    if commit:
+        conn.commit()
+    cur.close()
+
+def store_user_embeddings(rows, conn, page_size=500):
+    # Bulk form: rows of (user_id, embedding), one UPDATE ... FROM (VALUES) per page, one commit
+    from psycopg2.extras import execute_values
+    cur = conn.cursor()
+    execute_values(
+        cur,
+        "UPDATE public.users AS u SET embedding = v.embedding FROM (VALUES %s) AS v (id, embedding) "
+        "WHERE u.id::text = v.id",
+        [(str(user_id), embedding) for user_id, embedding in rows],
+        page_size=page_size,
+    )
     conn.commit()
     cur.close()
 
@@ -32,30 +48,35 @@ def cosine_similarity(a, b):
 # Sample registration flow for a new user
 import uuid
 
-def register_new_user(full_name, email, phone, embedding, conn):
+def register_new_user(full_name, email, phone, embedding, conn, commit=True):
     user_id = str(uuid.uuid4())
     cur = conn.cursor()
     cur.execute(
         "INSERT INTO public.users (id, full_name, email, phone, embedding) VALUES (%s, %s, %s, %s, %s)",
         (user_id, full_name, email, phone, embedding)
     )
-    conn.commit()
+    if commit:
+        conn.commit()
     cur.close()
     return user_id
 
 # Identification workflow: find user by face embedding
 
-def identify_user_by_embedding(new_embedding, conn, threshold=0.7):
-    import numpy as np
-    cur = conn.cursor()
-    cur.execute("SELECT id, full_name, embedding FROM public.users WHERE embedding IS NOT NULL")
-    users = cur.fetchall()
-    cur.close()
-    for user_id, full_name, stored_embedding in users:
-        similarity = cosine_similarity(new_embedding, stored_embedding)
-        if similarity >= threshold:
-            return {"user_id": user_id, "full_name": full_name, "similarity": similarity}
-    return None
+def identify_user_by_embedding(new_embedding, conn, threshold=0.7, index=None, names=None):
+    # Pass a prebuilt GalleryIndex (and id -> full_name map) to skip the table scan
+    if index is None:
+        cur = conn.cursor()
+        cur.execute("SELECT id, full_name, embedding FROM public.users WHERE embedding IS NOT NULL")
+        users = cur.fetchall()
+        cur.close()
+        index = GalleryIndex()
+        index.add_many([u[0] for u in users], [u[2] for u in users])
+        names = {u[0]: u[1] for u in users}
+    match = index.best_match(new_embedding, threshold)
+    if match is None:
+        return None
+    user_id, similarity = match
+    return {"user_id": user_id, "full_name": (names or {}).get(user_id), "similarity": similarity}
 
 # Example usage:
 # new_embedding = ... # Generate from detected face
@@ -69,22 +90,20 @@ def identify_user_by_embedding(new_embedding, conn, threshold=0.7):
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../detection')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 import cv2
+import numpy as np
 from face_detector import FaceDetector
-from deepface import DeepFace
+from app.similarity.matcher import GalleryIndex
+from app.embedding.engine import get_engine
 
 def generate_embedding(face_img):
-    # DeepFace expects RGB images
-    import cv2
-    import numpy as np
-    from deepface import DeepFace
-    rgb_img = cv2.cvtColor(face_img, cv2.COLOR_BGR2RGB)
-    # Set enforce_detection=False to avoid errors if DeepFace can't detect a face
-    embedding = DeepFace.represent(rgb_img, model_name='Facenet', enforce_detection=False)[0]['embedding']
+    # The engine loads the model once (TensorFlow is only imported then) and
+    # embeds the BGR crop directly, without DeepFace's detection wrapper
+    embedding = get_engine().embed(face_img)
     # Convert embedding to bytes for storage
-    embedding_bytes = np.array(embedding, dtype=np.float32).tobytes()
-    return embedding_bytes
+    return embedding.astype(np.float32).tobytes()
 
 # Example usage:
 # new_embedding = generate_embedding(face_img)
@@ -1,12 +1,16 @@
 import sys
 import os
-import time
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../detection')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 import cv2
 import numpy as np
-from generator import generate_embedding, cosine_similarity
 from face_detector import FaceDetector
+from app.application.video_pipeline import TrackingRecognizer
+from app.embedding.engine import get_engine
+from app.liveness.liveness_detector import check_liveness
+from app.similarity.matcher import GalleryIndex
+from app.infrastructure.gallery_sync import GallerySync
 from dotenv import load_dotenv
 import psycopg2
 
@@ -14,59 +18,51 @@ import psycopg2
 load_dotenv()
 conn = psycopg2.connect(os.environ["DATABASE_URL"])
 
-# Query embeddings once
-cur = conn.cursor()
-cur.execute("SELECT email, full_name, embedding FROM public.users WHERE embedding IS NOT NULL")
-users = cur.fetchall()
-cur.close()
-conn.close()
+# Bulk-load the gallery once, then pick up new enrolments in the background
+gallery = GalleryIndex()
+gallery_sync = GallerySync(lambda: psycopg2.connect(os.environ["DATABASE_URL"]), gallery)
+gallery_sync.start()
+labels = {}
+
+
+def label_for(user_id):
+    # face_embeddings carries no names; look them up once per matched user
+    if user_id not in labels:
+        lookup = conn.cursor()
+        lookup.execute("SELECT email, full_name FROM public.users WHERE id = %s", (user_id,))
+        labels[user_id] = lookup.fetchone() or (user_id, None)
+        lookup.close()
+    return labels[user_id]
 
 threshold = 0.7  # Adjust as needed
 
 cap = cv2.VideoCapture(0)
 face_detector = FaceDetector()
+engine = get_engine()
+# Detect every few frames, embed only new or uncertain tracks whose
+# last few frames pass liveness (a frozen feed fails the motion check)
+recognizer = TrackingRecognizer(face_detector.detect_faces, engine.embed_batch, gallery.search_batch, threshold=threshold,
+                                 liveness=check_liveness)
 print("Press 'q' to quit.")
 
-last_check_time = 0
-check_interval = 1.0  # seconds
-last_result = None
-last_rect = None
-
 while True:
     ret, frame = cap.read()
     if not ret:
         break
-    faces = face_detector.detect_faces(frame)
-    current_time = time.time()
-    if len(faces) > 0:
-        x, y, w, h = faces[0]
-        face_img = frame[y:y+h, x:x+w]
-        face_img = cv2.resize(face_img, (160, 160))
-        if current_time - last_check_time > check_interval:
-            embedding = generate_embedding(face_img)
-            best_match = None
-            best_similarity = 0
-            for email, full_name, stored_embedding in users:
-                similarity = cosine_similarity(embedding, stored_embedding)
-                if similarity > best_similarity:
-                    best_similarity = similarity
-                    best_match = (email, full_name)
-            color = (0, 0, 255)  # Red by default
-            label = f"Access Denied"
-            if best_match and best_similarity >= threshold:
-                color = (0, 255, 0)  # Green
-                label = f"{best_match[1] if best_match[1] else best_match[0]}"  # Show name or email
-            last_result = (label, color)
-            last_rect = (x, y, w, h)
-            last_check_time = current_time
-        # Draw last result
-        if last_result and last_rect:
-            label, color = last_result
-            x, y, w, h = last_rect
-            cv2.rectangle(frame, (x, y), (x+w, y+h), color, 2)
-            cv2.putText(frame, label, (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
+    for track in recognizer.process(frame):
+        x, y, w, h = track.box
+        color = (0, 0, 255)  # Red by default
+        label = f"Access Denied"
+        if track.identified:
+            best_match = label_for(track.user_id)
+            color = (0, 255, 0)  # Green
+            label = f"{best_match[1] if best_match[1] else best_match[0]}"  # Show name or email
+        cv2.rectangle(frame, (x, y), (x+w, y+h), color, 2)
+        cv2.putText(frame, label, (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
     cv2.imshow("Lounge Face Verification", frame)
     if cv2.waitKey(1) & 0xFF == ord('q'):
         break
 cap.release()
 cv2.destroyAllWindows()
+gallery_sync.stop()
+conn.close()
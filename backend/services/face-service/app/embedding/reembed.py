@@ -0,0 +1,261 @@
+"""
+Resumable re-embedding of every enrolment under a new face model.
+
+    python app/embedding/reembed.py --job facenet-to-arcface --target-model ArcFace --workers 4
+    python app/embedding/reembed.py --job facenet-to-arcface --target-model ArcFace --images /data/enrolments
+
+Streams enrolment crops (face_enrolment_crops, kept when the service runs
+with FACE_KEEP_ENROLMENT_CROPS=true) or a directory of photos
+(<images>/<user_id>/*.jpg, faces are detected first) in keyset-ordered
+chunks of users. Decoding runs on a thread pool, inference on the shared
+memory InferencePool, and the next chunk is read while the current one is
+embedded. Each chunk's fused templates are COPYed into
+face_embeddings_next and the job's checkpoint advanced in the same
+transaction, so a killed run resumes exactly where it stopped.
+
+After the main pass a catch-up pass re-embeds users re-enrolled since the
+job started (crops newer than its watermark), then the job is marked
+complete. Services started with FACE_REEMBED_JOB=<job> keep reading
+face_embeddings with the old model until then, and switch to
+face_embeddings_next and the target model on their next start. Run the
+job once more right before restarting to catch late re-enrolments.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import numpy as np
+
+from app.detection.detector import FaceDetectionError, decode_image, detect_single_face
+from app.infrastructure.db import connect
+from app.infrastructure.reembed_repository import (
+    complete_job,
+    fetch_crops_after,
+    fetch_crops_since,
+    fetch_user_lounges,
+    save_checkpoint,
+    start_job,
+)
+from app.infrastructure.vector_repository import copy_face_templates
+from app.similarity.templates import fuse_templates
+
+TARGET_TABLE = "face_embeddings_next"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+# ── sources ────────────────────────────────────────────────────────────
+
+class CropSource:
+    """Stored enrolment crops, read on a connection of its own."""
+
+    detect = False
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def after(self, user_id, limit):
+        return fetch_crops_after(self._conn, user_id, limit)
+
+    def since(self, watermark, limit):
+        return fetch_crops_since(self._conn, watermark, limit)
+
+
+class ImageSource:
+    """<root>/<user_id>/*.jpg; file mtimes stand in for created_at."""
+
+    detect = True
+
+    def __init__(self, root):
+        self.root = root
+
+    def _entry(self, user_id):
+        folder = os.path.join(self.root, user_id)
+        paths = sorted(p for p in os.listdir(folder) if p.lower().endswith(IMAGE_EXTENSIONS))
+        crops = []
+        for path in paths:
+            with open(os.path.join(folder, path), "rb") as f:
+                crops.append(f.read())
+        newest = max((os.path.getmtime(os.path.join(folder, p)) for p in paths), default=0)
+        return {"user_id": user_id, "lounge_id": None, "crops": crops,
+                "created_at": datetime.fromtimestamp(newest)}
+
+    def _users(self):
+        return sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+
+    def after(self, user_id, limit):
+        users = [u for u in self._users() if user_id is None or u > user_id][:limit]
+        return [self._entry(u) for u in users]
+
+    def since(self, watermark, limit):
+        entries = [self._entry(u) for u in self._users()]
+        entries = [e for e in entries if e["created_at"] > watermark]
+        return sorted(entries, key=lambda e: e["created_at"])[:limit]
+
+
+# ── embedding ──────────────────────────────────────────────────────────
+
+def _faces(entry, detect):
+    faces = []
+    for content in entry["crops"]:
+        try:
+            faces.append(detect_single_face(content) if detect else decode_image(content, 0))
+        except FaceDetectionError:
+            continue
+    return faces
+
+
+def _embed(embedder, faces, slots):
+    # The pool admits at most `slots` crops in flight
+    out = []
+    for start in range(0, len(faces), slots):
+        out.append(embedder.embed(faces[start:start + slots]))
+    return np.concatenate(out) if out else np.zeros((0, 0), dtype=np.float32)
+
+
+def embed_chunk(entries, embedder, decoders, detect, slots, model_name, max_templates):
+    """Template rows for the users in `entries`, plus the number that failed."""
+    faces = list(decoders.map(lambda e: _faces(e, detect), entries))
+    flat = [face for user_faces in faces for face in user_faces]
+    embeddings = _embed(embedder, flat, slots)
+    rows, failed, offset = [], 0, 0
+    for entry, user_faces in zip(entries, faces):
+        if not user_faces:
+            failed += 1
+            continue
+        user_embeddings = embeddings[offset:offset + len(user_faces)]
+        offset += len(user_faces)
+        fused, templates = fuse_templates(user_embeddings, max_templates=max_templates)
+        rows.append((entry["user_id"], fused, templates, entry["lounge_id"], model_name))
+    return rows, failed
+
+
+# ── job ────────────────────────────────────────────────────────────────
+
+def _newest(entries):
+    return max(e["created_at"] for e in entries)
+
+
+def run_pass(job, conn, fetch, cursor, advance, embed, catch_up=False):
+    """
+    One pass over the source: fetch(cursor) returns the next entries and
+    advance(entries) the cursor after them. Each chunk's rows and the
+    checkpoint commit together; the next chunk is read while the current
+    one is embedded. Yields (stored, failed) per chunk.
+    """
+    with ThreadPoolExecutor(max_workers=1) as prefetch:
+        pending = prefetch.submit(fetch, cursor)
+        while True:
+            entries = pending.result()
+            if not entries:
+                return
+            cursor = advance(entries)
+            pending = prefetch.submit(fetch, cursor)
+            rows, failed = embed(entries)
+            lounges = fetch_user_lounges(conn, [r[0] for r in rows])
+            # The live mapping wins; a crop's lounge covers users not in it yet
+            rows = [(u, f, t, lounges.get(u) or lounge, m) for u, f, t, lounge, m in rows]
+            copy_face_templates(conn, rows, TARGET_TABLE)
+            if catch_up:
+                save_checkpoint(conn, job, len(rows), failed, watermark=cursor)
+            else:
+                save_checkpoint(conn, job, len(rows), failed, last_user_id=cursor)
+            conn.commit()
+            yield len(rows), failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--job", required=True, help="checkpoint name; rerun with the same name to resume")
+    parser.add_argument("--target-model", required=True, help="DeepFace model name, e.g. ArcFace")
+    parser.add_argument("--source-model", default=os.getenv("FACE_MODEL_NAME", "ArcFace"))
+    parser.add_argument("--images", help="read <images>/<user_id>/*.jpg instead of stored crops")
+    parser.add_argument("--chunk", type=int, default=256, help="users per transaction")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="inference processes (0 = in-process)")
+    parser.add_argument("--decoders", type=int, default=4, help="decode/detect threads")
+    parser.add_argument("--input-size", type=int, help="model input side for the pool (default: the target model's)")
+    parser.add_argument("--max-templates", type=int, default=int(os.getenv("FACE_MAX_TEMPLATES", "3")))
+    parser.add_argument("--max-users", type=int, help="stop after this many users (resume later)")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    conn = connect()
+    read_conn = connect()
+    read_conn.autocommit = True
+    job = start_job(conn, args.job, args.source_model, args.target_model)
+    if job["target_model"] != args.target_model:
+        sys.exit(f"Job {args.job} targets {job['target_model']}, not {args.target_model}")
+    source = ImageSource(args.images) if args.images else CropSource(read_conn)
+
+    if args.workers > 0:
+        from app.embedding.engine import EmbeddingEngine, model_spec
+        from app.embedding.worker_pool import InferencePool
+
+        size, dim = model_spec(args.target_model)
+        if args.input_size:
+            size = (args.input_size, args.input_size)
+        if size is None or dim is None:
+            # Known models come from the spec table; anything else is built
+            # once here just to read its input shape and embedding size
+            probe = EmbeddingEngine(args.target_model).load()
+            size, dim = size or probe.input_size, probe.dim
+        embedder = InferencePool(args.workers, model_name=args.target_model, input_size=size, dim=dim).start()
+        slots = embedder.slots
+    else:
+        from app.embedding.engine import EmbeddingEngine
+
+        embedder = EmbeddingEngine(args.target_model).load()
+        slots = 64
+
+    decoders = ThreadPoolExecutor(max_workers=args.decoders, thread_name_prefix="reembed-decode")
+    embed = partial(
+        embed_chunk, embedder=embedder, decoders=decoders, detect=source.detect, slots=slots,
+        model_name=args.target_model, max_templates=args.max_templates,
+    )
+
+    done = failed = 0
+    started = time.perf_counter()
+
+    def report(stage):
+        rate = done / max(time.perf_counter() - started, 1e-9)
+        print(f"[reembed] {stage}: {done} users ({failed} failed), {rate:.1f} users/s")
+
+    try:
+        passes = []
+        if job["status"] != "complete":
+            passes.append(("main", run_pass(
+                args.job, conn, lambda user_id: source.after(user_id, args.chunk),
+                job["last_user_id"], lambda entries: entries[-1]["user_id"], embed,
+            )))
+        passes.append(("catch-up", run_pass(
+            args.job, conn, lambda since: source.since(since, args.chunk),
+            job["watermark"], _newest, embed, catch_up=True,
+        )))
+        for name, chunks in passes:
+            for stored, bad in chunks:
+                done += stored
+                failed += bad
+                report(name)
+                if args.max_users and done + failed >= args.max_users:
+                    chunks.close()  # waits for the in-flight prefetch
+                    print(f"[reembed] stopping after {done + failed} users; rerun to resume")
+                    return
+        complete_job(conn, args.job)
+        report("complete")
+    finally:
+        decoders.shutdown()
+        if args.workers > 0:
+            embedder.stop()
+        conn.close()
+        read_conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,18 @@
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../detection')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 import cv2
 import numpy as np
-from generator import generate_embedding
 from face_detector import FaceDetector
+from app.embedding.engine import get_engine, model_name
+from app.infrastructure.vector_repository import upsert_face_template
 from dotenv import load_dotenv
 import psycopg2
 
 # Registration script: prompt for email and name, capture face, store embedding
+# in face_embeddings, where the attendance and verification scripts read it
 load_dotenv()
 conn = psycopg2.connect(os.environ["DATABASE_URL"])
 cur = conn.cursor()
@@ -33,18 +36,20 @@ while True:
         if len(faces) > 0:
             x, y, w, h = faces[0]
             face_img = frame[y:y+h, x:x+w]
-            face_img = cv2.resize(face_img, (160, 160))
-            embedding = generate_embedding(face_img)
-            # Update or insert user embedding
+            # The engine letterboxes to its model's input size
+            embedding = get_engine().embed(face_img)
+            # Names stay on public.users; the template goes to face_embeddings
             cur.execute("SELECT id FROM public.users WHERE email = %s", (email,))
             result = cur.fetchone()
             if result:
-                cur.execute("UPDATE public.users SET full_name = %s, embedding = %s WHERE email = %s", (name, embedding, email))
+                user_id = result[0]
+                cur.execute("UPDATE public.users SET full_name = %s WHERE id = %s", (name, user_id))
             else:
                 import uuid
                 user_id = str(uuid.uuid4())
-                cur.execute("INSERT INTO public.users (id, full_name, email, embedding) VALUES (%s, %s, %s, %s)", (user_id, name, email, embedding))
+                cur.execute("INSERT INTO public.users (id, full_name, email) VALUES (%s, %s, %s)", (user_id, name, email))
             conn.commit()
+            upsert_face_template(conn, user_id, embedding, model_name=model_name())
             print(f"Registration successful for {name} ({email})!")
         else:
             print("No face detected. Try again.")
@@ -0,0 +1,346 @@
+import asyncio
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from multiprocessing import connection, shared_memory
+
+import numpy as np
+
+from app.application.pipeline import StageOverloaded
+from app.embedding.engine import DEFAULT_MODEL, EmbeddingEngine, letterbox, model_spec, to_model_input
+
+
+def _worker_main(worker_id, cpus, model_name, size, dim, slots, in_name, out_name,
+                 tasks, results, max_batch, max_wait):
+    # Pin before TensorFlow starts its thread pools so they size to our cores
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    threads = str(max(1, len(cpus) if cpus else 1))
+    os.environ["TF_NUM_INTRAOP_THREADS"] = threads
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    os.environ["OMP_NUM_THREADS"] = threads
+
+    engine = EmbeddingEngine(model_name).load()
+    if engine.input_size != tuple(size):
+        results.send(("error", worker_id, f"model expects {engine.input_size}, slots are {size}"))
+        return
+    if engine.dim != dim:
+        results.send(("error", worker_id, f"model produces {engine.dim}-D embeddings, slots hold {dim}"))
+        return
+    in_shm = shared_memory.SharedMemory(name=in_name)
+    out_shm = shared_memory.SharedMemory(name=out_name)
+    crops = np.ndarray((slots, *size, 3), dtype=np.uint8, buffer=in_shm.buf)
+    out = np.ndarray((slots, dim), dtype=np.float32, buffer=out_shm.buf)
+    results.send(("ready", worker_id, engine.dim))
+
+    try:
+        while True:
+            first = tasks.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.monotonic() + max_wait
+            while len(batch) < max_batch:
+                try:
+                    item = tasks.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    tasks.put(None)
+                    break
+                batch.append(item)
+            try:
+                # Crops are already letterboxed to the model input
+                out[batch] = engine._forward(to_model_input(crops[batch]))
+                results.send(("done", worker_id, (batch, None)))
+            except Exception as exc:
+                results.send(("done", worker_id, (batch, repr(exc))))
+    finally:
+        del crops, out
+        in_shm.close()
+        out_shm.close()
+
+
+class InferencePool:
+    """
+    Pool of pinned inference processes fed through shared memory.
+
+    The HTTP process letterboxes each crop straight into a free slot of a
+    shared uint8 ring and sends only the slot number to the workers; each
+    worker holds its own warmed model, micro-batches slot numbers and
+    writes embeddings into a shared float32 ring. No pixels are pickled.
+
+    Exposes the same submit/embed/embed_async API as MicroBatcher.
+
+    Each worker has its own task queue, so the parent always knows which
+    slots a worker holds, and its own result pipe, so a worker killed
+    mid-write cannot leave a shared lock held. The result listener also
+    watches the workers: a
+    process that exits fails every crop dispatched to it and is respawned
+    (at most once per `respawn_backoff` seconds), and a crop not embedded
+    within `timeout` seconds fails with TimeoutError. A slot is only
+    reused once its worker has finished with it or died holding it.
+    """
+
+    def __init__(self, workers, model_name=DEFAULT_MODEL, input_size=None, dim=None, slots=256,
+                 max_batch=16, max_wait=0.005, pin=True, timeout=30.0, respawn_backoff=10.0):
+        self.workers = workers
+        self.model_name = model_name
+        # Slots are sized before any worker has built the model; a worker
+        # whose model disagrees refuses to start
+        spec_size, spec_dim = model_spec(model_name)
+        input_size = input_size or spec_size
+        if input_size is None:
+            raise ValueError(f"unknown input size for {model_name}; pass input_size")
+        self.input_size = tuple(input_size)
+        self.dim = dim or spec_dim
+        if self.dim is None:
+            raise ValueError(f"unknown embedding size for {model_name}; pass dim")
+        self.slots = slots
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.pin = pin
+        self.timeout = timeout
+        self.respawn_backoff = respawn_backoff
+        self.worker_deaths = 0
+        self._procs = []
+        self._queues = {}
+        self._readers = {}  # worker_id -> receiving end of its result pipe
+        self._assigned = {}  # worker_id -> slots dispatched to it, not yet done
+        self._dispatch_lock = threading.Lock()
+        self._respawn_at = {}
+        self._spawned_at = {}
+        self._ctx = mp.get_context("spawn")
+        self._free = queue.Queue()
+        self._futures = {}
+        self._listener = None
+        self._closing = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self):
+        return self.slots - self._free.qsize()
+
+    def _cpu_sets(self):
+        if not self.pin or not hasattr(os, "sched_getaffinity"):
+            return [None] * self.workers
+        cpus = sorted(os.sched_getaffinity(0))
+        per = max(1, len(cpus) // self.workers)
+        return [set(cpus[i * per:(i + 1) * per]) or {cpus[i % len(cpus)]} for i in range(self.workers)]
+
+    def start(self, timeout=300):
+        with self._lock:
+            if self._started:
+                return self
+            h, w = self.input_size
+            self._free = queue.Queue()
+            self._in_shm = shared_memory.SharedMemory(create=True, size=self.slots * h * w * 3)
+            self._out_shm = shared_memory.SharedMemory(create=True, size=self.slots * self.dim * 4)
+            self._crops = np.ndarray((self.slots, h, w, 3), dtype=np.uint8, buffer=self._in_shm.buf)
+            self._out = np.ndarray((self.slots, self.dim), dtype=np.float32, buffer=self._out_shm.buf)
+            for slot in range(self.slots):
+                self._free.put(slot)
+            self._cpus = self._cpu_sets()
+            self._procs = [self._spawn(worker_id) for worker_id in range(self.workers)]
+            waiting = dict(self._readers)
+            deadline = time.monotonic() + timeout
+            while waiting:
+                readable = connection.wait(list(waiting.values()), max(0.0, deadline - time.monotonic()))
+                if not readable:
+                    self._shutdown()
+                    raise TimeoutError(f"inference workers not ready within {timeout}s")
+                for worker_id, reader in list(waiting.items()):
+                    if reader not in readable:
+                        continue
+                    try:
+                        kind, _, payload = reader.recv()
+                    except EOFError:
+                        kind, payload = "error", "exited while loading"
+                    if kind == "error":
+                        self._shutdown()
+                        raise RuntimeError(f"inference worker {worker_id} failed: {payload}")
+                    del waiting[worker_id]
+            self._closing.clear()
+            self._listener = threading.Thread(target=self._collect, name="face-infer-results", daemon=True)
+            self._listener.start()
+            self._started = True
+            print(f"[embedding] {self.workers} inference workers ready ({self.model_name}, {self.dim}-D)")
+        return self
+
+    def _spawn(self, worker_id):
+        # A fresh queue: what the previous process held was failed when it
+        # died; only slots dispatched to it since then are handed over
+        with self._dispatch_lock:
+            self._queues[worker_id] = tasks = self._ctx.Queue()
+            for slot in self._assigned.setdefault(worker_id, set()):
+                tasks.put(slot)
+        self._close_reader(worker_id)
+        reader, writer = self._ctx.Pipe(duplex=False)
+        proc = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self._cpus[worker_id], self.model_name, self.input_size, self.dim, self.slots,
+                  self._in_shm.name, self._out_shm.name, tasks, writer,
+                  self.max_batch, self.max_wait),
+            name=f"face-infer-{worker_id}",
+            daemon=True,
+        )
+        proc.start()
+        writer.close()  # the worker's copy is the only writer, so its exit reads as EOF
+        self._readers[worker_id] = reader
+        self._spawned_at[worker_id] = time.monotonic()
+        return proc
+
+    def _close_reader(self, worker_id):
+        reader = self._readers.pop(worker_id, None)
+        if reader is not None:
+            reader.close()
+
+    def _drain(self, worker_id):
+        """Every complete message waiting from a worker; closes its pipe at EOF."""
+        reader = self._readers.get(worker_id)
+        messages = []
+        try:
+            while reader is not None and reader.poll():
+                messages.append(reader.recv())
+        except (EOFError, OSError):
+            # The worker exited (a message it was cut off writing is lost);
+            # _check_workers fails what it still held
+            self._close_reader(worker_id)
+        return messages
+
+    def _collect(self):
+        while not self._closing.is_set():
+            try:
+                # An idle second still runs the liveness and timeout checks
+                readable = connection.wait(list(self._readers.values()), 1.0)
+                for worker_id, reader in list(self._readers.items()):
+                    if reader in readable:
+                        for message in self._drain(worker_id):
+                            self._handle(*message)
+                self._check_workers()
+                self._expire()
+            except Exception as exc:
+                # The listener is the only thing returning slots; it must not die
+                print(f"[embedding] result listener error: {exc!r}")
+
+    def _handle(self, kind, worker_id, payload):
+        if kind == "done":
+            batch, error = payload
+            with self._dispatch_lock:
+                owned = self._assigned[worker_id]
+                batch = [slot for slot in batch if slot in owned]
+                owned.difference_update(batch)
+            for slot in batch:
+                self._finish(slot, error)
+        elif kind == "ready":
+            print(f"[embedding] inference worker {worker_id} ready again")
+        elif kind == "error":
+            print(f"[embedding] inference worker {worker_id} failed to restart: {payload}")
+
+    def _finish(self, slot, error=None):
+        entry = self._futures.pop(slot, None)
+        if entry is not None:
+            future = entry[0]
+            try:
+                if error:
+                    future.set_exception(RuntimeError(error))
+                else:
+                    future.set_result(self._out[slot].copy())
+            except InvalidStateError:
+                pass  # cancelled by its waiter or already timed out
+        self._free.put(slot)
+
+    def _check_workers(self):
+        now = time.monotonic()
+        for worker_id, proc in enumerate(self._procs):
+            if proc.is_alive():
+                continue
+            if worker_id not in self._respawn_at:
+                self.worker_deaths += 1
+                # Apply whatever it sent before exiting, so finished crops
+                # are not failed with the rest
+                for message in self._drain(worker_id):
+                    self._handle(*message)
+                self._close_reader(worker_id)
+                with self._dispatch_lock:
+                    batch, self._assigned[worker_id] = self._assigned[worker_id], set()
+                print(f"[embedding] inference worker {worker_id} exited ({proc.exitcode}), "
+                      f"failing {len(batch)} crops")
+                for slot in batch:
+                    self._finish(slot, f"inference worker {worker_id} exited")
+                # A worker that dies while loading is not restarted in a tight loop
+                self._respawn_at[worker_id] = max(now, self._spawned_at[worker_id] + self.respawn_backoff)
+            if now >= self._respawn_at[worker_id]:
+                del self._respawn_at[worker_id]
+                self._procs[worker_id] = self._spawn(worker_id)
+
+    def _expire(self):
+        deadline = time.monotonic() - self.timeout
+        for future, submitted in list(self._futures.values()):
+            if submitted < deadline and not future.done():
+                try:
+                    future.set_exception(TimeoutError(f"no inference result within {self.timeout:.0f}s"))
+                except InvalidStateError:
+                    pass
+
+    def submit(self, faces):
+        if not self._started:
+            self.start()
+        slots = []
+        try:
+            for _ in faces:
+                slots.append(self._free.get_nowait())
+        except queue.Empty:
+            for slot in slots:
+                self._free.put(slot)
+            raise StageOverloaded("embed")
+        futures = []
+        for slot, face in zip(slots, faces):
+            self._crops[slot] = letterbox(face, self.input_size)
+            future = Future()
+            self._futures[slot] = (future, time.monotonic())
+            futures.append(future)
+        with self._dispatch_lock:
+            # Least-loaded live worker; a dead one only if all are down
+            live = [w for w in self._assigned if w not in self._respawn_at] or list(self._assigned)
+            worker_id = min(live, key=lambda w: len(self._assigned[w]))
+            self._assigned[worker_id].update(slots)
+            for slot in slots:
+                self._queues[worker_id].put(slot)
+        return futures
+
+    def embed(self, faces):
+        return np.stack([f.result() for f in self.submit(faces)])
+
+    async def embed_async(self, faces):
+        futures = [asyncio.wrap_future(f) for f in self.submit(faces)]
+        return np.stack(await asyncio.gather(*futures))
+
+    def _shutdown(self):
+        for tasks in self._queues.values():
+            tasks.put(None)
+        for proc in self._procs:
+            proc.join(timeout=10)
+            if proc.is_alive():
+                proc.terminate()
+        self._procs = []
+        for worker_id in list(self._readers):
+            self._close_reader(worker_id)
+        self._crops = self._out = None
+        self._in_shm.close()
+        self._in_shm.unlink()
+        self._out_shm.close()
+        self._out_shm.unlink()
+
+    def stop(self):
+        with self._lock:
+            if not self._started:
+                return
+            self._closing.set()
+            self._listener.join()
+            self._shutdown()
+            self._started = False
@@ -0,0 +1,234 @@
+import json
+import os
+import threading
+import uuid
+from collections import deque
+from datetime import datetime
+
+import psycopg2
+
+from app.infrastructure.attendance_repository import DEFAULT_TABLE, close_sessions, insert_checkins
+from app.observability.metrics import timed
+
+
+class AttendanceRecorder:
+    """
+    Write-behind recorder for check-in / check-out events.
+
+    check_in() and check_out() only append the event to a local JSON-lines
+    spool and an in-memory queue, so the camera loop never waits on the
+    database. A background thread flushes the queue once `batch_size`
+    events are waiting or every `flush_interval` seconds: all check-ins in
+    one multi-row INSERT, then all check-outs in one UPDATE ... FROM VALUES,
+    in a single transaction. The spool is rewritten with whatever is still
+    unflushed after each commit and replayed on start, so events survive a
+    database outage or a crash. Delivery is at-least-once: a crash between
+    commit and spool rewrite replays that batch, which is harmless because
+    check-ins carry their event id (migration 018) and check-outs are
+    idempotent.
+
+    A batch the database rejects for its data (a constraint, a malformed
+    id) is bisected until the offending events are isolated; those go to
+    a dead-letter file next to the spool (`<spool>.dead`) and the rest are
+    written, so one bad event cannot hold up the queue. Connection errors
+    leave the whole batch queued for the next tick.
+    """
+
+    def __init__(self, connect, spool_path, table=DEFAULT_TABLE, batch_size=200,
+                 flush_interval=2.0, fsync=True):
+        self._connect = connect
+        self.table = table
+        self.spool_path = spool_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._conn = None
+        self._spool = None
+        self.dead_letter_path = spool_path + ".dead"
+        self.flushed = 0
+        self.failures = 0
+        self.dead_letters = 0
+        self._replay()
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    # ── spool ──────────────────────────────────────────────────────────
+
+    def _replay(self):
+        if os.path.exists(self.spool_path):
+            with open(self.spool_path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        break  # torn last line from a crash mid-write
+                    event.setdefault("event_id", uuid.uuid4().hex)  # spooled before ids existed
+                    self._pending.append(event)
+            if self._pending:
+                print(f"[attendance] replaying {len(self._pending)} spooled events")
+        self._spool = open(self.spool_path, "a", encoding="utf-8")
+
+    def _append(self, event):
+        self._spool.write(json.dumps(event) + "\n")
+        self._spool.flush()
+        if self.fsync:
+            os.fsync(self._spool.fileno())
+
+    def _rewrite_spool(self):
+        tmp = self.spool_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for event in self._pending:
+                f.write(json.dumps(event) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._spool.close()
+        os.replace(tmp, self.spool_path)
+        self._spool = open(self.spool_path, "a", encoding="utf-8")
+
+    # ── producers ──────────────────────────────────────────────────────
+
+    def _record(self, event):
+        with self._lock:
+            self._append(event)
+            self._pending.append(event)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def check_in(self, user_id, lounge_id, at=None):
+        at = at or datetime.now()
+        self._record({
+            "kind": "checkin",
+            "event_id": uuid.uuid4().hex,
+            "user_id": str(user_id),
+            "lounge_id": str(lounge_id),
+            "checkin_time": at.isoformat(),
+        })
+        return at
+
+    def check_out(self, user_id, lounge_id, checkin_time, at=None):
+        at = at or datetime.now()
+        self._record({
+            "kind": "checkout",
+            "event_id": uuid.uuid4().hex,
+            "user_id": str(user_id),
+            "lounge_id": str(lounge_id),
+            "checkin_time": checkin_time.isoformat(),
+            "checkout_time": at.isoformat(),
+        })
+        return at
+
+    # ── flushing ───────────────────────────────────────────────────────
+
+    def _write(self, events):
+        """Store `events` in one transaction; rolls back and raises on failure."""
+        checkins = [
+            (e["event_id"], e["user_id"], e["lounge_id"], datetime.fromisoformat(e["checkin_time"]))
+            for e in events if e["kind"] == "checkin"
+        ]
+        checkouts = [
+            (e["user_id"], e["lounge_id"], datetime.fromisoformat(e["checkin_time"]),
+             datetime.fromisoformat(e["checkout_time"]))
+            for e in events if e["kind"] == "checkout"
+        ]
+        if self._conn is None or self._conn.closed:
+            self._conn = self._connect()
+        try:
+            with timed("attendance_flush"), self._conn.cursor() as cur:
+                # Inserts first so a session opened and closed in the same
+                # batch is there to be closed
+                insert_checkins(cur, checkins, self.table)
+                close_sessions(cur, checkouts, self.table)
+            self._conn.commit()
+        except Exception:
+            self._conn.rollback()
+            raise
+
+    def _store(self, events):
+        """
+        Write `events`, bisecting around any the database rejects for
+        their content. Returns [(event, error)] for the rejected ones;
+        connection errors propagate.
+        """
+        try:
+            self._write(events)
+            return []
+        except (psycopg2.DataError, psycopg2.IntegrityError, KeyError, ValueError) as exc:
+            if len(events) == 1:
+                return [(events[0], exc)]
+        mid = len(events) // 2
+        return self._store(events[:mid]) + self._store(events[mid:])
+
+    def _dead_letter(self, rejected):
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            for event, exc in rejected:
+                f.write(json.dumps({"event": event, "error": str(exc).strip()}) + "\n")
+                print(f"[attendance] dead-lettered {event.get('kind')} for {event.get('user_id')}: {exc}")
+            f.flush()
+            os.fsync(f.fileno())
+        self.dead_letters += len(rejected)
+
+    def flush(self):
+        """Write out up to one batch; returns the number of events taken off the queue."""
+        with self._lock:
+            batch = [self._pending[i] for i in range(min(self.batch_size, len(self._pending)))]
+        if not batch:
+            return 0
+        rejected = self._store(batch)
+        if rejected:
+            self._dead_letter(rejected)
+        with self._lock:
+            for _ in batch:
+                self._pending.popleft()
+            self._rewrite_spool()
+        self.flushed += len(batch) - len(rejected)
+        return len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                while self.flush() == self.batch_size:
+                    pass
+            except Exception as exc:
+                # Events stay queued and spooled; retry on the next tick
+                self.failures += 1
+                print(f"[attendance] flush failed, {self.pending} events pending: {exc}")
+                if self._conn is not None:
+                    self._conn.close()
+                self._conn = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="attendance-recorder", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the flusher after a last attempt to drain the queue."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            while self.flush():
+                pass
+        except Exception as exc:
+            print(f"[attendance] {self.pending} events left in {self.spool_path}: {exc}")
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        self._spool.close()
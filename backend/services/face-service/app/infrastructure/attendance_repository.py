@@ -0,0 +1,59 @@
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+# Session tables share (user_id, lounge_id, checkin_time, checkout_time):
+# attendance_log for the service, lounge_attendance for the kiosk scripts
+DEFAULT_TABLE = "attendance_log"
+
+
+def insert_checkins(cur, rows, table=DEFAULT_TABLE):
+    """
+    rows: [(event_id, user_id, lounge_id, checkin_time), ...] in one
+    statement. An event_id already stored (a replayed spool) is skipped.
+    """
+    if rows:
+        execute_values(
+            cur,
+            sql.SQL(
+                "INSERT INTO {} (event_id, user_id, lounge_id, checkin_time) VALUES %s "
+                "ON CONFLICT (event_id) DO NOTHING"
+            ).format(sql.Identifier(table)),
+            rows,
+            template="(%s::uuid, %s, %s, %s)",
+            page_size=len(rows),
+        )
+
+
+def close_sessions(cur, rows, table=DEFAULT_TABLE):
+    """
+    rows: [(user_id, lounge_id, checkin_time, checkout_time), ...]; sets
+    checkout_time on each matching session with one UPDATE ... FROM VALUES.
+    """
+    if rows:
+        execute_values(
+            cur,
+            sql.SQL("""
+            UPDATE {} AS a
+            SET checkout_time = v.checkout_time
+            FROM (VALUES %s) AS v (user_id, lounge_id, checkin_time, checkout_time)
+            WHERE a.user_id::text = v.user_id
+              AND a.lounge_id::text = v.lounge_id
+              AND a.checkin_time = v.checkin_time
+            """).format(sql.Identifier(table)),
+            rows,
+            template="(%s, %s, %s::timestamp, %s::timestamp)",
+            page_size=len(rows),
+        )
+
+
+def fetch_open_sessions(conn, table=DEFAULT_TABLE):
+    """Today's sessions without a check-out, as (user_id, lounge_id, checkin_time)."""
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("""
+            SELECT user_id::text, lounge_id::text, checkin_time
+            FROM {}
+            WHERE checkout_time IS NULL
+              AND checkin_time >= CURRENT_DATE
+            ORDER BY checkin_time
+        """).format(sql.Identifier(table)))
+        return cur.fetchall()
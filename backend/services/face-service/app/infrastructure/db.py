@@ -0,0 +1,228 @@
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import errorcodes, extensions
+
+# Named server-side statements need a session-pooled (or direct) connection;
+# behind a transaction-mode pooler such as Supavisor :6543 each transaction
+# may land on a different backend, so they are opt-in
+PREPARE_STATEMENTS = os.getenv("FACE_DB_PREPARE", "false").lower() == "true"
+
+# The backend does not hold what we think it prepared (a pooler moved us,
+# or the server restarted): forget the cache and prepare again
+_STALE_STATEMENT = {errorcodes.INVALID_SQL_STATEMENT_NAME, errorcodes.DUPLICATE_PREPARED_STATEMENT}
+
+
+class PoolExhausted(Exception):
+    """No connection freed up within the pool timeout; the API maps it to 503."""
+
+
+def connect(dsn=None):
+    """A new connection with TCP keepalives, so idle pooled sockets are noticed."""
+    return psycopg2.connect(
+        dsn or os.environ["DATABASE_URL"],
+        application_name="face-service",
+        keepalives=1,
+        keepalives_idle=30,
+        keepalives_interval=10,
+        keepalives_count=3,
+    )
+
+
+class ConnectionPool:
+    """
+    Bounded, blocking pool of psycopg2 connections.
+
+    At most `max_size` connections exist; a caller that finds all of them
+    checked out waits up to `timeout` seconds and then gets PoolExhausted
+    instead of opening one more (Supabase caps connections per project).
+    Idle connections are reused most-recent-first and closed after
+    `max_idle` seconds, and anything returned mid-transaction is rolled
+    back. The pool is thread-based: FastAPI handlers reach it from the
+    stage executor threads, never from the event loop.
+    """
+
+    def __init__(self, connect=connect, max_size=8, min_size=0, timeout=5.0, max_idle=300.0):
+        self._connect = connect
+        self.max_size = max_size
+        self.min_size = min_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle = []  # (conn, returned_at), most recent last
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.created = 0
+        self.timeouts = 0
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def fill(self):
+        """Open `min_size` connections up front so early requests skip TCP/TLS setup."""
+        with self._lock:
+            missing = self.min_size - len(self._idle) - self.in_use
+        for _ in range(max(0, missing)):
+            conn = self._connect()
+            self.created += 1
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+
+    def _take_idle(self):
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                conn, returned = self._idle.pop()
+            if not conn.closed and now - returned < self.max_idle:
+                return conn
+            _close(conn)
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            self.timeouts += 1
+            raise PoolExhausted(f"No database connection free after {self.timeout}s")
+        try:
+            conn = self._take_idle()
+            if conn is None:
+                conn = self._connect()
+                self.created += 1
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.in_use += 1
+        return conn
+
+    def release(self, conn, broken=False):
+        try:
+            if not broken and not conn.closed:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                with self._lock:
+                    self._idle.append((conn, time.monotonic()))
+            else:
+                _close(conn)
+        except Exception:
+            _close(conn)
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """`with pool.connection() as conn:`; the caller commits its own work."""
+        conn = self.acquire()
+        try:
+            yield conn
+        except BaseException:
+            broken = False
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True  # the socket is gone; don't hand it out again
+            self.release(conn, broken)
+            raise
+        self.release(conn)
+
+    def run(self, fn, *args):
+        """fn(conn, *args) on a pooled connection."""
+        with self.connection() as conn:
+            return fn(conn, *args)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            _close(conn)
+
+    def stats(self):
+        return {
+            "max_size": self.max_size,
+            "in_use": self.in_use,
+            "idle": self.idle,
+            "created": self.created,
+            "timeouts": self.timeouts,
+        }
+
+
+def _close(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+# ── prepared statements ───────────────────────────────────────────────
+
+_prepared = weakref.WeakKeyDictionary()  # connection -> statement names
+_prepared_lock = threading.Lock()
+
+
+def _numbered(sql):
+    parts = sql.split("%s")
+    return "".join(part + (f"${i + 1}" if i < len(parts) - 1 else "") for i, part in enumerate(parts))
+
+
+def _known_statements(cur):
+    conn = cur.connection
+    with _prepared_lock:
+        names = _prepared.get(conn)
+    if names is None:
+        # First use of this connection, or state lost after an error: ask
+        # the session which statements it already holds
+        cur.execute("SELECT name FROM pg_prepared_statements")
+        names = {r[0] for r in cur.fetchall()}
+        with _prepared_lock:
+            _prepared[conn] = names
+    return names
+
+
+def _execute_prepared(cur, name, sql, params):
+    names = _known_statements(cur)
+    if name not in names:
+        cur.execute(f"PREPARE {name} AS {_numbered(sql)}")
+        names.add(name)
+    if params:
+        cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cur.execute(f"EXECUTE {name}")
+
+
+def execute_prepared(cur, name, sql, params=()):
+    """
+    Run `sql` (psycopg2 %s placeholders) as server-side prepared statement
+    `name`: parsed and planned once per connection, then only EXECUTEd
+    with new parameters. Falls back to a plain execute when
+    FACE_DB_PREPARE is off. A statement the session turns out not to hold
+    is prepared again and retried once, provided no earlier work of the
+    caller's transaction would be rolled back with it.
+    """
+    if not PREPARE_STATEMENTS:
+        cur.execute(sql, params)
+        return cur
+    conn = cur.connection
+    fresh = conn.autocommit or conn.get_transaction_status() == extensions.TRANSACTION_STATUS_IDLE
+    try:
+        _execute_prepared(cur, name, sql, params)
+    except psycopg2.Error as exc:
+        with _prepared_lock:
+            _prepared.pop(conn, None)
+        if not fresh or exc.pgcode not in _STALE_STATEMENT:
+            raise
+        if not conn.autocommit:
+            conn.rollback()
+        try:
+            _execute_prepared(cur, name, sql, params)
+        except psycopg2.Error:
+            with _prepared_lock:
+                _prepared.pop(conn, None)
+            raise
+    return cur
@@ -0,0 +1,273 @@
+import argparse
+import os
+import struct
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.infrastructure.vector_repository import parse_vector
+from app.similarity.matcher import GalleryIndex, as_vector, l2_normalize, top_k
+
+# ── On-disk layout ───────────────────────────────────────────────
+#   [0, 64)         header (HEADER_FMT, zero padded)
+#   [64, ...)       count x dim matrix, float32 or float16, L2-normalized
+#   id_offset       (count + 1) uint64 byte offsets into the id blob
+#   +8*(count+1)    utf-8 id blob
+MAGIC = b"AFGS"
+VERSION = 1
+HEADER_SIZE = 64
+HEADER_FMT = "<4sIIIQqQQ"  # magic, version, dtype code, dim, count, watermark_us, id_offset, id_bytes
+DTYPES = {0: np.float32, 1: np.float16}
+EPOCH = datetime(1970, 1, 1)
+NO_WATERMARK = -1
+
+
+def _dtype_code(dtype):
+    for code, candidate in DTYPES.items():
+        if np.dtype(candidate) == np.dtype(dtype):
+            return code
+    raise ValueError(f"Unsupported snapshot dtype {dtype}")
+
+
+def _watermark_us(watermark):
+    if watermark is None:
+        return NO_WATERMARK
+    return (watermark.replace(tzinfo=None) - EPOCH) // timedelta(microseconds=1)
+
+
+class _SnapshotWriter:
+    def __init__(self, path, dim, dtype):
+        self.path, self.dim, self.dtype = path, dim, np.dtype(dtype)
+        self.tmp_path = f"{path}.tmp"
+        self.ids = []
+        self.watermark = None
+        self._f = open(self.tmp_path, "wb")
+        self._f.write(b"\0" * HEADER_SIZE)
+
+    def write(self, user_ids, vectors, updated_at=()):
+        vectors = l2_normalize(vectors).astype(self.dtype)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding has {vectors.shape[1]} dims, snapshot expects {self.dim}")
+        self._f.write(vectors.tobytes())
+        self.ids.extend(str(i) for i in user_ids)
+        for ts in updated_at:
+            if ts is not None and (self.watermark is None or ts > self.watermark):
+                self.watermark = ts
+
+    def close(self):
+        blobs = [i.encode("utf-8") for i in self.ids]
+        offsets = np.zeros(len(blobs) + 1, dtype=np.uint64)
+        np.cumsum([len(b) for b in blobs], out=offsets[1:])
+        id_offset = self._f.tell()
+        self._f.write(offsets.tobytes())
+        self._f.write(b"".join(blobs))
+        header = struct.pack(
+            HEADER_FMT, MAGIC, VERSION, _dtype_code(self.dtype), self.dim, len(blobs),
+            _watermark_us(self.watermark), id_offset, int(offsets[-1]),
+        )
+        self._f.seek(0)
+        self._f.write(header)
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._f.close()
+        # Readers either see the old file or the complete new one
+        os.replace(self.tmp_path, self.path)
+
+
+def write_snapshot(path, user_ids, embeddings, watermark=None, dtype=np.float32):
+    """Write an in-memory gallery to `path` atomically."""
+    if isinstance(embeddings, np.ndarray) and embeddings.ndim == 2:
+        vectors = embeddings
+    else:
+        vectors = np.stack([as_vector(e) for e in embeddings])
+    writer = _SnapshotWriter(path, vectors.shape[1], dtype)
+    writer.write(user_ids, vectors)
+    writer.watermark = watermark
+    writer.close()
+
+
+def build_from_postgres(conn, path, dtype=np.float32, batch_size=10_000):
+    """
+    Stream face_embeddings through a server-side cursor into a snapshot
+    file, so neither side ever holds the whole table in one result set.
+    """
+    cur = conn.cursor(name="gallery_snapshot")
+    cur.itersize = batch_size
+    cur.execute("SELECT user_id, embedding, updated_at FROM face_embeddings ORDER BY id")
+    writer = None
+    try:
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            vectors = np.stack([parse_vector(r[1]) for r in rows])
+            if writer is None:
+                writer = _SnapshotWriter(path, vectors.shape[1], dtype)
+            writer.write([r[0] for r in rows], vectors, [r[2] for r in rows])
+    finally:
+        cur.close()
+    if writer is None:
+        raise RuntimeError("face_embeddings is empty; nothing to snapshot")
+    writer.close()
+    return len(writer.ids)
+
+
+def _map(path, dtype, offset, shape):
+    # mmap refuses zero-length regions, which an empty gallery produces
+    if not int(np.prod(shape)):
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+
+class GallerySnapshot:
+    """
+    Read-only, memory-mapped view of a snapshot file.
+
+    The matrix is never copied into the process: every uvicorn worker that
+    opens the same file shares the page cache. Ids are decoded on demand.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        magic, version, dtype_code, dim, count, watermark_us, id_offset, id_bytes = struct.unpack_from(
+            HEADER_FMT, header
+        )
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a gallery snapshot")
+        if version != VERSION:
+            raise ValueError(f"Unsupported snapshot version {version}")
+        self.dim, self.count = dim, count
+        self.dtype = np.dtype(DTYPES[dtype_code])
+        self.watermark = None if watermark_us == NO_WATERMARK else EPOCH + timedelta(microseconds=watermark_us)
+        self.matrix = _map(path, self.dtype, HEADER_SIZE, (count, dim))
+        self._offsets = _map(path, np.uint64, id_offset, (count + 1,))
+        self._blob = _map(path, np.uint8, id_offset + 8 * (count + 1), (id_bytes,))
+        self._ids = None
+        self._rows = None
+
+    def __len__(self):
+        return self.count
+
+    def id_at(self, row):
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return bytes(self._blob[start:end]).decode("utf-8")
+
+    @property
+    def ids(self):
+        if self._ids is None:
+            raw = bytes(self._blob)
+            offsets = self._offsets.tolist()
+            self._ids = [raw[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(self.count)]
+        return self._ids
+
+    def row_of(self, user_id):
+        if self._rows is None:
+            self._rows = {user_id: row for row, user_id in enumerate(self.ids)}
+        return self._rows.get(user_id)
+
+    def scores(self, queries, chunk=65536):
+        """(n_queries, count) similarities; float16 rows are upcast per chunk."""
+        if self.dtype == np.float32:
+            return queries @ self.matrix.T
+        out = np.empty((len(queries), self.count), dtype=np.float32)
+        for start in range(0, self.count, chunk):
+            block = np.asarray(self.matrix[start:start + chunk], dtype=np.float32)
+            out[:, start:start + chunk] = queries @ block.T
+        return out
+
+
+class SnapshotGallery:
+    """
+    A memory-mapped base snapshot plus a small in-memory overlay for changes
+    made since the snapshot's watermark (fed by GallerySync). Superseded or
+    deleted base rows are masked out with tombstones instead of rewriting
+    the shared file.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.overlay = GalleryIndex(dim=snapshot.dim)
+        self._dead = np.zeros(snapshot.count, dtype=bool)
+        self._row_numbers = np.arange(snapshot.count)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path):
+        return cls(GallerySnapshot(path))
+
+    @property
+    def dim(self):
+        return self.snapshot.dim
+
+    def __len__(self):
+        return int(self.snapshot.count - self._dead.sum()) + len(self.overlay)
+
+    def _tombstone(self, user_id):
+        row = self.snapshot.row_of(user_id)
+        if row is not None:
+            self._dead[row] = True
+
+    def apply_changes(self, upserts, removed=()):
+        with self._lock:
+            for user_id in removed:
+                self._tombstone(user_id)
+                self.overlay.remove(user_id)
+            for user_id, _, embedding in upserts:
+                self._tombstone(user_id)
+                self.overlay.add(user_id, embedding)
+
+    def search_batch(self, probes, k=1):
+        if isinstance(probes, np.ndarray) and probes.ndim == 2:
+            queries = l2_normalize(probes)
+        else:
+            queries = l2_normalize(np.stack([as_vector(p) for p in probes]))
+        results = []
+        if self.snapshot.count:
+            scores = self.snapshot.scores(queries)
+            scores[:, self._dead] = -np.inf
+            for hits in top_k(scores, self._row_numbers, k):
+                results.append([(self.snapshot.id_at(r), s) for r, s in hits if s != -np.inf])
+        else:
+            results = [[] for _ in queries]
+        for merged, extra in zip(results, self.overlay.search_batch(queries, k)):
+            merged.extend(extra)
+            merged.sort(key=lambda hit: -hit[1])
+            del merged[k:]
+        return results
+
+    def search(self, probe, k=1):
+        return self.search_batch(as_vector(probe)[None, :], k)[0]
+
+    def best_match(self, probe, threshold=0.7):
+        hits = self.search(probe, k=1)
+        if hits and hits[0][1] >= threshold:
+            return hits[0]
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a memory-mappable gallery snapshot from Postgres")
+    parser.add_argument("output", help="snapshot file to write, e.g. gallery.afgs")
+    parser.add_argument("--float16", action="store_true", help="store the matrix as float16 (half the size)")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    import psycopg2
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    try:
+        count = build_from_postgres(
+            conn, args.output, np.float16 if args.float16 else np.float32, args.batch_size
+        )
+    finally:
+        conn.close()
+    print(f"Wrote {count} embeddings to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import threading
+from datetime import timedelta
+
+from app.infrastructure.vector_repository import (
+    DEFAULT_TABLE,
+    fetch_embedding_changes,
+    fetch_embedding_ids,
+    fetch_embedding_snapshot,
+    fetch_embedding_watermark,
+)
+
+
+class GallerySync:
+    """
+    Keeps an in-memory gallery in step with face_embeddings without rescans.
+
+    One bulk snapshot at start, then a background poll on
+    `updated_at > watermark` (maintained by the migration 011 trigger)
+    applies inserts/updates in place. Rows are re-read with a small
+    `overlap` behind the watermark so a transaction that commits late with
+    an older timestamp is still picked up; re-applying a row is harmless.
+    Deletes leave no timestamp behind, so every `reconcile_every` polls the
+    id list is diffed against what we hold.
+
+    `target.apply_changes(upserts, removed)` receives
+    `[(user_id, lounge_id, embedding), ...]` and a list of removed ids.
+    With `load_snapshot=False` (lazily loaded targets such as
+    LoungeShardCache) only the current watermark and id list are read at
+    start, and the target is fed deltas from then on. `table` is
+    face_embeddings or, after a re-embedding cutover, face_embeddings_next.
+
+    A snapshot that fails in start() (database down at boot) does not stop
+    the service: the poll thread retries it every `interval` until it
+    succeeds, and only then starts applying deltas.
+    """
+
+    def __init__(self, connect, target, interval=5.0, overlap=2.0, reconcile_every=12,
+                 load_snapshot=True, table=DEFAULT_TABLE):
+        self._connect = connect
+        self.table = table
+        self.target = target
+        self.interval = interval
+        self.overlap = timedelta(seconds=overlap)
+        self.reconcile_every = reconcile_every
+        self.load_snapshot = load_snapshot
+        self.watermark = None
+        self.synced = False
+        self._known = set()
+        self._polls = 0
+        self._conn = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _cursor_conn(self):
+        if self._conn is None or self._conn.closed:
+            self._conn = self._connect()
+            self._conn.autocommit = True
+        return self._conn
+
+    def _apply(self, rows, removed=()):
+        upserts = [(user_id, lounge_id, emb) for user_id, lounge_id, emb, _ in rows]
+        if upserts or removed:
+            self.target.apply_changes(upserts, list(removed))
+        for user_id, _, _, updated_at in rows:
+            self._known.add(user_id)
+            if updated_at is not None and (self.watermark is None or updated_at > self.watermark):
+                self.watermark = updated_at
+        self._known.difference_update(removed)
+
+    def snapshot(self):
+        """Full load; call once before serving."""
+        conn = self._cursor_conn()
+        if not self.load_snapshot:
+            self._known = fetch_embedding_ids(conn, self.table)
+            self.watermark = fetch_embedding_watermark(conn, self.table)
+            self.synced = True
+            return 0
+        rows = fetch_embedding_snapshot(conn, self.table)
+        self._apply(rows)
+        self.synced = True
+        return len(rows)
+
+    def resume(self, watermark, known_ids):
+        """Start from an existing snapshot instead of a fresh table load."""
+        self.watermark = watermark
+        self._known = set(known_ids)
+        self.synced = True
+
+    def poll_once(self):
+        """Apply changes since the last poll. Returns the number of rows touched."""
+        conn = self._cursor_conn()
+        if self.watermark is None:
+            # Table was empty so far: anything present now is new
+            rows = fetch_embedding_snapshot(conn, self.table)
+        else:
+            rows = fetch_embedding_changes(conn, self.watermark - self.overlap, self.table)
+        removed = []
+        self._polls += 1
+        if self.reconcile_every and self._polls % self.reconcile_every == 0:
+            current = fetch_embedding_ids(conn, self.table)
+            removed = list(self._known - current)
+        self._apply(rows, removed)
+        return len(rows) + len(removed)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if self.synced:
+                    self.poll_once()
+                else:
+                    print(f"[gallery-sync] loaded {self.snapshot()} embeddings")
+            except Exception as exc:
+                # Keep serving the last good gallery; reconnect next tick
+                print(f"[gallery-sync] {'poll' if self.synced else 'snapshot'} failed: {exc}")
+                self._drop_conn()
+
+    def _drop_conn(self):
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        if not self.synced:
+            try:
+                self.snapshot()
+            except Exception as exc:
+                print(f"[gallery-sync] snapshot failed, retrying in the background: {exc}")
+                self._drop_conn()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="gallery-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._drop_conn()
@@ -0,0 +1,144 @@
+from psycopg2.extras import RealDictCursor, execute_values
+
+# ── enrolment crops (migration 016) ────────────────────────────────────
+
+
+def store_enrolment_crops(conn, user_id, crops, lounge_id=None):
+    """
+    Replace a user's stored enrolment crops with `crops` (encoded JPEG
+    bytes). Does not commit; the caller writes the template in the same
+    transaction.
+    """
+    cur = conn.cursor()
+    cur.execute("DELETE FROM face_enrolment_crops WHERE user_id = %s", (user_id,))
+    if crops:
+        execute_values(
+            cur,
+            "INSERT INTO face_enrolment_crops (user_id, seq, crop, lounge_id) VALUES %s",
+            [(user_id, seq, crop, lounge_id) for seq, crop in enumerate(crops)],
+        )
+    cur.close()
+
+
+def _group(rows):
+    users = {}
+    for user_id, lounge_id, crop, created_at in rows:
+        entry = users.setdefault(user_id, {"user_id": user_id, "lounge_id": lounge_id, "crops": [], "created_at": created_at})
+        entry["crops"].append(crop)
+        entry["created_at"] = max(entry["created_at"], created_at)
+    return list(users.values())
+
+
+def fetch_crops_after(conn, after_user_id, limit):
+    """Crops of the next `limit` users after `after_user_id` (keyset order)."""
+    cur = conn.cursor()
+    cur.execute(
+        """
+        WITH users AS (
+            SELECT DISTINCT user_id FROM face_enrolment_crops
+            WHERE %s::text IS NULL OR user_id > %s
+            ORDER BY user_id LIMIT %s
+        )
+        SELECT c.user_id, c.lounge_id::text, c.crop, c.created_at
+        FROM face_enrolment_crops c JOIN users USING (user_id)
+        ORDER BY c.user_id, c.seq
+        """,
+        (after_user_id, after_user_id, limit),
+    )
+    rows = cur.fetchall()
+    cur.close()
+    return _group(rows)
+
+
+def fetch_crops_since(conn, since, limit):
+    """Crops of up to `limit` users re-enrolled after `since`, oldest first."""
+    cur = conn.cursor()
+    cur.execute(
+        """
+        WITH users AS (
+            SELECT user_id, MAX(created_at) AS newest FROM face_enrolment_crops
+            GROUP BY user_id HAVING MAX(created_at) > %s
+            ORDER BY newest LIMIT %s
+        )
+        SELECT c.user_id, c.lounge_id::text, c.crop, c.created_at
+        FROM face_enrolment_crops c JOIN users USING (user_id)
+        ORDER BY users.newest, c.user_id, c.seq
+        """,
+        (since, limit),
+    )
+    rows = cur.fetchall()
+    cur.close()
+    return _group(rows)
+
+
+def fetch_user_lounges(conn, user_ids):
+    """user_id -> lounge_id from the live face_embeddings mapping."""
+    if not user_ids:
+        return {}
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT user_id, lounge_id::text FROM face_embeddings WHERE user_id = ANY(%s)",
+        (list(user_ids),),
+    )
+    lounges = dict(cur.fetchall())
+    cur.close()
+    return lounges
+
+
+# ── job checkpoints ────────────────────────────────────────────────────
+
+
+def fetch_job(conn, name):
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur.execute("SELECT * FROM face_reembed_jobs WHERE name = %s", (name,))
+    job = cur.fetchone()
+    cur.close()
+    return job
+
+
+def start_job(conn, name, source_model, target_model):
+    """
+    The job's checkpoint row, created on first run. `watermark` starts at
+    the creation time: crops written after it are left to the catch-up pass.
+    """
+    cur = conn.cursor()
+    cur.execute(
+        """
+        INSERT INTO face_reembed_jobs (name, source_model, target_model, watermark)
+        VALUES (%s, %s, %s, NOW())
+        ON CONFLICT (name) DO NOTHING
+        """,
+        (name, source_model, target_model),
+    )
+    conn.commit()
+    cur.close()
+    return fetch_job(conn, name)
+
+
+def save_checkpoint(conn, name, processed, failed, last_user_id=None, watermark=None):
+    """Advance the job's counters and cursors; part of the caller's transaction."""
+    cur = conn.cursor()
+    cur.execute(
+        """
+        UPDATE face_reembed_jobs SET
+            processed = processed + %s,
+            failed = failed + %s,
+            last_user_id = COALESCE(%s, last_user_id),
+            watermark = GREATEST(watermark, %s),
+            updated_at = NOW()
+        WHERE name = %s
+        """,
+        (processed, failed, last_user_id, watermark, name),
+    )
+    cur.close()
+
+
+def complete_job(conn, name):
+    cur = conn.cursor()
+    cur.execute(
+        "UPDATE face_reembed_jobs SET status = 'complete', completed_at = NOW(), updated_at = NOW() "
+        "WHERE name = %s",
+        (name,),
+    )
+    conn.commit()
+    cur.close()
@@ -0,0 +1,269 @@
+import io
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+from app.infrastructure.db import execute_prepared
+from app.similarity.matcher import as_vector
+
+DEFAULT_TABLE = "face_embeddings"
+# Same layout, filled by a model re-embedding job (migration 016)
+TABLES = ("face_embeddings", "face_embeddings_next")
+
+
+def _table(table):
+    # Table names can't be bound parameters; only known tables are spliced in
+    if table not in TABLES:
+        raise ValueError(f"Unknown embeddings table {table!r}")
+    return table
+
+
+def parse_vector(value):
+    # psycopg2 returns pgvector columns as text ("[0.1,0.2,...]") unless the
+    # pgvector adapter is registered; BYTEA embeddings come back as memoryview.
+    if isinstance(value, str):
+        return np.array(value.strip("[]").split(","), dtype=np.float32)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return np.frombuffer(value, dtype=np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+
+def parse_templates(embedding, templates):
+    """
+    The fused template, or a (n, dim) array when the row also carries
+    sub-templates (float32 BYTEA, migration 015).
+    """
+    vector = parse_vector(embedding)
+    if templates is None:
+        return vector
+    return np.frombuffer(templates, dtype=np.float32).reshape(-1, len(vector))
+
+
+def format_vector(vector):
+    return "[" + ",".join(f"{float(x):.7g}" for x in vector) + "]"
+
+
+def _fetch_embeddings(conn, query, params=(), name=None):
+    cur = conn.cursor()
+    if name:
+        execute_prepared(cur, name, query, params)
+    else:
+        cur.execute(query, params)
+    rows = cur.fetchall()
+    cur.close()
+    return [r[0] for r in rows], [parse_templates(r[1], r[2]) for r in rows]
+
+
+def fetch_lounge_embeddings(conn, lounge_id, table=DEFAULT_TABLE):
+    """(user_ids, embeddings) for members mapped to one lounge."""
+    return _fetch_embeddings(
+        conn,
+        f"SELECT user_id, embedding, templates FROM {_table(table)} WHERE lounge_id = %s",
+        (lounge_id,),
+        name=f"{table}_lounge",
+    )
+
+
+def fetch_all_embeddings(conn, table=DEFAULT_TABLE):
+    """(user_ids, embeddings) for the whole network."""
+    return _fetch_embeddings(conn, f"SELECT user_id, embedding, templates FROM {_table(table)}")
+
+
+def _fetch_rows(conn, query, params=(), name=None):
+    cur = conn.cursor()
+    if name:
+        execute_prepared(cur, name, query, params)
+    else:
+        cur.execute(query, params)
+    rows = cur.fetchall()
+    cur.close()
+    return [
+        (user_id, lounge_id, parse_templates(emb, templates), updated_at)
+        for user_id, lounge_id, emb, templates, updated_at in rows
+    ]
+
+
+def fetch_embedding_snapshot(conn, table=DEFAULT_TABLE):
+    """Every (user_id, lounge_id, embedding, updated_at) row, for the startup load."""
+    return _fetch_rows(
+        conn,
+        f"SELECT user_id, lounge_id::text, embedding, templates, updated_at FROM {_table(table)}",
+    )
+
+
+def fetch_embedding_changes(conn, since, table=DEFAULT_TABLE):
+    """Rows inserted or updated after `since` (updated_at)."""
+    return _fetch_rows(
+        conn,
+        f"SELECT user_id, lounge_id::text, embedding, templates, updated_at FROM {_table(table)} "
+        "WHERE updated_at > %s ORDER BY updated_at",
+        (since,),
+        name=f"{table}_changes",
+    )
+
+
+def fetch_embedding_ids(conn, table=DEFAULT_TABLE):
+    cur = conn.cursor()
+    cur.execute(f"SELECT user_id FROM {_table(table)}")
+    ids = {r[0] for r in cur.fetchall()}
+    cur.close()
+    return ids
+
+
+def fetch_exact_rows(conn, keys, table=DEFAULT_TABLE):
+    """
+    {key: float32 vector} for a gallery re-rank. A key is a user_id (the
+    row as a single-vector GalleryIndex holds it) or (user_id, slot) for a
+    TemplateGallery sub-template; rows that no longer exist are omitted.
+    """
+    user_ids = list({key[0] if isinstance(key, tuple) else key for key in keys})
+    if not user_ids:
+        return {}
+    cur = conn.cursor()
+    execute_prepared(
+        cur, f"{table}_exact",
+        f"SELECT user_id, embedding, templates FROM {_table(table)} WHERE user_id = ANY(%s)",
+        (user_ids,),
+    )
+    stored = {r[0]: parse_templates(r[1], r[2]) for r in cur.fetchall()}
+    cur.close()
+    rows = {}
+    for key in keys:
+        if isinstance(key, tuple):
+            user_id, slot = key
+            value = stored.get(user_id)
+            if value is not None and value.ndim == 2 and slot < len(value):
+                rows[key] = value[slot]
+            elif value is not None and value.ndim == 1 and slot == 0:
+                rows[key] = value
+        elif key in stored:
+            rows[key] = as_vector(stored[key])
+    return rows
+
+
+def fetch_embedding_dim(conn, table=DEFAULT_TABLE):
+    """Declared dimension of `table`.embedding (pgvector's typmod), None if unconstrained."""
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT atttypmod FROM pg_attribute WHERE attrelid = %s::regclass AND attname = 'embedding'",
+        (_table(table),),
+    )
+    row = cur.fetchone()
+    cur.close()
+    return row[0] if row and row[0] > 0 else None
+
+
+def fetch_embedding_watermark(conn, table=DEFAULT_TABLE):
+    cur = conn.cursor()
+    execute_prepared(cur, f"{table}_watermark", f"SELECT MAX(updated_at) FROM {_table(table)}")
+    watermark = cur.fetchone()[0]
+    cur.close()
+    return watermark
+
+
+_UPSERT = """
+    INSERT INTO {table} (user_id, embedding, templates, template_count, lounge_id, model_name)
+    {rows}
+    ON CONFLICT (user_id) DO UPDATE SET
+        embedding = EXCLUDED.embedding,
+        templates = EXCLUDED.templates,
+        template_count = EXCLUDED.template_count,
+        lounge_id = COALESCE(EXCLUDED.lounge_id, {table}.lounge_id),
+        model_name = EXCLUDED.model_name
+"""
+_UPSERT_ROW = "(%s, %s::vector, %s, %s, %s, %s)"
+
+
+def _upsert(table, rows):
+    return _UPSERT.format(table=_table(table), rows=rows)
+
+
+def _template_params(user_id, fused, templates, lounge_id, model_name):
+    # Rows are labelled with the model that produced them, never a default
+    if not model_name:
+        raise ValueError("model_name is required to store an embedding")
+    blob = None
+    if templates is not None and len(templates) > 1:
+        blob = np.ascontiguousarray(templates, dtype=np.float32).tobytes()
+    count = len(templates) if templates is not None else 1
+    return (user_id, format_vector(fused), blob, count, lounge_id, model_name)
+
+
+def _latest(rows):
+    # One statement may not update the same row twice; the last row wins
+    latest = {}
+    for user_id, fused, templates, lounge_id, model_name in rows:
+        latest[str(user_id)] = _template_params(user_id, fused, templates, lounge_id, model_name)
+    return list(latest.values())
+
+
+def upsert_face_template(conn, user_id, fused, templates=None, lounge_id=None, model_name=None,
+                         table=DEFAULT_TABLE):
+    """Store a user's fused template (and sub-templates) in one upsert."""
+    cur = conn.cursor()
+    execute_prepared(
+        cur,
+        f"{table}_upsert",
+        _upsert(table, "VALUES " + _UPSERT_ROW),
+        _template_params(user_id, fused, templates, lounge_id, model_name),
+    )
+    conn.commit()
+    cur.close()
+
+
+def upsert_face_templates(conn, rows, page_size=500, table=DEFAULT_TABLE):
+    """
+    Bulk upsert_face_template for batch enrolment: `rows` of
+    (user_id, fused, templates, lounge_id, model_name) are sent as multi-row
+    INSERT ... ON CONFLICT statements of `page_size` rows and committed
+    once. A user listed twice keeps the last row. Returns the number of
+    users written.
+    """
+    params = _latest(rows)
+    if not params:
+        return 0
+    cur = conn.cursor()
+    execute_values(cur, _upsert(table, "VALUES %s"), params, template=_UPSERT_ROW, page_size=page_size)
+    conn.commit()
+    cur.close()
+    return len(params)
+
+
+def _copy_field(value):
+    if value is None:
+        return "\\N"
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def copy_face_templates(conn, rows, table=DEFAULT_TABLE):
+    """
+    Largest-batch variant for re-embedding jobs: rows as for
+    upsert_face_templates are streamed with COPY into a session temp table
+    and merged with one INSERT ... SELECT ... ON CONFLICT. Does not commit,
+    so the caller can checkpoint in the same transaction.
+    """
+    params = _latest(rows)
+    if not params:
+        return 0
+    buf = io.StringIO()
+    for user_id, vector, blob, count, lounge_id, model_name in params:
+        templates = "\\x" + blob.hex() if blob is not None else None
+        fields = (user_id, vector, templates, count, lounge_id, model_name)
+        buf.write("\t".join(_copy_field(f) for f in fields) + "\n")
+    buf.seek(0)
+    cur = conn.cursor()
+    cur.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS face_templates_copy "
+        "(user_id text, embedding text, templates bytea, template_count smallint, "
+        "lounge_id uuid, model_name text)"
+    )
+    cur.copy_expert("COPY face_templates_copy FROM STDIN", buf)
+    cur.execute(_upsert(
+        table,
+        "SELECT user_id, embedding::vector, templates, template_count, lounge_id, model_name "
+        "FROM face_templates_copy",
+    ))
+    cur.execute("TRUNCATE face_templates_copy")
+    cur.close()
+    return len(params)
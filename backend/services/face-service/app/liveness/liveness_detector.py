@@ -0,0 +1,235 @@
+"""
+Cascaded liveness check.
+
+Every submitted face goes through cheap checks first, all computed from
+one small grayscale copy of its crop:
+
+- texture: entropy of the local binary pattern histogram. Prints and
+  re-captured screens lose the skin micro-texture a live capture keeps.
+- frequency: high-frequency share of the spectrum, minus a penalty for
+  isolated spectral peaks (screen moiré).
+- motion: when several frames are checked together, whether they differ
+  at all. Identical frames mean one still image submitted repeatedly.
+  /register's captures get it; a single /verify frame cannot, so the
+  camera scripts run it over each track's last few frames instead
+  (TrackingRecognizer's `liveness`).
+
+A face whose cheap score clears FACE_LIVENESS_ACCEPT is live, and one at
+or below FACE_LIVENESS_REJECT is a spoof. Only the faces in between are
+batched through the anti-spoof model (FACE_LIVENESS_MODEL, an ONNX
+classifier run with cv2.dnn). A clear spoof ends the request before the
+model runs at all. Without a model, ambiguous faces are decided on the
+cheap score against FACE_LIVENESS_THRESHOLD.
+"""
+import math
+import os
+import threading
+from typing import List, NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+from app.observability.metrics import registry, timed
+
+FEATURE_SIDE = 64  # cheap checks run on a FEATURE_SIDE² grayscale crop
+
+ACCEPT = float(os.getenv("FACE_LIVENESS_ACCEPT", "0.75"))
+REJECT = float(os.getenv("FACE_LIVENESS_REJECT", "0.25"))
+THRESHOLD = float(os.getenv("FACE_LIVENESS_THRESHOLD", "0.5"))
+
+# Logistic centre/scale of each cheap check: LBP entropy (bits, of 8)
+# and high-frequency energy share. The defaults only separate the
+# synthetic cases in tests/test_liveness.py; fit them to the kiosk
+# cameras with benchmarks/liveness_calibration.py before relying on them
+TEXTURE_CENTER = float(os.getenv("FACE_LIVENESS_TEXTURE_CENTER", "5.5"))
+TEXTURE_SCALE = float(os.getenv("FACE_LIVENESS_TEXTURE_SCALE", "0.4"))
+FREQUENCY_CENTER = float(os.getenv("FACE_LIVENESS_FREQUENCY_CENTER", "0.04"))
+FREQUENCY_SCALE = float(os.getenv("FACE_LIVENESS_FREQUENCY_SCALE", "0.015"))
+# A high-band peak this many times the band median counts as moiré
+MOIRE_RATIO = float(os.getenv("FACE_LIVENESS_MOIRE_RATIO", "40"))
+# Mean absolute difference (normalised intensities) under which two
+# frames count as the same image
+STILL_DIFF = float(os.getenv("FACE_LIVENESS_STILL_DIFF", "0.01"))
+
+MODEL_PATH = os.getenv("FACE_LIVENESS_MODEL", "")
+MODEL_SIZE = int(os.getenv("FACE_LIVENESS_MODEL_SIZE", "80"))
+MODEL_REAL_INDEX = int(os.getenv("FACE_LIVENESS_MODEL_REAL_INDEX", "1"))
+
+exits = registry.counter(
+    "face_liveness_decisions_total", "Faces decided per liveness cascade stage", ("stage",)
+)
+
+
+def _squash(value, center, scale):
+    return 1.0 / (1.0 + math.exp(-(value - center) / scale))
+
+
+# ── shared features ─────────────────────────────────────────────────
+
+
+class FaceFeatures(NamedTuple):
+    gray: np.ndarray  # FEATURE_SIDE² float32, zero mean / unit variance
+    texture: float
+    frequency: float
+
+
+def _small_gray(crop):
+    """
+    The one resample every cheap check shares. Shrinking the BGR crop
+    before the colour conversion converts 4K pixels, not the whole crop.
+    """
+    small = cv2.resize(crop, (FEATURE_SIDE, FEATURE_SIDE), interpolation=cv2.INTER_AREA)
+    return small if small.ndim == 2 else cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+
+def lbp_entropy(gray):
+    """Entropy (bits) of the 8-neighbour LBP code histogram of a uint8 image."""
+    center = gray[1:-1, 1:-1]
+    h, w = center.shape
+    codes = np.zeros(center.shape, dtype=np.uint8)
+    for bit, (dy, dx) in enumerate(((0, 0), (0, 1), (0, 2), (1, 2), (2, 2), (2, 1), (2, 0), (1, 0))):
+        codes |= (gray[dy:dy + h, dx:dx + w] >= center).astype(np.uint8) << bit
+    p = np.bincount(codes.ravel(), minlength=256).astype(np.float64)
+    p = p[p > 0] / codes.size
+    return float(-(p * np.log2(p)).sum())
+
+
+# Spectrum bands, from the centre of a shifted FEATURE_SIDE² spectrum
+_fy, _fx = np.indices((FEATURE_SIDE, FEATURE_SIDE)) - FEATURE_SIDE // 2
+_radius = np.hypot(_fy, _fx)
+_HIGH = _radius > FEATURE_SIDE / 4
+_WINDOW = np.outer(np.hanning(FEATURE_SIDE), np.hanning(FEATURE_SIDE)).astype(np.float32)
+
+
+def spectrum_score(norm):
+    """
+    (high-frequency energy share, moiré flag) of a normalised gray crop.
+    The Hann window keeps the crop's edges from smearing into every band.
+    """
+    power = np.abs(np.fft.fftshift(np.fft.fft2(norm * _WINDOW))) ** 2
+    total = power.sum()
+    if total <= 0:
+        return 0.0, False
+    high = power[_HIGH]
+    share = float(high.sum() / total)
+    moire = bool(high.max() > MOIRE_RATIO * max(float(np.median(high)), 1e-12))
+    return share, moire
+
+
+def raw_features(crop):
+    """(normalised gray, LBP entropy, high-frequency share, moiré flag)."""
+    gray = _small_gray(crop)
+    norm = gray.astype(np.float32)
+    norm -= norm.mean()
+    norm /= norm.std() + 1e-6
+    share, moire = spectrum_score(norm)
+    return norm, lbp_entropy(gray), share, moire
+
+
+def extract(crop):
+    norm, entropy, share, moire = raw_features(crop)
+    frequency = _squash(share, FREQUENCY_CENTER, FREQUENCY_SCALE) * (0.3 if moire else 1.0)
+    texture = _squash(entropy, TEXTURE_CENTER, TEXTURE_SCALE)
+    return FaceFeatures(norm, texture, frequency)
+
+
+def motion_scores(features: List[FaceFeatures]) -> List[Optional[float]]:
+    """
+    Per face: 0.0 when it is a copy of another submitted frame, 1.0 when
+    it differs from all of them, None with a single frame.
+    """
+    if len(features) < 2:
+        return [None] * len(features)
+    stack = np.stack([f.gray for f in features])
+    scores = []
+    for i, f in enumerate(features):
+        diffs = np.abs(np.delete(stack, i, axis=0) - f.gray).mean(axis=(1, 2))
+        scores.append(0.0 if diffs.min() < STILL_DIFF else 1.0)
+    return scores
+
+
+def cheap_score(feature: FaceFeatures, motion: Optional[float]):
+    score = 0.5 * feature.texture + 0.5 * feature.frequency
+    if motion is not None:
+        # A repeated still is a spoof whatever its texture
+        score = min(score, 0.1) if motion == 0.0 else score
+    return score
+
+
+# ── anti-spoof model ────────────────────────────────────────────────
+
+
+class AntiSpoofModel:
+    """
+    ONNX classifier over BGR crops (MiniFASNet-style: MODEL_SIZE² input,
+    softmax with the live class at MODEL_REAL_INDEX). One forward pass per
+    request, however many of its faces were ambiguous.
+    """
+
+    def __init__(self, path, size=MODEL_SIZE, real_index=MODEL_REAL_INDEX):
+        self.net = cv2.dnn.readNetFromONNX(path)
+        self.size = size
+        self.real_index = real_index
+
+    def score(self, crops):
+        crops = [np.ascontiguousarray(c) for c in crops]
+        blob = cv2.dnn.blobFromImages(list(crops), 1.0, (self.size, self.size), swapRB=False)
+        self.net.setInput(blob)
+        logits = self.net.forward().reshape(len(crops), -1).astype(np.float64)
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+        return probs[:, self.real_index]
+
+
+# cv2.dnn nets are not safe to share between threads, and the liveness
+# stage runs on a thread pool, so each thread gets its own instance
+_local = threading.local()
+
+
+def get_model():
+    if not MODEL_PATH or not os.path.exists(MODEL_PATH):
+        return None
+    model = getattr(_local, "model", None)
+    if model is None:
+        model = _local.model = AntiSpoofModel(MODEL_PATH)
+    return model
+
+
+# ── cascade ─────────────────────────────────────────────────────────
+
+
+def check_liveness(faces):
+    """
+    Liveness of a batch of BGR face crops (all from one request). The
+    request is live only if every face is; its score is the weakest face's.
+    """
+    if not faces:
+        return {"is_live": False, "liveness_score": 0.0, "decided_by": None}
+
+    with timed("liveness_cheap"):
+        features = [extract(face) for face in faces]
+        scores = [cheap_score(f, m) for f, m in zip(features, motion_scores(features))]
+
+    if min(scores) <= REJECT:
+        exits.inc(stage="cheap_reject")
+        return {"is_live": False, "liveness_score": round(min(scores), 4), "decided_by": "cheap"}
+
+    ambiguous = [i for i, s in enumerate(scores) if s < ACCEPT]
+    exits.inc(len(faces) - len(ambiguous), stage="cheap_accept")
+    decided_by = "cheap"
+    if ambiguous:
+        model = get_model()
+        if model is not None:
+            with timed("liveness_model"):
+                for i, p in zip(ambiguous, model.score(faces[i] for i in ambiguous)):
+                    scores[i] = float(p)
+            exits.inc(len(ambiguous), stage="model")
+            decided_by = "model"
+        else:
+            exits.inc(len(ambiguous), stage="threshold")
+            decided_by = "threshold"
+
+    # Faces accepted outright scored at least ACCEPT, above THRESHOLD
+    live = all(s >= THRESHOLD for s in scores)
+    return {"is_live": live, "liveness_score": round(min(scores), 4), "decided_by": decided_by}
@@ -0,0 +1,162 @@
+import os
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from app.api.routes import router
+from app.application.face_usecases import (
+    GalleryMismatch,
+    check_model_dim,
+    configure_gallery,
+    db_pool,
+    gallery_sync,
+    probe_cache,
+    start_presence,
+    stop_presence,
+)
+from app.application.pipeline import StageOverloaded, executor
+from app.detection.detector import FaceDetectionError
+from app.infrastructure.db import PoolExhausted
+from app.embedding.batcher import MicroBatcher, get_embedder
+from app.embedding.engine import get_engine
+from app.observability.metrics import registry
+from app.observability.profiler import profiler
+
+# The profiler endpoints expose stack traces; keep them off unless asked for
+PROFILER_ENABLED = os.getenv("FACE_PROFILER_ENABLED", "false").lower() == "true"
+
+app = FastAPI(title="AeroFace Face Service")
+app.include_router(router)
+
+
+@app.exception_handler(StageOverloaded)
+async def overloaded(request: Request, exc: StageOverloaded):
+    # Fail fast so kiosks retry on their next scan tick instead of timing out
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Face service busy ({exc.stage}), retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(PoolExhausted)
+async def database_busy(request: Request, exc: PoolExhausted):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Face service busy (database), retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(GalleryMismatch)
+async def gallery_mismatch(request: Request, exc: GalleryMismatch):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+
+@app.exception_handler(FaceDetectionError)
+async def no_face(request: Request, exc: FaceDetectionError):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+
+@app.on_event("startup")
+def resolve_gallery():
+    # Which table and model to serve (a finished re-embedding switches both);
+    # must run before the model is built
+    configure_gallery()
+
+
+@app.on_event("startup")
+def load_embedding_model():
+    # Pay model build + graph warm-up before the first request, not during it
+    embedder = get_embedder()
+    if isinstance(embedder, MicroBatcher):
+        get_engine().load()  # pool workers load their own copy instead
+    embedder.start()
+
+
+@app.on_event("startup")
+def open_db_pool():
+    # Pay TCP/TLS setup before the first enrolment, not during it
+    try:
+        db_pool.fill()
+    except Exception as exc:
+        print(f"[db] could not pre-open connections: {exc}")
+
+
+@app.on_event("startup")
+def check_gallery_model():
+    # Refuse to start with a model whose vectors the gallery column cannot
+    # hold; checked once here, identify never re-checks it
+    try:
+        check_model_dim(getattr(get_embedder(), "dim", None))
+    except GalleryMismatch:
+        raise
+    except Exception as exc:
+        print(f"[gallery] could not read the embedding column, checking on first enrolment: {exc}")
+
+
+@app.on_event("startup")
+def start_gallery_sync():
+    gallery_sync.start()
+
+
+@app.on_event("startup")
+def restore_presence():
+    start_presence()
+
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    gallery_sync.stop()
+    stop_presence()
+    get_embedder().stop()
+    executor.shutdown(wait=False)
+    db_pool.close()
+
+
+@app.get("/health")
+def health():
+    engine = get_engine()
+    return {
+        "status": "ok",
+        "model": engine.model_name,
+        "model_loaded": engine.is_loaded,
+        "model_load_seconds": engine.load_seconds,
+        "probe_cache": probe_cache.stats(),
+        "db_pool": db_pool.stats(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Prometheus text format; scraped by backend/infra/monitoring/prometheus.yml
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+def _require_profiler():
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+@app.post("/debug/profiler/start")
+def start_profiler(interval_ms: float = 10, seconds: Optional[float] = 60):
+    _require_profiler()
+    if interval_ms <= 0:
+        raise HTTPException(status_code=400, detail="interval_ms must be positive")
+    started = profiler.start(interval_ms / 1000, seconds)
+    return {"started": started, **profiler.stats()}
+
+
+@app.post("/debug/profiler/stop")
+def stop_profiler():
+    _require_profiler()
+    profiler.stop()
+    return profiler.stats()
+
+
+@app.get("/debug/profiler", response_class=PlainTextResponse)
+def profile(limit: Optional[int] = None):
+    # Folded stacks: pipe into flamegraph.pl or drop into speedscope
+    _require_profiler()
+    return profiler.collapsed(limit)
@@ -0,0 +1,106 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampler over every Python thread in the process.
+
+    While running, a daemon thread wakes every `interval` seconds, walks
+    `sys._current_frames()` and counts each thread's stack, so the cost is
+    proportional to the sample rate, not to the code being profiled; off,
+    it costs nothing. `collapsed()` returns the counts in the folded format
+    ("frame;frame;frame count") that flamegraph.pl and speedscope read.
+    Threads blocked in C (model forward, imdecode, Postgres) show up on the
+    Python line that called into C.
+    """
+
+    def __init__(self, max_depth=64):
+        self.max_depth = max_depth
+        self.interval = None
+        self.samples = 0
+        self.started_at = None
+        self._stacks = Counter()
+        self._stacks_lock = threading.Lock()  # sampler writes, readers snapshot
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=0.01, duration=None):
+        """Start sampling (clearing earlier samples); stop after `duration` s."""
+        if not interval or interval <= 0:
+            raise ValueError("interval must be positive")
+        with self._lock:
+            if self.running:
+                return False
+            self.interval = interval
+            self.samples = 0
+            self.started_at = time.time()
+            with self._stacks_lock:
+                self._stacks = Counter()
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, args=(duration,), name="face-profiler", daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def stop(self):
+        with self._lock:
+            thread = self._thread
+            self._stop.set()
+        if thread is not None:
+            thread.join()
+        return self.samples
+
+    def _frame_name(self, frame):
+        code = frame.f_code
+        return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+    def _sample(self, own):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        stacks = []
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(self._frame_name(frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            stacks.append(";".join(reversed(stack)))
+        with self._stacks_lock:
+            self._stacks.update(stacks)
+
+    def _run(self, duration):
+        own = threading.get_ident()
+        deadline = time.monotonic() + duration if duration else None
+        while not self._stop.wait(self.interval):
+            self._sample(own)
+            self.samples += 1
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+
+    def collapsed(self, limit=None):
+        with self._stacks_lock:
+            stacks = self._stacks.most_common(limit)
+        return "\n".join(f"{stack} {count}" for stack, count in stacks) + "\n"
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "samples": self.samples,
+            "stacks": len(self._stacks),
+            "started_at": self.started_at,
+        }
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,29 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class VerifyRequest(BaseModel):
+    image_base64: str
+    lounge_id: Optional[str] = None
+    kiosk_id: Optional[str] = None  # scopes the probe cache; defaults to the client address
+
+
+class VerifyResponse(BaseModel):
+    matched: bool
+    status: str  # granted, not_recognized, other_lounge or liveness_failed
+    user_id: Optional[str] = None
+    confidence: float
+    message: str
+
+
+class Occupant(BaseModel):
+    user_id: str
+    checkin_time: datetime
+
+
+class PresenceResponse(BaseModel):
+    lounge_id: str
+    count: int
+    occupants: List[Occupant]
@@ -0,0 +1,254 @@
+import numpy as np
+
+from app.similarity.matcher import as_vector, l2_normalize, top_k
+
+FORMAT_VERSION = 1
+
+
+def kmeans(vectors, k, iters=20, seed=0):
+    """Spherical k-means (cosine) on already-normalized vectors."""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    if n < k:
+        raise ValueError(f"Need at least {k} training vectors, got {n}")
+    centroids = vectors[rng.choice(n, k, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        counts = np.bincount(assign, minlength=k)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed dead centroids from random points so every list is used
+            sums[empty] = vectors[rng.choice(n, int(empty.sum()), replace=False)]
+        centroids = l2_normalize(sums)
+    return centroids
+
+
+def _kmeans_l2(vectors, k, iters=20, seed=0):
+    """Plain Euclidean k-means, used for the PQ sub-codebooks."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=len(vectors) < k)].copy()
+    for _ in range(iters):
+        dists = (
+            (vectors ** 2).sum(1, keepdims=True)
+            - 2 * vectors @ centroids.T
+            + (centroids ** 2).sum(1)
+        )
+        assign = np.argmin(dists, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        counts = np.bincount(assign, minlength=k)
+        used = counts > 0
+        centroids[used] = sums[used] / counts[used, None]
+    return centroids
+
+
+class ProductQuantizer:
+    """Splits a vector into m sub-vectors, each coded with one byte."""
+
+    def __init__(self, dim, m=16, ksub=256):
+        if dim % m:
+            raise ValueError(f"dim {dim} is not divisible by m={m}")
+        self.dim, self.m, self.ksub = dim, m, ksub
+        self.dsub = dim // m
+        self.codebooks = None  # (m, ksub, dsub)
+
+    def train(self, vectors, iters=15, seed=0):
+        books = []
+        for j in range(self.m):
+            sub = vectors[:, j * self.dsub:(j + 1) * self.dsub]
+            books.append(_kmeans_l2(sub, self.ksub, iters, seed + j))
+        self.codebooks = np.stack(books).astype(np.float32)
+
+    def encode(self, vectors):
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            sub = vectors[:, j * self.dsub:(j + 1) * self.dsub]
+            book = self.codebooks[j]
+            dists = -2 * sub @ book.T + (book ** 2).sum(1)
+            codes[:, j] = np.argmin(dists, axis=1)
+        return codes
+
+    def lookup_table(self, query):
+        # (m, ksub) inner products of each query sub-vector with its codebook
+        q = query.reshape(self.m, 1, self.dsub)
+        return (self.codebooks * q).sum(-1)
+
+
+class IVFIndex:
+    """
+    Approximate cosine search with an inverted file (IVF) coarse quantizer.
+
+    Gallery vectors are bucketed by their nearest of `nlist` centroids; a
+    query only scans the `nprobe` closest buckets. With `pq_m` set, bucket
+    residuals are product-quantized to `pq_m` bytes per vector and scored
+    via per-query lookup tables (IVF-ADC) instead of full float32 rows.
+    PQ similarities are approximate, so re-score the top candidates exactly
+    before applying an accept threshold.
+
+    Mirrors GalleryIndex's add/remove/search API so callers can swap one
+    for the other once a gallery outgrows exact search.
+    """
+
+    def __init__(self, dim, nlist=256, nprobe=8, pq_m=None):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.pq = ProductQuantizer(dim, pq_m) if pq_m else None
+        self.centroids = None
+        self._list_ids = [[] for _ in range(nlist)]
+        self._list_data = [self._empty_data() for _ in range(nlist)]
+        self._where = {}  # user_id -> (list, position in that list)
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, user_id):
+        return user_id in self._where
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def _empty_data(self):
+        if self.pq:
+            return np.empty((0, self.pq.m), dtype=np.uint8)
+        return np.empty((0, self.dim), dtype=np.float32)
+
+    # ── build ────────────────────────────────────────────────────
+
+    def train(self, vectors, iters=20, max_train=100_000, seed=0):
+        vectors = l2_normalize(vectors)
+        if len(vectors) > max_train:
+            rng = np.random.default_rng(seed)
+            vectors = vectors[rng.choice(len(vectors), max_train, replace=False)]
+        self.centroids = kmeans(vectors, self.nlist, iters, seed)
+        if self.pq:
+            assign = np.argmax(vectors @ self.centroids.T, axis=1)
+            self.pq.train(vectors - self.centroids[assign], seed=seed)
+
+    def add_many(self, user_ids, embeddings):
+        if not self.is_trained:
+            raise RuntimeError("IVFIndex must be trained before adding vectors")
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        if isinstance(embeddings, np.ndarray) and embeddings.ndim == 2:
+            vectors = l2_normalize(embeddings)
+        else:
+            vectors = l2_normalize(np.stack([as_vector(e) for e in embeddings]))
+        latest = {user_id: row for row, user_id in enumerate(user_ids)}  # a repeated id keeps its last vector
+        for user_id in latest:
+            self.remove(user_id)
+        user_ids, vectors = list(latest), vectors[list(latest.values())]
+        assign = np.argmax(vectors @ self.centroids.T, axis=1)
+        data = self.pq.encode(vectors - self.centroids[assign]) if self.pq else vectors
+        for lst in np.unique(assign):
+            lst = int(lst)
+            rows = np.flatnonzero(assign == lst)
+            ids = self._list_ids[lst]
+            self._list_data[lst] = np.concatenate([self._list_data[lst], data[rows]])
+            for r in rows:
+                self._where[user_ids[r]] = (lst, len(ids))
+                ids.append(user_ids[r])
+
+    def add(self, user_id, embedding):
+        self.add_many([user_id], [embedding])
+
+    def remove(self, user_id):
+        where = self._where.pop(user_id, None)
+        if where is None:
+            return False
+        lst, pos = where
+        ids, data = self._list_ids[lst], self._list_data[lst]
+        last = len(ids) - 1
+        if pos != last:
+            # Move the list's last row into the hole; order within a list is irrelevant
+            ids[pos] = ids[last]
+            data[pos] = data[last]
+            self._where[ids[pos]] = (lst, pos)
+        ids.pop()
+        self._list_data[lst] = data[:last]
+        return True
+
+    # ── search ───────────────────────────────────────────────────
+
+    def search(self, probe, k=1, nprobe=None):
+        return self.search_batch(as_vector(probe)[None, :], k, nprobe)[0]
+
+    def search_batch(self, probes, k=1, nprobe=None):
+        if isinstance(probes, np.ndarray) and probes.ndim == 2:
+            queries = l2_normalize(probes)
+        else:
+            queries = l2_normalize(np.stack([as_vector(p) for p in probes]))
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        coarse = queries @ self.centroids.T
+        probe_lists = np.argpartition(-coarse, nprobe - 1, axis=1)[:, :nprobe]
+        results = []
+        for q, query in enumerate(queries):
+            scores, ids = [], []
+            lut = self.pq.lookup_table(query) if self.pq else None
+            for lst in probe_lists[q]:
+                data = self._list_data[lst]
+                if not len(data):
+                    continue
+                if self.pq:
+                    # q·(c + r) ≈ q·c + Σ_j LUT[j, code_j]
+                    part = coarse[q, lst] + lut[np.arange(self.pq.m), data].sum(axis=1)
+                else:
+                    part = data @ query
+                scores.append(part)
+                ids.extend(self._list_ids[lst])
+            if not ids:
+                results.append([])
+                continue
+            results.extend(top_k(np.concatenate(scores)[None, :], np.asarray(ids, dtype=object), k))
+        return results
+
+    def best_match(self, probe, threshold=0.7, nprobe=None):
+        hits = self.search(probe, k=1, nprobe=nprobe)
+        if hits and hits[0][1] >= threshold:
+            return hits[0]
+        return None
+
+    # ── persistence ──────────────────────────────────────────────
+
+    def save(self, path):
+        """Write the trained index to an .npz file. Ids are stored as strings."""
+        if not self.is_trained:
+            raise RuntimeError("Nothing to save: IVFIndex is not trained")
+        sizes = np.array([len(ids) for ids in self._list_ids], dtype=np.int64)
+        ids = [str(i) for lst in self._list_ids for i in lst]
+        arrays = {
+            "version": np.array(FORMAT_VERSION),
+            "params": np.array([self.dim, self.nlist, self.nprobe, self.pq.m if self.pq else 0]),
+            "centroids": self.centroids,
+            "sizes": sizes,
+            "ids": np.array(ids, dtype=str),
+            "data": np.concatenate(self._list_data),
+        }
+        if self.pq:
+            arrays["codebooks"] = self.pq.codebooks
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as blob:
+            if int(blob["version"]) != FORMAT_VERSION:
+                raise ValueError(f"Unsupported IVF index format {int(blob['version'])}")
+            dim, nlist, nprobe, pq_m = (int(v) for v in blob["params"])
+            index = cls(dim, nlist=nlist, nprobe=nprobe, pq_m=pq_m or None)
+            index.centroids = blob["centroids"]
+            if index.pq:
+                index.pq.codebooks = blob["codebooks"]
+            ids, data = blob["ids"].tolist(), blob["data"]
+            start = 0
+            for lst, size in enumerate(blob["sizes"]):
+                end = start + int(size)
+                index._list_ids[lst] = ids[start:end]
+                index._list_data[lst] = data[start:end].copy()
+                for pos, user_id in enumerate(index._list_ids[lst]):
+                    index._where[user_id] = (lst, pos)
+                start = end
+        return index
@@ -0,0 +1,268 @@
+import threading
+
+import numpy as np
+
+from app.similarity.quantization import dequantize, quantize, scores as quantized_scores, storage_dtype
+
+
+def as_vector(embedding):
+    # Embeddings arrive either as float32 BYTEA blobs (public.users.embedding)
+    # or as array-likes (pgvector rows, freshly generated vectors).
+    if isinstance(embedding, (bytes, bytearray, memoryview)):
+        return np.frombuffer(embedding, dtype=np.float32)
+    vectors = np.asarray(embedding, dtype=np.float32)
+    if vectors.ndim == 2 and len(vectors) > 1:
+        # A user's sub-templates: single-vector galleries use the fused one
+        return l2_normalize(l2_normalize(vectors).mean(axis=0))
+    return vectors.ravel()
+
+
+def l2_normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class GalleryIndex:
+    """
+    Exact cosine-similarity index over an in-memory face gallery.
+
+    All embeddings are kept L2-normalized in one contiguous matrix with a
+    parallel id array, so a probe (or a batch of probes) is scored against
+    the whole gallery with a single matrix multiply. Rows are added,
+    updated and removed in place; removal swaps the last row into the hole.
+
+    `dtype` picks the resident format: "float32", "float16" (half the
+    memory) or "int8" with a per-row scale (a quarter). Compact scores are
+    within about 1e-3 of float32 on normalized rows. With `rerank` > 0 and
+    an `exact_rows` source, the best `rerank` candidates of a compact scan
+    are re-scored against exact rows fetched from that source, so no
+    float32 copy is kept in memory. `exact_rows(ids)` returns {id: vector}
+    (e.g. from the database); ids it omits keep their compact score.
+    """
+
+    def __init__(self, dim=None, capacity=1024, dtype="float32", rerank=0, exact_rows=None):
+        self.dim = dim
+        self.dtype = storage_dtype(dtype)
+        self.rerank = rerank if self.dtype != np.float32 and exact_rows is not None else 0
+        self._exact_rows = exact_rows
+        self._capacity = max(1, capacity)
+        self._size = 0
+        self._matrix = None
+        self._scales = None
+        self._ids = np.empty(self._capacity, dtype=object)
+        self._rows = {}
+        self._lock = threading.RLock()
+        if dim is not None:
+            self._allocate(self._capacity)
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, user_id):
+        return user_id in self._rows
+
+    @property
+    def ids(self):
+        return self._ids[:self._size]
+
+    @property
+    def matrix(self):
+        """Normalized rows as float32 (decoded when stored compactly)."""
+        if self._matrix is None:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        if self.dtype == np.float32:
+            return self._matrix[:self._size]
+        scales = self._scales[:self._size] if self._scales is not None else None
+        return dequantize(self._matrix[:self._size], scales)
+
+    @property
+    def nbytes(self):
+        """Resident bytes of the vector storage (ids excluded)."""
+        return sum(a[:self._size].nbytes for a in (self._matrix, self._scales) if a is not None)
+
+    # ── mutation ─────────────────────────────────────────────────
+
+    def _allocate(self, capacity):
+        old = (self._matrix, self._scales)
+        self._matrix = np.zeros((capacity, self.dim), dtype=self.dtype)
+        self._scales = np.ones(capacity, dtype=np.float32) if self.dtype == np.int8 else None
+        for new, prev in zip((self._matrix, self._scales), old):
+            if new is not None and prev is not None:
+                new[:self._size] = prev[:self._size]
+
+    def _store(self, rows, vectors):
+        codes, scales = quantize(vectors, self.dtype)
+        self._matrix[rows] = codes
+        if scales is not None:
+            self._scales[rows] = scales
+
+    def _ensure_dim(self, dim):
+        if self.dim is None:
+            self.dim = dim
+            self._allocate(self._capacity)
+        elif dim != self.dim:
+            raise ValueError(f"Embedding has {dim} dims, gallery expects {self.dim}")
+
+    def _grow(self, needed):
+        if needed <= self._capacity:
+            return
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        self._allocate(capacity)
+        ids = np.empty(capacity, dtype=object)
+        ids[:self._size] = self._ids[:self._size]
+        self._ids, self._capacity = ids, capacity
+
+    def add(self, user_id, embedding):
+        """Insert an embedding, or overwrite it if the id is already present."""
+        vector = l2_normalize(as_vector(embedding))
+        with self._lock:
+            self._ensure_dim(vector.shape[0])
+            row = self._rows.get(user_id)
+            if row is None:
+                self._grow(self._size + 1)
+                row = self._size
+                self._rows[user_id] = row
+                self._ids[row] = user_id
+                self._size += 1
+            self._store(row, vector)
+
+    def add_many(self, user_ids, embeddings):
+        """Bulk insert; much cheaper than repeated add() for initial loads."""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        if isinstance(embeddings, np.ndarray) and embeddings.ndim == 2:
+            vectors = l2_normalize(embeddings)
+        else:
+            vectors = l2_normalize(np.stack([as_vector(e) for e in embeddings]))
+        with self._lock:
+            self._ensure_dim(vectors.shape[1])
+            fresh = {}  # a repeated new id keeps its last vector
+            for user_id, vector in zip(user_ids, vectors):
+                row = self._rows.get(user_id)
+                if row is None:
+                    fresh[user_id] = vector
+                else:
+                    self._store(row, vector)
+            if not fresh:
+                return
+            start = self._size
+            self._grow(start + len(fresh))
+            for offset, user_id in enumerate(fresh):
+                self._rows[user_id] = start + offset
+                self._ids[start + offset] = user_id
+            self._store(slice(start, start + len(fresh)), np.stack(list(fresh.values())))
+            self._size += len(fresh)
+
+    def vectors(self, user_ids):
+        """Normalized float32 rows for the given ids (decoded if compact)."""
+        with self._lock:
+            rows = [self._rows[user_id] for user_id in user_ids]
+            scales = self._scales[rows] if self._scales is not None else None
+            return dequantize(self._matrix[rows], scales)
+
+    def update(self, user_id, embedding):
+        if user_id not in self._rows:
+            raise KeyError(user_id)
+        self.add(user_id, embedding)
+
+    def remove(self, user_id):
+        """Drop an id. Returns False if it was not in the gallery."""
+        with self._lock:
+            row = self._rows.pop(user_id, None)
+            if row is None:
+                return False
+            last = self._size - 1
+            if row != last:
+                moved = self._ids[last]
+                for store in (self._matrix, self._scales):
+                    if store is not None:
+                        store[row] = store[last]
+                self._ids[row] = moved
+                self._rows[moved] = row
+            self._ids[last] = None
+            self._size -= 1
+            return True
+
+    def apply_changes(self, upserts, removed=()):
+        """Sync hook: `upserts` are (user_id, lounge_id, embedding) rows."""
+        for user_id in removed:
+            self.remove(user_id)
+        if upserts:
+            self.add_many([u[0] for u in upserts], [u[2] for u in upserts])
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+            self._ids[:] = None
+            self._size = 0
+
+    # ── search ───────────────────────────────────────────────────
+
+    def search(self, probe, k=1):
+        """Top-k (user_id, similarity) pairs for one probe, best first."""
+        return self.search_batch(as_vector(probe)[None, :], k)[0]
+
+    def search_batch(self, probes, k=1):
+        """Top-k results for many probes at once (one GEMM for the batch)."""
+        if isinstance(probes, np.ndarray) and probes.ndim == 2:
+            queries = l2_normalize(probes)
+        else:
+            queries = l2_normalize(np.stack([as_vector(p) for p in probes]))
+        with self._lock:
+            if self._size == 0:
+                return [[] for _ in range(len(queries))]
+            if queries.shape[1] != self.dim:
+                raise ValueError(f"Probe has {queries.shape[1]} dims, gallery expects {self.dim}")
+            n = self._size
+            scales = self._scales[:n] if self._scales is not None else None
+            scores = quantized_scores(queries, self._matrix[:n], scales)
+            ids = self._ids[:n].copy()
+        if self.rerank:
+            return self._rerank(queries, scores, ids, k)
+        return top_k(scores, ids, k)
+
+    def _rerank(self, queries, scores, ids, k):
+        # Exact scores for the best `rerank` compact-scan candidates; the
+        # source is read outside the lock, k rows at a time
+        r = min(max(k, self.rerank), scores.shape[1])
+        candidates = np.argpartition(-scores, r - 1, axis=1)[:, :r]
+        try:
+            exact = self._exact_rows(list({ids[c] for c in candidates.ravel()}))
+        except Exception as exc:
+            print(f"[gallery] re-rank source failed, keeping compact scores: {exc!r}")
+            exact = {}
+        results = []
+        for query, cols, row in zip(queries, candidates, scores):
+            rescored = np.array([
+                float(l2_normalize(exact[ids[c]]) @ query) if ids[c] in exact else float(row[c])
+                for c in cols
+            ])
+            order = np.argsort(-rescored)[:k]
+            results.append([(ids[cols[i]], float(rescored[i])) for i in order])
+        return results
+
+    def best_match(self, probe, threshold=0.7):
+        """Best (user_id, similarity) if it clears the threshold, else None."""
+        hits = self.search(probe, k=1)
+        if hits and hits[0][1] >= threshold:
+            return hits[0]
+        return None
+
+
+def top_k(scores, ids, k):
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(scores.shape[1]), (scores.shape[0], k))
+    results = []
+    for row, cols in enumerate(top):
+        picked = scores[row, cols]
+        order = np.argsort(-picked)
+        results.append([(ids[cols[i]], float(picked[i])) for i in order])
+    return results
@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import OrderedDict
+
+from app.similarity.matcher import GalleryIndex
+
+
+class LoungeShardCache:
+    """
+    One GalleryIndex per lounge, loaded on first use and evicted LRU.
+
+    `load_shard(lounge_id)` returns `(user_ids, embeddings)` for the members
+    mapped to that lounge; `load_global()` does the same for the whole
+    network and backs the optional fallback search (it may also return a
+    ready-made gallery such as a SnapshotGallery). At most `max_shards`
+    lounges are kept hot, and shards untouched for `idle_ttl` seconds are
+    dropped on the next access. `make_index` builds each in-memory shard
+    (e.g. a compact int8 GalleryIndex).
+    """
+
+    def __init__(self, load_shard, load_global=None, max_shards=64, idle_ttl=900.0,
+                 make_index=GalleryIndex):
+        self._load_shard = load_shard
+        self._make_index = make_index
+        self._load_global = load_global
+        self.max_shards = max_shards
+        self.idle_ttl = idle_ttl
+        self._shards = OrderedDict()  # lounge_id -> (GalleryIndex, last_used)
+        self._global = None
+        self._lock = threading.Lock()
+        self._global_lock = threading.Lock()
+        self._loading = {}  # lounge_id -> Lock, so one request loads a shard
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._shards)
+
+    def __contains__(self, lounge_id):
+        return lounge_id in self._shards
+
+    def _build(self, rows):
+        user_ids, embeddings = rows
+        index = self._make_index()
+        index.add_many(user_ids, embeddings)
+        return index
+
+    def get(self, lounge_id):
+        """GalleryIndex for a lounge, loading it if it is not resident."""
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._shards.get(lounge_id)
+            if entry is not None:
+                self._shards[lounge_id] = (entry[0], now)
+                self._shards.move_to_end(lounge_id)
+                self.hits += 1
+                return entry[0]
+            load_lock = self._loading.setdefault(lounge_id, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                entry = self._shards.get(lounge_id)
+                if entry is not None:
+                    self.hits += 1
+                    return entry[0]
+            index = self._build(self._load_shard(lounge_id))
+            with self._lock:
+                self.misses += 1
+                self._shards[lounge_id] = (index, time.monotonic())
+                self._loading.pop(lounge_id, None)
+                while len(self._shards) > self.max_shards:
+                    self._shards.popitem(last=False)
+                    self.evictions += 1
+            return index
+
+    def global_index(self):
+        if self._load_global is None:
+            raise RuntimeError("No global gallery loader configured")
+        with self._global_lock:
+            if self._global is None:
+                loaded = self._load_global()
+                self._global = self._build(loaded) if isinstance(loaded, tuple) else loaded
+            return self._global
+
+    def _evict_idle(self, now):
+        while self._shards:
+            lounge_id, (_, last_used) = next(iter(self._shards.items()))
+            if now - last_used < self.idle_ttl:
+                break
+            del self._shards[lounge_id]
+            self.evictions += 1
+
+    def evict_idle(self):
+        with self._lock:
+            self._evict_idle(time.monotonic())
+
+    def invalidate(self, lounge_id=None):
+        """Drop one lounge's shard (or everything) so it reloads on next use."""
+        with self._lock:
+            if lounge_id is None:
+                self._shards.clear()
+                self._global = None
+            else:
+                self._shards.pop(lounge_id, None)
+
+    def apply_changes(self, upserts, removed=()):
+        """
+        Sync hook: patch resident shards (and the global gallery, if loaded)
+        in place. Lounges that are not resident pick changes up on load.
+        """
+        with self._lock:
+            shards = {lounge_id: entry[0] for lounge_id, entry in self._shards.items()}
+        for user_id in removed:
+            for index in shards.values():
+                index.remove(user_id)
+        for user_id, lounge_id, embedding in upserts:
+            # A member may have moved lounges; drop them from every other shard
+            for shard_lounge, index in shards.items():
+                if shard_lounge == lounge_id:
+                    index.add(user_id, embedding)
+                else:
+                    index.remove(user_id)
+        if self._global is not None:
+            self._global.apply_changes(upserts, removed)
+
+    def resident(self):
+        """Snapshot of the lounges currently held in memory."""
+        with self._lock:
+            return list(self._shards)
+
+    def sizes(self):
+        """Identities per resident shard, plus "global" when it is loaded."""
+        with self._lock:
+            sizes = {lounge_id: len(index) for lounge_id, (index, _) in self._shards.items()}
+        if self._global is not None:
+            sizes["global"] = len(self._global)
+        return sizes
+
+    def best_match(self, lounge_id, probe, threshold=0.7, fallback=False):
+        """
+        Search the lounge's shard first; with `fallback`, retry against the
+        global gallery when the lounge has no match. Returns
+        `(user_id, similarity, scope)` with scope "lounge" or "global", or None.
+        """
+        if lounge_id is not None:
+            match = self.get(lounge_id).best_match(probe, threshold)
+            if match is not None:
+                return match[0], match[1], "lounge"
+            if not fallback:
+                return None
+        match = self.global_index().best_match(probe, threshold)
+        if match is not None:
+            return match[0], match[1], "global"
+        return None
@@ -0,0 +1,142 @@
+import threading
+
+import numpy as np
+
+from app.similarity.matcher import GalleryIndex, as_vector, l2_normalize
+
+
+def fuse_templates(embeddings, max_templates=3, min_consistency=0.5):
+    """
+    Turn the embeddings of one enrolment into templates.
+
+    Captures that disagree with the rest (similarity to the centroid below
+    `min_consistency`: a blurred frame, a second person) are dropped unless
+    that would drop everything. Returns `(fused, templates)`: the
+    renormalized mean of the kept captures, and up to `max_templates` of
+    them picked farthest-first so the set covers pose/lighting variety.
+    """
+    vectors = l2_normalize(np.stack([as_vector(e) for e in embeddings]))
+    centroid = l2_normalize(vectors.mean(axis=0))
+    consistency = vectors @ centroid
+    kept = vectors[consistency >= min_consistency]
+    if not len(kept):
+        kept = vectors
+    fused = l2_normalize(kept.mean(axis=0))
+
+    picked = [int(np.argmax(kept @ fused))]
+    while len(picked) < min(max_templates, len(kept)):
+        closest = (kept @ kept[picked].T).max(axis=1)
+        closest[picked] = np.inf
+        picked.append(int(np.argmin(closest)))
+    return fused, kept[picked]
+
+
+class TemplateGallery:
+    """
+    Gallery with several templates per user, scored with `aggregate`:
+    "max" (best-matching template) or "mean" (average over the user's
+    templates).
+
+    Templates live as (user_id, slot) rows of one GalleryIndex, so search
+    is still a single matrix multiply; rows are then folded per user. The
+    top k*max_templates rows always contain the top k users under max; for
+    mean, those candidates are re-scored over all their templates.
+    Embeddings may be one vector or a (n, dim) array of sub-templates.
+    """
+
+    def __init__(self, dim=None, capacity=1024, aggregate="max", max_templates=3, **index_kwargs):
+        if aggregate not in ("max", "mean"):
+            raise ValueError(f"Unknown template aggregate {aggregate!r}")
+        self.aggregate = aggregate
+        self.max_templates = max_templates
+        self.index = GalleryIndex(dim=dim, capacity=capacity * max_templates, **index_kwargs)
+        self._slots = {}  # user_id -> number of template rows
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, user_id):
+        return user_id in self._slots
+
+    @property
+    def dim(self):
+        return self.index.dim
+
+    @property
+    def ids(self):
+        return list(self._slots)
+
+    def _templates(self, embedding):
+        if isinstance(embedding, np.ndarray) and embedding.ndim == 2:
+            return embedding[:self.max_templates]
+        return as_vector(embedding)[None, :]
+
+    # ── mutation ─────────────────────────────────────────────────
+
+    def add_many(self, user_ids, embeddings):
+        keys, rows = [], []
+        with self._lock:
+            for user_id, embedding in zip(user_ids, embeddings):
+                self.remove(user_id)
+                templates = self._templates(embedding)
+                self._slots[user_id] = len(templates)
+                keys.extend((user_id, slot) for slot in range(len(templates)))
+                rows.extend(templates)
+            if keys:
+                self.index.add_many(keys, np.stack(rows))
+
+    def add(self, user_id, embedding):
+        self.add_many([user_id], [embedding])
+
+    def remove(self, user_id):
+        with self._lock:
+            count = self._slots.pop(user_id, None)
+            if count is None:
+                return False
+            for slot in range(count):
+                self.index.remove((user_id, slot))
+            return True
+
+    def apply_changes(self, upserts, removed=()):
+        for user_id in removed:
+            self.remove(user_id)
+        if upserts:
+            self.add_many([u[0] for u in upserts], [u[2] for u in upserts])
+
+    def clear(self):
+        with self._lock:
+            self._slots.clear()
+            self.index.clear()
+
+    # ── search ───────────────────────────────────────────────────
+
+    def search_batch(self, probes, k=1):
+        if isinstance(probes, np.ndarray) and probes.ndim == 2:
+            queries = l2_normalize(probes)
+        else:
+            queries = l2_normalize(np.stack([as_vector(p) for p in probes]))
+        with self._lock:
+            rows = self.index.search_batch(queries, k * self.max_templates)
+            results = []
+            for query, hits in zip(queries, rows):
+                best = {}
+                for (user_id, _), score in hits:
+                    best.setdefault(user_id, score)
+                users = list(best)
+                if self.aggregate == "mean":
+                    for user_id in users:
+                        keys = [(user_id, slot) for slot in range(self._slots[user_id])]
+                        best[user_id] = float((self.index.vectors(keys) @ query).mean())
+                ranked = sorted(users, key=lambda u: -best[u])[:k]
+                results.append([(u, best[u]) for u in ranked])
+        return results
+
+    def search(self, probe, k=1):
+        return self.search_batch(as_vector(probe)[None, :], k)[0]
+
+    def best_match(self, probe, threshold=0.7):
+        hits = self.search(probe, k=1)
+        if hits and hits[0][1] >= threshold:
+            return hits[0]
+        return None
@@ -0,0 +1,111 @@
+"""
+Recall-vs-latency benchmark: IVF / IVF-PQ against exact GalleryIndex search.
+
+    python benchmarks/ann_benchmark.py --size 100000 --dim 128 --nlist 512
+    python benchmarks/ann_benchmark.py --size 1000000 --pq-m 16 --json out.json
+
+Uses a synthetic clustered gallery (faces are not uniformly spread on the
+sphere) and probes that are noisy copies of enrolled vectors, i.e. the
+same-person-different-capture case the gate actually sees.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from app.similarity.ann import IVFIndex
+from app.similarity.matcher import GalleryIndex, l2_normalize
+
+
+def synthetic_gallery(size, dim, clusters, spread=1.5, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = l2_normalize(rng.standard_normal((clusters, dim)))
+    assign = rng.integers(0, clusters, size)
+    return l2_normalize(centers[assign] + spread * rng.standard_normal((size, dim)) / np.sqrt(dim))
+
+
+def noisy_probes(gallery, count, noise=0.5, seed=1):
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(gallery), count, replace=False)
+    dim = gallery.shape[1]
+    return picks, l2_normalize(gallery[picks] + noise * rng.standard_normal((count, dim)) / np.sqrt(dim))
+
+
+def time_queries(search, probes):
+    latencies = []
+    results = []
+    for probe in probes:
+        start = time.perf_counter()
+        results.append(search(probe))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, np.array(latencies)
+
+
+def recall(results, truth, k):
+    hits = 0
+    for got, want in zip(results, truth):
+        hits += len({i for i, _ in got[:k]} & {i for i, _ in want[:k]})
+    return hits / (len(truth) * k)
+
+
+def summarize(name, latencies, **extra):
+    row = {
+        "name": name,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        **extra,
+    }
+    print(f"{name:<24} p50={row['p50_ms']:.3f}ms p95={row['p95_ms']:.3f}ms "
+          + " ".join(f"{k}={v:.4f}" if isinstance(v, float) else f"{k}={v}" for k, v in extra.items()))
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0, help="default: 4*sqrt(size)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    parser.add_argument("--pq-m", type=int, default=0, help="bytes per vector for IVF-PQ (0 = flat)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    nlist = args.nlist or int(4 * np.sqrt(args.size))
+    gallery = synthetic_gallery(args.size, args.dim, clusters=max(16, nlist // 2))
+    ids = np.arange(args.size)
+    _, probes = noisy_probes(gallery, args.queries)
+
+    exact = GalleryIndex(dim=args.dim, capacity=args.size)
+    exact.add_many(ids, gallery)
+    truth, latencies = time_queries(lambda p: exact.search(p, k=args.k), probes)
+    rows = [summarize("exact", latencies, recall=1.0, recall_at_1=1.0)]
+
+    start = time.perf_counter()
+    ivf = IVFIndex(args.dim, nlist=nlist, pq_m=args.pq_m or None)
+    ivf.train(gallery)
+    ivf.add_many(ids, gallery)
+    build_s = time.perf_counter() - start
+    print(f"built IVF nlist={nlist} pq_m={args.pq_m} in {build_s:.1f}s")
+
+    for nprobe in args.nprobe:
+        got, latencies = time_queries(lambda p: ivf.search(p, k=args.k, nprobe=nprobe), probes)
+        rows.append(summarize(
+            f"ivf nprobe={nprobe}", latencies,
+            recall=recall(got, truth, args.k), recall_at_1=recall(got, truth, 1),
+        ))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"params": vars(args), "nlist": nlist, "build_s": build_s, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Fit the cheap liveness checks to a camera from labelled face crops.
+
+    python benchmarks/liveness_calibration.py --live crops/live --spoof crops/spoof
+
+Each directory holds face crops (as /register or the detector would cut
+them) taken with the kiosk camera: real people in --live, prints and
+phone/tablet replays in --spoof. It prints the raw LBP entropy and
+high-frequency share of each set, suggests FACE_LIVENESS_TEXTURE_* and
+FACE_LIVENESS_FREQUENCY_* values that place each class median at 0.9 /
+0.1 of its logistic, and shows how the current settings decide both
+sets (accept / reject outright / escalate to the model or threshold).
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cv2
+import numpy as np
+
+from app.liveness import liveness_detector as liveness
+
+
+def load_crops(directory):
+    paths = sorted(
+        p for ext in ("jpg", "jpeg", "png")
+        for p in glob.glob(os.path.join(directory, f"**/*.{ext}"), recursive=True)
+    )
+    crops = [cv2.imread(p) for p in paths]
+    return [c for c in crops if c is not None]
+
+
+def measure(crops):
+    rows = [liveness.raw_features(c)[1:] for c in crops]
+    return {
+        "entropy": np.array([r[0] for r in rows]),
+        "share": np.array([r[1] for r in rows]),
+        "moire": np.array([r[2] for r in rows]),
+    }
+
+
+def fit(live, spoof):
+    # Centre halfway between the class medians; scale so each median
+    # lands at 0.9 (live) / 0.1 (spoof) of the logistic
+    lo, hi = float(np.median(spoof)), float(np.median(live))
+    return (lo + hi) / 2, max(abs(hi - lo), 1e-6) / (2 * math.log(9))
+
+
+def outcomes(crops):
+    counts = {"accept": 0, "reject": 0, "escalate": 0}
+    for crop in crops:
+        score = liveness.cheap_score(liveness.extract(crop), None)
+        if score <= liveness.REJECT:
+            counts["reject"] += 1
+        elif score >= liveness.ACCEPT:
+            counts["accept"] += 1
+        else:
+            counts["escalate"] += 1
+    return counts
+
+
+def describe(name, values):
+    p = np.percentile(values, [10, 50, 90])
+    return f"{name:>8}: p10 {p[0]:.4f}  p50 {p[1]:.4f}  p90 {p[2]:.4f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--live", required=True, help="directory of real-face crops")
+    parser.add_argument("--spoof", required=True, help="directory of print/screen crops")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    live_crops, spoof_crops = load_crops(args.live), load_crops(args.spoof)
+    if not live_crops or not spoof_crops:
+        sys.exit("Need at least one readable crop in each of --live and --spoof")
+    live, spoof = measure(live_crops), measure(spoof_crops)
+
+    for label, stats in (("live", live), ("spoof", spoof)):
+        print(f"{label} ({len(stats['entropy'])} crops, {int(stats['moire'].sum())} flagged moiré)")
+        print(describe("entropy", stats["entropy"]))
+        print(describe("share", stats["share"]))
+
+    texture = fit(live["entropy"], spoof["entropy"])
+    frequency = fit(live["share"], spoof["share"])
+    print("\nsuggested settings:")
+    print(f"FACE_LIVENESS_TEXTURE_CENTER={texture[0]:.4f}")
+    print(f"FACE_LIVENESS_TEXTURE_SCALE={texture[1]:.4f}")
+    print(f"FACE_LIVENESS_FREQUENCY_CENTER={frequency[0]:.4f}")
+    print(f"FACE_LIVENESS_FREQUENCY_SCALE={frequency[1]:.4f}")
+
+    current = {"live": outcomes(live_crops), "spoof": outcomes(spoof_crops)}
+    print("\nwith the current settings:")
+    for label, counts in current.items():
+        print(f"{label:>6}: " + "  ".join(f"{k} {v}" for k, v in counts.items()))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "texture": {"center": texture[0], "scale": texture[1]},
+                "frequency": {"center": frequency[0], "scale": frequency[1]},
+                "current": current,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Latency/throughput benchmark for the face-service hot path.
+
+Offline (no database, no running server):
+
+    python benchmarks/pipeline_benchmark.py
+    python benchmarks/pipeline_benchmark.py --faces fixtures/faces --gallery 1000 100000 1000000
+    python benchmarks/pipeline_benchmark.py --stages decode detect search --concurrency 1 4 --json base.json
+
+Against a running service (POST /verify/frame, /verify and, with
+--register, /face/register, which writes to face_embeddings):
+
+    python benchmarks/pipeline_benchmark.py --url http://localhost:8000 --lounge-id <uuid> --concurrency 1 8 32
+
+Each stage (decode, detect, liveness, embed, search, end-to-end verify and
+register without the database write) is run at
+every concurrency level and reported as p50/p95/p99 latency plus
+throughput; --json writes the rows with the run parameters and
+environment so two runs can be diffed. Frames come from --faces (any
+jpg/png) or are synthesized; stages whose dependencies are missing
+(e.g. DeepFace for embed) are reported as skipped.
+"""
+import argparse
+import base64
+import glob
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cv2
+import numpy as np
+
+from ann_benchmark import summarize, synthetic_gallery
+from app.detection.detector import create_detector, decode_image, detect_single_face
+from app.similarity.matcher import GalleryIndex
+from app.similarity.templates import fuse_templates
+
+STAGES = ("decode", "detect", "liveness", "embed", "search", "end_to_end")
+
+
+# ── inputs ─────────────────────────────────────────────────────────────
+
+def synthetic_frame(rng, width=1280, height=720):
+    """A noisy frame with a face-like blob; good enough to load the codecs."""
+    frame = cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), (0, 0), 6)
+    cx, cy = width // 2 + int(rng.integers(-80, 80)), height // 2
+    cv2.ellipse(frame, (cx, cy), (110, 140), 0, 0, 360, (150, 170, 210), -1)
+    for dx in (-40, 40):
+        cv2.circle(frame, (cx + dx, cy - 30), 12, (40, 40, 40), -1)
+    cv2.ellipse(frame, (cx, cy + 60), (40, 12), 0, 0, 180, (60, 60, 120), -1)
+    return frame
+
+
+def load_frames(faces_dir, count, seed=0):
+    """JPEG bytes for `count` frames (fixtures cycled, or synthesized)."""
+    paths = sorted(glob.glob(os.path.join(faces_dir, "*.jpg")) + glob.glob(os.path.join(faces_dir, "*.png"))) if faces_dir else []
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(count):
+        image = cv2.imread(paths[i % len(paths)]) if paths else synthetic_frame(rng)
+        frames.append(cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes())
+    return frames
+
+
+def face_crop(detector, image):
+    faces = detector.detect(image)
+    if faces:
+        d = faces[0]
+        return image[d.y:d.y + d.h, d.x:d.x + d.w]
+    # Synthetic frames rarely fool a real detector; fall back to the centre
+    h, w = image.shape[:2]
+    side = min(h, w) // 2
+    return image[(h - side) // 2:(h + side) // 2, (w - side) // 2:(w + side) // 2]
+
+
+# ── runner ─────────────────────────────────────────────────────────────
+
+def run(fn, items, concurrency, warmup=3):
+    """Call fn(item) for every item from `concurrency` threads."""
+    for item in items[:warmup]:
+        fn(item)
+
+    def timed(item):
+        start = time.perf_counter()
+        fn(item)
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = np.array(list(pool.map(timed, items)))
+    return latencies, len(items) / (time.perf_counter() - start)
+
+
+def record(rows, name, fn, items, levels, **extra):
+    for concurrency in levels:
+        latencies, throughput = run(fn, items, concurrency)
+        rows.append(summarize(
+            f"{name} c={concurrency}", latencies,
+            stage=name, concurrency=concurrency, throughput_per_s=float(throughput), **extra,
+        ))
+
+
+def skipped(rows, name, reason):
+    print(f"{name:<24} skipped: {reason}")
+    rows.append({"name": name, "stage": name, "skipped": reason})
+
+
+# ── offline stages ─────────────────────────────────────────────────────
+
+def offline(args, rows):
+    frames = load_frames(args.faces, args.frames)
+    detector = create_detector(args.detector)
+    images = [decode_image(f) for f in frames]
+    crops = [face_crop(detector, image) for image in images]
+    levels = args.concurrency
+
+    if "decode" in args.stages:
+        record(rows, "decode", decode_image, frames, levels)
+        record(rows, "decode_full", lambda f: decode_image(f, 0), frames, levels)
+    if "detect" in args.stages:
+        # Detectors are not thread-safe; give each worker thread its own
+        local = threading.local()
+
+        def detect(image):
+            if not hasattr(local, "detector"):
+                local.detector = create_detector(args.detector)
+            return local.detector.detect(image)
+
+        record(rows, "detect", detect, images, levels, backend=type(detector).__name__)
+        # What /verify runs: decode, detect and crop (re-decoding at full
+        # scale only for faces smaller than the model input)
+        record(rows, "detect_single_face", detect_single_face, frames, levels)
+
+    if "liveness" in args.stages:
+        try:
+            from app.liveness.liveness_detector import check_liveness
+            record(rows, "liveness", lambda c: check_liveness([c]), crops, levels)
+        except ImportError as exc:
+            skipped(rows, "liveness", str(exc))
+
+    engine = None
+    if {"embed", "end_to_end"} & set(args.stages):
+        try:
+            from app.embedding.engine import EmbeddingEngine
+            engine = EmbeddingEngine(args.model).load()
+        except ImportError as exc:
+            skipped(rows, "embed", str(exc))
+    if engine is not None and "embed" in args.stages:
+        record(rows, "embed", lambda c: engine.embed(c), crops, levels)
+        batch = [crops[i:i + args.batch] for i in range(0, len(crops), args.batch)]
+        record(rows, f"embed_batch{args.batch}", engine.embed_batch, batch, levels)
+
+    dim = engine.dim if engine is not None else args.dim
+    galleries = {}
+    for size in args.gallery:
+        index = GalleryIndex(dim=dim, capacity=size, dtype=args.dtype)
+        index.add_many(np.arange(size), synthetic_gallery(size, dim, clusters=max(16, int(np.sqrt(size)))))
+        galleries[size] = index
+    probes = list(synthetic_gallery(args.frames, dim, clusters=16, seed=7))
+    if "search" in args.stages:
+        for size, index in galleries.items():
+            record(rows, f"search_{size}", lambda p, index=index: index.search(p, k=1), probes, levels,
+                   gallery=size, dtype=args.dtype)
+
+    if "end_to_end" in args.stages and engine is not None:
+        index = galleries[max(galleries)]
+
+        def verify(frame):
+            image = decode_image(frame)
+            crop = face_crop(detector, image)
+            return index.best_match(engine.embed(crop))
+
+        record(rows, "end_to_end_verify", verify, frames, levels, gallery=max(galleries))
+
+        # /face/register minus the database write: three captures per user
+        def register(group):
+            crops = [face_crop(detector, decode_image(f)) for f in group]
+            return fuse_templates(engine.embed_batch(crops))
+
+        groups = [frames[i:i + 3] for i in range(0, len(frames) - 2, 3)]
+        record(rows, "end_to_end_register", register, groups, levels)
+
+
+# ── HTTP mode ──────────────────────────────────────────────────────────
+
+def _post(url, body, content_type):
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": content_type}, method="POST")
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.read()
+
+
+def _multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, filename, data in files:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: image/jpeg\r\n\r\n'.encode() + data + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def http(args, rows):
+    frames = load_frames(args.faces, args.frames)
+    base = args.url.rstrip("/")
+    query = f"?lounge_id={args.lounge_id}" if args.lounge_id else ""
+    levels = args.concurrency
+
+    record(rows, "http_verify_frame", lambda f: _post(f"{base}/verify/frame{query}", f, "image/jpeg"), frames, levels)
+
+    def verify_json(frame):
+        payload = {"image_base64": base64.b64encode(frame).decode()}
+        if args.lounge_id:
+            payload["lounge_id"] = args.lounge_id
+        return _post(f"{base}/verify", json.dumps(payload).encode(), "application/json")
+
+    record(rows, "http_verify_json", verify_json, frames, levels)
+
+    if args.register:
+        def register(frame):
+            body, content_type = _multipart(
+                {"user_id": str(uuid.uuid4())}, [("images", "face.jpg", frame)] * 3
+            )
+            return _post(f"{base}/face/register", body, content_type)
+
+        record(rows, "http_register", register, frames, levels)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--faces", help="directory of fixture face images (default: synthetic frames)")
+    parser.add_argument("--frames", type=int, default=200, help="requests per stage and level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--gallery", type=int, nargs="+", default=[1_000, 100_000])
+    parser.add_argument("--dim", type=int, default=512, help="gallery dim when no model is loaded")
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16", "int8"])
+    parser.add_argument("--detector", choices=["haar", "yunet"], help="default: FACE_DETECTOR")
+    parser.add_argument("--model", default=os.getenv("FACE_MODEL_NAME", "ArcFace"))
+    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument("--url", help="benchmark a running service instead of in-process stages")
+    parser.add_argument("--lounge-id")
+    parser.add_argument("--register", action="store_true", help="also POST /face/register (writes to the DB)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    rows = []
+    if args.url:
+        http(args, rows)
+    else:
+        offline(args, rows)
+
+    if args.json:
+        environment = {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "cpus": os.cpu_count(),
+            "machine": platform.machine(),
+        }
+        with open(args.json, "w") as f:
+            json.dump({"params": vars(args), "environment": environment, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
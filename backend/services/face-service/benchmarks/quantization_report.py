@@ -0,0 +1,98 @@
+"""
+Accuracy-regression report for compact gallery formats against float32.
+
+    python benchmarks/quantization_report.py --size 100000 --dim 128
+    python benchmarks/quantization_report.py --dim 512 --rerank 32 --json q.json
+
+For float16 and int8, with and without an exact re-rank, it reports
+resident bytes, query latency, top-1 agreement and recall@k against the
+float32 index, the worst and mean absolute similarity error, and how many
+accept/reject decisions flip at the match threshold.
+
+The compact formats buy memory, not speed: NumPy has no int8 or float16
+GEMM, so their scans widen rows to float32 block by block. Expect int8
+at roughly 1.2-1.6x float32 latency on 128-D galleries (closer to parity
+at 512-D) and float16 several times slower. The re-rank here reads exact
+rows from an in-memory dict; in the service they come from the database
+(fetch_exact_rows), so add one indexed query to its latency.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from ann_benchmark import noisy_probes, recall, summarize, synthetic_gallery, time_queries
+from app.similarity.matcher import GalleryIndex
+
+
+def build(dtype, gallery, ids, rerank=0):
+    exact = (lambda keys: {key: gallery[key] for key in keys}) if rerank else None
+    index = GalleryIndex(dim=gallery.shape[1], capacity=len(gallery), dtype=dtype, rerank=rerank, exact_rows=exact)
+    index.add_many(ids, gallery)
+    return index
+
+
+def score_errors(got, truth):
+    # Compare the score each format gives the float32 top-1 candidate
+    errors = []
+    for g, t in zip(got, truth):
+        scores = dict(g)
+        if t and t[0][0] in scores:
+            errors.append(abs(scores[t[0][0]] - t[0][1]))
+    return np.array(errors or [0.0])
+
+
+def decision_flips(got, truth, threshold):
+    flips = 0
+    for g, t in zip(got, truth):
+        want = bool(t) and t[0][1] >= threshold
+        have = bool(g) and g[0][1] >= threshold
+        flips += want != have or (want and g[0][0] != t[0][0])
+    return flips
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--noise", type=float, default=0.8, help="probe noise; higher = harder")
+    parser.add_argument("--rerank", type=int, default=32, help="candidates re-scored against exact rows")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    gallery = synthetic_gallery(args.size, args.dim, clusters=max(16, int(2 * np.sqrt(args.size))))
+    ids = np.arange(args.size)
+    _, probes = noisy_probes(gallery, args.queries, noise=args.noise)
+
+    reference = build("float32", gallery, ids)
+    truth, latencies = time_queries(lambda p: reference.search(p, k=args.k), probes)
+    rows = [summarize("float32", latencies, mbytes=reference.nbytes / 2**20)]
+
+    for dtype, rerank in (("float16", 0), ("int8", 0), ("int8", args.rerank)):
+        index = build(dtype, gallery, ids, rerank)
+        got, latencies = time_queries(lambda p: index.search(p, k=args.k), probes)
+        errors = score_errors(got, truth)
+        rows.append(summarize(
+            f"{dtype} rerank={rerank}" if rerank else dtype, latencies,
+            mbytes=index.nbytes / 2**20,
+            top1_agreement=recall(got, truth, 1),
+            recall=recall(got, truth, args.k),
+            max_abs_err=float(errors.max()),
+            mean_abs_err=float(errors.mean()),
+            decision_flips=decision_flips(got, truth, args.threshold),
+        ))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"params": vars(args), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
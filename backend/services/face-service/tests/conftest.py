@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# The service imports itself as `app.…` from its own directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Importing the API creates the attendance spool; keep it out of the tree
+os.environ.setdefault("FACE_ATTENDANCE_SPOOL", os.path.join(tempfile.mkdtemp(prefix="face-tests-"), "spool.jsonl"))
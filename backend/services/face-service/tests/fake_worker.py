@@ -0,0 +1,50 @@
+"""
+Stand-in for worker_pool._worker_main that needs no model: each slot's
+"embedding" is the mean pixel value of its crop, repeated DIM times
+(FAKE_WORKER_DIM, default 4). Like the real worker, it refuses to start
+when the pool's slots are sized for another embedding length.
+
+Flag files named by environment variables steer it, since the pool
+spawns fresh processes:
+  FAKE_WORKER_DIE   exit without answering (the file is removed first)
+  FAKE_WORKER_HOLD  hold the next task until the file is removed
+"""
+
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+DIM = 4
+
+
+def run(worker_id, cpus, model_name, size, dim, slots, in_name, out_name,
+        tasks, results, max_batch, max_wait):
+    model_dim = int(os.environ.get("FAKE_WORKER_DIM", DIM))
+    if model_dim != dim:
+        results.send(("error", worker_id, f"model produces {model_dim}-D embeddings, slots hold {dim}"))
+        return
+    in_shm = shared_memory.SharedMemory(name=in_name)
+    out_shm = shared_memory.SharedMemory(name=out_name)
+    crops = np.ndarray((slots, *size, 3), dtype=np.uint8, buffer=in_shm.buf)
+    out = np.ndarray((slots, dim), dtype=np.float32, buffer=out_shm.buf)
+    results.send(("ready", worker_id, model_dim))
+    try:
+        while True:
+            slot = tasks.get()
+            if slot is None:
+                return
+            die = os.environ.get("FAKE_WORKER_DIE")
+            if die and os.path.exists(die):
+                os.remove(die)
+                os._exit(1)
+            hold = os.environ.get("FAKE_WORKER_HOLD")
+            while hold and os.path.exists(hold):
+                time.sleep(0.01)
+            out[slot] = crops[slot].mean()
+            results.send(("done", worker_id, ([slot], None)))
+    finally:
+        del crops, out
+        in_shm.close()
+        out_shm.close()
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from app.similarity.ann import IVFIndex
+from app.similarity.matcher import GalleryIndex, l2_normalize
+
+DIM = 32
+
+
+def clustered(size, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = l2_normalize(rng.standard_normal((20, DIM)))
+    return l2_normalize(centers[rng.integers(0, 20, size)] + 0.5 * rng.standard_normal((size, DIM)) / np.sqrt(DIM))
+
+
+@pytest.fixture(scope="module")
+def gallery():
+    return clustered(2000)
+
+
+@pytest.fixture(scope="module")
+def probes(gallery):
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(gallery), 100, replace=False)
+    return l2_normalize(gallery[picks] + 0.3 * rng.standard_normal((100, DIM)) / np.sqrt(DIM))
+
+
+def build(gallery, **kwargs):
+    index = IVFIndex(DIM, nlist=16, nprobe=4, **kwargs)
+    index.train(gallery)
+    index.add_many(range(len(gallery)), gallery)
+    return index
+
+
+def recall(index, gallery, probes):
+    exact = GalleryIndex(dim=DIM)
+    exact.add_many(range(len(gallery)), gallery)
+    want = [hits[0][0] for hits in exact.search_batch(probes)]
+    got = [hits[0][0] if hits else None for hits in index.search_batch(probes)]
+    return np.mean([a == b for a, b in zip(want, got)])
+
+
+def test_ivf_recall_against_brute_force(gallery, probes):
+    index = build(gallery)
+
+    assert recall(index, gallery, probes) >= 0.95
+    # probing every list is exhaustive, so it matches brute force exactly
+    exhaustive = [hits[0][0] for hits in index.search_batch(probes, nprobe=16)]
+    exact = GalleryIndex(dim=DIM)
+    exact.add_many(range(len(gallery)), gallery)
+    assert exhaustive == [hits[0][0] for hits in exact.search_batch(probes)]
+
+
+def test_ivf_pq_recall_against_brute_force(gallery, probes):
+    index = build(gallery, pq_m=8)
+
+    assert recall(index, gallery, probes) >= 0.85
+    assert index._list_data[0].dtype == np.uint8
+
+
+def test_repeated_new_id_keeps_only_its_last_vector(gallery):
+    index = IVFIndex(DIM, nlist=16)
+    index.train(gallery)
+    index.add_many(["a", "b", "a"], gallery[:3])
+
+    assert len(index) == 2
+    assert sum(len(ids) for ids in index._list_ids) == 2
+    hits = index.search(gallery[2], k=3, nprobe=16)
+    assert [user_id for user_id, _ in hits] == ["a", "b"]
+    assert hits[0][1] == pytest.approx(1.0, abs=1e-5)
+
+    assert index.remove("a")
+    assert not index.remove("a")
+    assert [user_id for user_id, _ in index.search(gallery[2], k=3, nprobe=16)] == ["b"]
+
+
+def test_remove_keeps_positions_consistent(gallery):
+    index = build(gallery[:300])
+    for user_id in range(0, 300, 3):
+        assert index.remove(user_id)
+    index.add_many([1, 2], gallery[[5, 6]])  # re-adding moves known ids
+
+    assert len(index) == 200
+    assert sum(len(ids) for ids in index._list_ids) == 200
+    for user_id, (lst, pos) in index._where.items():
+        assert index._list_ids[lst][pos] == user_id
+        assert len(index._list_data[lst]) == len(index._list_ids[lst])
+    assert index.search(gallery[5], nprobe=16)[0][0] in (1, 5)
+    assert 3 not in index
+
+
+def test_save_and_load_round_trip(gallery, probes, tmp_path):
+    for pq_m in (None, 8):
+        index = build(gallery[:500], pq_m=pq_m)
+        index.remove(7)
+        path = tmp_path / f"ivf_{pq_m}.npz"
+        index.save(path)
+
+        loaded = IVFIndex.load(path)
+
+        assert len(loaded) == len(index) == 499
+        assert "7" not in loaded  # ids come back as strings
+        want = [[(str(u), s) for u, s in hits] for hits in index.search_batch(probes, k=3)]
+        got = loaded.search_batch(probes, k=3)
+        assert [[u for u, _ in hits] for hits in got] == [[u for u, _ in hits] for hits in want]
+        assert loaded.remove("8") and len(loaded) == 498
+
+
+def test_untrained_index_refuses_vectors():
+    with pytest.raises(RuntimeError):
+        IVFIndex(DIM).add("a", np.ones(DIM))
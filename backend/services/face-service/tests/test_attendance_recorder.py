@@ -0,0 +1,121 @@
+import json
+from datetime import datetime
+
+import psycopg2
+import pytest
+
+from app.infrastructure import attendance_recorder
+
+
+class FakeConnection:
+    """Keeps committed check-in rows; `down` simulates a lost database."""
+
+    closed = 0
+
+    def __init__(self):
+        self.stored = []
+        self.staged = []
+        self.down = False
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def commit(self):
+        self.stored += self.staged
+        self.staged = []
+
+    def rollback(self):
+        self.staged = []
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    conn = FakeConnection()
+
+    def insert_checkins(cur, rows, table):
+        if conn.down:
+            raise psycopg2.OperationalError("server closed the connection")
+        for row in rows:
+            if row[1] == "bad":
+                raise psycopg2.IntegrityError("violates foreign key constraint")
+        conn.staged += rows
+
+    monkeypatch.setattr(attendance_recorder, "insert_checkins", insert_checkins)
+    monkeypatch.setattr(attendance_recorder, "close_sessions", lambda cur, rows, table: None)
+    return conn
+
+
+@pytest.fixture
+def spool(tmp_path):
+    return str(tmp_path / "attendance.jsonl")
+
+
+def stored_users(conn):
+    return [row[1] for row in conn.stored]
+
+
+def test_poison_event_is_dead_lettered_and_the_rest_written(conn, spool):
+    recorder = attendance_recorder.AttendanceRecorder(lambda: conn, spool, batch_size=50, fsync=False)
+    for user in ["a", "b", "bad", "c", "d"]:
+        recorder.check_in(user, "L1")
+
+    assert recorder.flush() == 5
+
+    assert stored_users(conn) == ["a", "b", "c", "d"]
+    assert recorder.pending == 0
+    assert recorder.dead_letters == 1
+    with open(spool + ".dead", encoding="utf-8") as f:
+        (line,) = f.read().splitlines()
+    assert json.loads(line)["event"]["user_id"] == "bad"
+    with open(spool, encoding="utf-8") as f:
+        assert f.read() == ""
+
+
+def test_outage_keeps_the_batch_queued(conn, spool):
+    recorder = attendance_recorder.AttendanceRecorder(lambda: conn, spool, fsync=False)
+    recorder.check_in("a", "L1")
+    conn.down = True
+
+    with pytest.raises(psycopg2.OperationalError):
+        recorder.flush()
+    assert recorder.pending == 1
+    assert recorder.dead_letters == 0
+
+    conn.down = False
+    assert recorder.flush() == 1
+    assert stored_users(conn) == ["a"]
+
+
+def test_spool_replays_with_the_same_event_ids(conn, spool):
+    first = attendance_recorder.AttendanceRecorder(lambda: conn, spool, fsync=False)
+    first.check_in("a", "L1", at=datetime(2026, 1, 1, 9, 0))
+    first._spool.close()  # crash before any flush
+    with open(spool, encoding="utf-8") as f:
+        event_id = json.loads(f.readline())["event_id"]
+
+    replayed = attendance_recorder.AttendanceRecorder(lambda: conn, spool, fsync=False)
+    assert replayed.pending == 1
+    replayed.flush()
+
+    assert conn.stored == [(event_id, "a", "L1", datetime(2026, 1, 1, 9, 0))]
+
+
+def test_replay_gives_legacy_events_an_id_and_skips_a_torn_line(conn, spool):
+    legacy = {"kind": "checkin", "user_id": "a", "lounge_id": "L1", "checkin_time": "2026-01-01T09:00:00"}
+    with open(spool, "w", encoding="utf-8") as f:
+        f.write(json.dumps(legacy) + "\n" + '{"kind": "chec')
+
+    recorder = attendance_recorder.AttendanceRecorder(lambda: conn, spool, fsync=False)
+
+    assert recorder.pending == 1
+    recorder.flush()
+    assert len(conn.stored[0][0]) == 32
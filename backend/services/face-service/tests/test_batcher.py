@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.embedding.batcher import MicroBatcher
+
+
+class SlowModel:
+    """Records each batch and holds the forward pass until released."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, faces):
+        self.batches.append(list(faces))
+        self.release.wait()
+        time.sleep(self.delay)
+        return np.array([[float(face)] * 4 for face in faces], dtype=np.float32)
+
+
+@pytest.fixture
+def batcher():
+    instances = []
+
+    def make(model, **kwargs):
+        instances.append(MicroBatcher(model, **kwargs))
+        return instances[-1]
+
+    yield make
+    for instance in instances:
+        instance.stop()
+
+
+def test_concurrent_crops_share_one_forward_pass(batcher):
+    model = SlowModel()
+    b = batcher(model, max_batch=8, max_wait=0.05)
+
+    out = b.embed([1, 2, 3])
+
+    assert out[:, 0].tolist() == [1.0, 2.0, 3.0]
+    assert model.batches == [[1, 2, 3]]
+
+
+def test_cancelled_queued_crop_skips_forward_and_thread_survives(batcher):
+    model = SlowModel()
+    b = batcher(model, max_wait=0.0)
+    model.release.clear()
+    (busy,) = b.submit([1])
+    while not model.batches:
+        time.sleep(0.001)
+
+    (queued,) = b.submit([2])
+    assert queued.cancel()
+    model.release.set()
+
+    assert busy.result(timeout=1)[0] == 1.0
+    # a dead batcher thread would leave this waiting forever
+    assert b.submit([3])[0].result(timeout=2)[0] == 3.0
+    assert [2] not in model.batches
+
+
+def test_waiter_cancelled_during_forward_does_not_kill_the_thread(batcher):
+    b = batcher(SlowModel(delay=0.2), max_wait=0.0)
+
+    async def scenario():
+        task = asyncio.create_task(b.embed_async([1]))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return await asyncio.wait_for(b.embed_async([2]), timeout=2)
+
+    out = asyncio.run(scenario())
+
+    assert out[0, 0] == 2.0
+    assert b._thread.is_alive()
+
+
+def test_forward_error_fails_the_whole_batch_only(batcher):
+    calls = []
+
+    def flaky(faces):
+        calls.append(faces)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return np.ones((len(faces), 4), dtype=np.float32)
+
+    b = batcher(flaky, max_wait=0.0)
+
+    with pytest.raises(RuntimeError, match="boom"):
+        b.submit([1])[0].result(timeout=2)
+    assert b.submit([2])[0].result(timeout=2).shape == (4,)
@@ -0,0 +1,175 @@
+import threading
+
+import psycopg2
+import pytest
+from psycopg2 import errorcodes, extensions
+
+from app.infrastructure import db
+from app.infrastructure.db import ConnectionPool, PoolExhausted, execute_prepared
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.autocommit = False
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+        self.fail_rollback = False
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        if self.fail_rollback:
+            raise psycopg2.OperationalError("connection lost")
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = True
+
+
+class Opener:
+    def __init__(self):
+        self.opened = []
+
+    def __call__(self):
+        self.opened.append(FakeConnection())
+        return self.opened[-1]
+
+
+def test_connections_are_reused_and_rolled_back_on_return():
+    opener = Opener()
+    pool = ConnectionPool(opener, max_size=2)
+
+    with pool.connection() as conn:
+        conn.status = extensions.TRANSACTION_STATUS_INTRANS  # caller forgot to commit
+        assert pool.stats()["in_use"] == 1
+    with pool.connection() as again:
+        pass
+
+    assert again is conn and len(opener.opened) == 1
+    assert conn.rollbacks == 1
+    assert pool.stats() == {"max_size": 2, "in_use": 0, "idle": 1, "created": 1, "timeouts": 0}
+
+
+def test_checkout_waits_then_times_out_when_exhausted():
+    pool = ConnectionPool(Opener(), max_size=1, timeout=0.05)
+    held = pool.acquire()
+
+    with pytest.raises(PoolExhausted):
+        pool.acquire()
+    assert pool.timeouts == 1
+
+    # A connection returned while someone waits is handed to them
+    threading.Timer(0.02, pool.release, (held,)).start()
+    pool.timeout = 2.0
+    assert pool.acquire() is held
+
+
+def test_idle_connections_expire_and_broken_ones_are_dropped():
+    opener = Opener()
+    pool = ConnectionPool(opener, max_size=2, max_idle=0.0)
+    pool.run(lambda conn: None)
+    pool.run(lambda conn: None)
+    assert len(opener.opened) == 2 and opener.opened[0].closed  # too old to reuse
+
+    pool.max_idle = 300
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.fail_rollback = True
+            raise RuntimeError("query failed")
+    assert conn.closed and pool.idle == 0 and pool.in_use == 0
+
+
+def test_fill_opens_min_size_up_front():
+    opener = Opener()
+    pool = ConnectionPool(opener, max_size=4, min_size=2)
+    pool.fill()
+    pool.fill()
+    assert len(opener.opened) == 2 and pool.idle == 2
+
+
+# ── prepared statements ──────────────────────────────────────────────
+
+
+class Stale(psycopg2.Error):
+    pgcode = errorcodes.INVALID_SQL_STATEMENT_NAME
+
+
+class PreparingCursor:
+    def __init__(self, conn, session):
+        self.connection = conn
+        self.session = session  # statements the server holds
+        self.executed = []
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        self.executed.append(sql)
+        if sql.startswith("SELECT name FROM pg_prepared_statements"):
+            self._rows = [(name,) for name in self.session]
+        elif sql.startswith("PREPARE "):
+            self.session.add(sql.split()[1])
+        elif sql.startswith("EXECUTE "):
+            if sql.split()[1] not in self.session:
+                raise Stale("prepared statement does not exist")
+
+    def fetchall(self):
+        return self._rows
+
+
+@pytest.fixture
+def prepared(monkeypatch):
+    monkeypatch.setattr(db, "PREPARE_STATEMENTS", True)
+    conn = FakeConnection()
+    return conn, PreparingCursor(conn, set())
+
+
+def test_statement_is_prepared_once_per_connection(prepared):
+    conn, cur = prepared
+    sql = "SELECT user_id FROM face_embeddings WHERE lounge_id = %s AND x > %s"
+
+    execute_prepared(cur, "lounge", sql, ("L", 1))
+    execute_prepared(cur, "lounge", sql, ("M", 2))
+
+    assert cur.executed == [
+        "SELECT name FROM pg_prepared_statements",
+        "PREPARE lounge AS SELECT user_id FROM face_embeddings WHERE lounge_id = $1 AND x > $2",
+        "EXECUTE lounge (%s, %s)",
+        "EXECUTE lounge (%s, %s)",
+    ]
+
+
+def test_lost_statement_is_prepared_again_and_retried(prepared):
+    conn, cur = prepared
+    execute_prepared(cur, "watermark", "SELECT MAX(updated_at) FROM face_embeddings")
+    cur.session.clear()  # a pooler moved us to another backend
+    cur.executed.clear()
+
+    execute_prepared(cur, "watermark", "SELECT MAX(updated_at) FROM face_embeddings")
+
+    assert cur.executed == [
+        "EXECUTE watermark",
+        "SELECT name FROM pg_prepared_statements",
+        "PREPARE watermark AS SELECT MAX(updated_at) FROM face_embeddings",
+        "EXECUTE watermark",
+    ]
+    assert conn.rollbacks == 1
+
+
+def test_no_retry_inside_a_transaction_with_earlier_work(prepared):
+    conn, cur = prepared
+    execute_prepared(cur, "watermark", "SELECT 1")
+    cur.session.clear()
+    conn.status = extensions.TRANSACTION_STATUS_INTRANS
+
+    with pytest.raises(Stale):
+        execute_prepared(cur, "watermark", "SELECT 1")
+    assert conn.rollbacks == 0
+
+
+def test_plain_execute_when_preparing_is_off(monkeypatch):
+    monkeypatch.setattr(db, "PREPARE_STATEMENTS", False)
+    cur = PreparingCursor(FakeConnection(), set())
+    execute_prepared(cur, "lounge", "SELECT 1 WHERE x = %s", ("L",))
+    assert cur.executed == ["SELECT 1 WHERE x = %s"]
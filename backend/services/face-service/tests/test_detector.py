@@ -0,0 +1,141 @@
+import cv2
+import numpy as np
+import pytest
+
+from app.detection import detector
+from app.detection.detector import BaseDetector, Detection, FaceDetectionError, decode_image, detect_single_face
+
+
+class FixedDetector(BaseDetector):
+    """Reports the same boxes (in the coordinates of the frame it gets) every time."""
+
+    def __init__(self, *boxes):
+        super().__init__(max_side=0, min_face=1)
+        self.boxes = boxes
+        self.frames = []
+
+    def _detect(self, image, min_size):
+        self.frames.append(image.shape[:2])
+        return list(self.boxes)
+
+
+@pytest.fixture
+def jpeg():
+    rng = np.random.default_rng(0)
+    image = cv2.GaussianBlur(rng.integers(0, 255, (1440, 2560, 3), dtype=np.uint8), (9, 9), 3)
+    return cv2.imencode(".jpg", image)[1].tobytes()
+
+
+@pytest.fixture
+def use(monkeypatch):
+    def install(fake):
+        monkeypatch.setattr(detector._local, "detector", fake, raising=False)
+        return fake
+    return install
+
+
+def test_large_face_is_cut_from_the_reduced_decode(jpeg, use):
+    fake = use(FixedDetector((100, 50, 200, 150, 0.9)))
+
+    crop = detect_single_face(jpeg, min_side=112)
+
+    assert fake.frames == [(360, 640)]  # 1/4 scale keeps the long side at 640
+    assert crop.shape == (150, 200, 3)
+
+
+def test_small_face_is_cut_from_a_full_scale_decode(jpeg, use, monkeypatch):
+    use(FixedDetector((100, 50, 60, 40, 0.9)))
+    decodes = []
+    real = detector.decode_image
+    monkeypatch.setattr(detector, "decode_image", lambda c, m=None: decodes.append(m) or real(c, m))
+
+    crop = detect_single_face(jpeg, min_side=112)
+
+    assert decodes == [None, 0]
+    assert crop.shape == (160, 240, 3)
+    full = decode_image(jpeg, 0)
+    assert np.array_equal(crop, full[200:360, 400:640])
+
+
+def test_no_face_and_bad_bytes_raise(jpeg, use):
+    use(FixedDetector())
+    with pytest.raises(FaceDetectionError):
+        detect_single_face(jpeg)
+    with pytest.raises(FaceDetectionError):
+        decode_image(b"not an image")
+
+
+def test_boxes_map_back_to_full_resolution_and_rank_best_first():
+    class Half(FixedDetector):
+        def __init__(self, *boxes):
+            super().__init__(*boxes)
+            self.max_side, self.min_face = 500, 20
+
+    found = Half((10, 10, 20, 20, 0.5), (100, 100, 40, 40, 0.9), (0, 0, 5, 5, 0.99)).detect(
+        np.zeros((600, 1000, 3), dtype=np.uint8))
+
+    assert found == [Detection(200, 200, 80, 80, 0.9), Detection(20, 20, 40, 40, 0.5)]
+
+
+def test_boxes_are_clipped_to_the_frame():
+    found = FixedDetector((-10, 90, 50, 50, 0.9)).detect(np.zeros((120, 100, 3), dtype=np.uint8))
+    assert found == [Detection(0, 90, 50, 30, 0.9)]
+
+
+class FakeYuNet:
+    def __init__(self, faces):
+        self.faces = faces
+        self.sizes = []
+
+    def setInputSize(self, size):
+        self.sizes.append(size)
+
+    def detect(self, image):
+        return 1, self.faces
+
+
+def yunet(faces, max_side=640):
+    # Skips __init__, which needs the .onnx model file
+    net = detector.YuNetDetector.__new__(detector.YuNetDetector)
+    BaseDetector.__init__(net, max_side, 40)
+    net.net, net._input_size = FakeYuNet(faces), (320, 320)
+    return net
+
+
+def test_yunet_rows_become_scored_boxes_at_full_resolution():
+    row = lambda x, y, w, h, score: [x, y, w, h] + [0] * 10 + [score]
+    net = yunet(np.array([row(10, 20, 30, 30, 0.85), row(100, 50, 60, 60, 0.95)], dtype=np.float32))
+
+    found = net.detect(np.zeros((720, 1280, 3), dtype=np.uint8))
+
+    assert net.net.sizes == [(640, 360)]  # input resized to the downscaled frame
+    assert found == [Detection(200, 100, 120, 120, pytest.approx(0.95)),
+                     Detection(20, 40, 60, 60, pytest.approx(0.85))]
+    net.detect(np.zeros((720, 1280, 3), dtype=np.uint8))
+    assert net.net.sizes == [(640, 360)]  # same size: not reset
+
+
+def test_yunet_without_faces_and_gray_input():
+    net = yunet(None)
+    assert net.detect(np.zeros((100, 100), dtype=np.uint8)) == []
+
+
+@pytest.mark.skipif(not hasattr(cv2, "CascadeClassifier"), reason="this OpenCV build has no Haar cascades")
+def test_haar_finds_nothing_on_a_blank_frame():
+    assert detector.HaarDetector().detect(np.full((480, 640, 3), 128, dtype=np.uint8)) == []
+
+
+def test_create_detector_falls_back_to_haar(tmp_path, monkeypatch):
+    built = []
+    monkeypatch.setattr(detector, "YuNetDetector", lambda path, *a: built.append(path) or "yunet")
+    monkeypatch.setattr(detector, "HaarDetector", lambda *a: "haar")
+
+    monkeypatch.setenv("FACE_YUNET_MODEL", str(tmp_path / "missing.onnx"))
+    assert detector.create_detector("yunet") == "haar"
+
+    model = tmp_path / "yunet.onnx"
+    model.write_bytes(b"onnx")
+    monkeypatch.setenv("FACE_YUNET_MODEL", str(model))
+    assert detector.create_detector("yunet") == "yunet"
+    assert detector.create_detector("haar") == "haar"
+    assert built == [str(model)]
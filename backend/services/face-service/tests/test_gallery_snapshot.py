@@ -0,0 +1,66 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.infrastructure.gallery_snapshot import GallerySnapshot, SnapshotGallery, write_snapshot
+
+
+def gallery(n=50, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [f"user-{i}" for i in range(n)], vectors
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float16])
+def test_write_then_map_round_trip(tmp_path, dtype):
+    ids, vectors = gallery()
+    watermark = datetime(2026, 3, 4, 5, 6, 7, 891011)
+    path = tmp_path / "gallery.snap"
+    write_snapshot(path, ids, vectors * 3, watermark, dtype=dtype)  # stored normalized
+
+    snap = GallerySnapshot(path)
+
+    assert isinstance(snap.matrix, np.memmap) and snap.matrix.dtype == dtype
+    assert (len(snap), snap.dim, snap.watermark) == (50, 16, watermark)
+    assert snap.ids == ids and snap.id_at(7) == "user-7" and snap.row_of("user-9") == 9
+    assert np.asarray(snap.matrix, np.float32) == pytest.approx(vectors, abs=1e-3)
+    assert not (tmp_path / "gallery.snap.tmp").exists()
+
+
+def test_search_finds_each_row(tmp_path):
+    ids, vectors = gallery()
+    write_snapshot(tmp_path / "g.snap", ids, vectors)
+    snap_gallery = SnapshotGallery.open(tmp_path / "g.snap")
+
+    hits = snap_gallery.search_batch(vectors[:5], k=2)
+
+    assert [h[0][0] for h in hits] == ids[:5]
+    assert hits[0][0][1] == pytest.approx(1.0, abs=1e-5)
+    assert len(hits[0]) == 2
+
+
+def test_tombstones_and_overlay_mask_the_mapped_rows(tmp_path):
+    ids, vectors = gallery()
+    write_snapshot(tmp_path / "g.snap", ids, vectors)
+    snap_gallery = SnapshotGallery.open(tmp_path / "g.snap")
+    moved = -vectors[3]  # user-3 re-enrolled with a new face
+
+    snap_gallery.apply_changes([("user-3", "L", moved), ("new", "L", vectors[0] + vectors[1])], removed=["user-4"])
+
+    assert len(snap_gallery) == 50  # one removed, one added, user-3 replaced
+    assert snap_gallery.best_match(vectors[4], 0.99) is None
+    assert snap_gallery.best_match(moved, 0.99)[0] == "user-3"
+    # The old row is masked: only the overlay's (opposite) vector is left
+    hits = dict(snap_gallery.search(vectors[3], k=50))
+    assert hits["user-3"] == pytest.approx(-1.0, abs=1e-5)
+    assert snap_gallery.best_match(vectors[0] + vectors[1], 0.99)[0] == "new"
+    # The file itself is untouched
+    assert GallerySnapshot(tmp_path / "g.snap").ids == ids
+
+
+def test_rejects_files_that_are_not_snapshots(tmp_path):
+    path = tmp_path / "junk.snap"
+    path.write_bytes(b"\0" * 128)
+    with pytest.raises(ValueError, match="not a gallery snapshot"):
+        GallerySnapshot(path)
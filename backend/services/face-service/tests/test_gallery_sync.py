@@ -0,0 +1,152 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.infrastructure import gallery_sync as sync_module
+from app.infrastructure.gallery_sync import GallerySync
+from app.similarity.matcher import GalleryIndex
+
+T0 = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def vec(i, dim=8):
+    v = np.zeros(dim, np.float32)
+    v[i] = 1.0
+    return v
+
+
+class Table:
+    """face_embeddings in memory, behind the gallery_sync fetch functions."""
+
+    def __init__(self, monkeypatch):
+        self.rows = {}  # user_id -> (lounge_id, embedding, updated_at)
+        self.queries = []
+        self.down = False
+        monkeypatch.setattr(sync_module, "fetch_embedding_snapshot", self.snapshot)
+        monkeypatch.setattr(sync_module, "fetch_embedding_changes", self.changes)
+        monkeypatch.setattr(sync_module, "fetch_embedding_ids", self.ids)
+        monkeypatch.setattr(sync_module, "fetch_embedding_watermark", self.watermark)
+
+    def connect(self):
+        if self.down:
+            raise ConnectionError("database unavailable")
+        return SimpleNamespace(closed=False, autocommit=False, close=lambda: None)
+
+    def put(self, user_id, lounge_id, embedding, at):
+        self.rows[user_id] = (lounge_id, embedding, at)
+
+    def _rows(self, keep):
+        return [(u, l, e, t) for u, (l, e, t) in sorted(self.rows.items(), key=lambda r: r[1][2]) if keep(t)]
+
+    def snapshot(self, conn, table):
+        self.queries.append(("snapshot", None))
+        return self._rows(lambda t: True)
+
+    def changes(self, conn, since, table):
+        self.queries.append(("changes", since))
+        return self._rows(lambda t: t > since)
+
+    def ids(self, conn, table):
+        self.queries.append(("ids", None))
+        return set(self.rows)
+
+    def watermark(self, conn, table):
+        self.queries.append(("watermark", None))
+        return max((t for _, _, t in self.rows.values()), default=None)
+
+
+@pytest.fixture
+def table(monkeypatch):
+    return Table(monkeypatch)
+
+
+def identify(index, probe):
+    match = index.best_match(probe, 0.99)
+    return match[0] if match else None
+
+
+def test_polls_read_only_rows_changed_since_the_watermark(table):
+    table.put("u1", "L", vec(0), T0)
+    table.put("u2", "L", vec(1), T0 + timedelta(seconds=1))
+    index = GalleryIndex()
+    sync = GallerySync(table.connect, index, overlap=2.0, reconcile_every=0)
+
+    assert sync.snapshot() == 2
+    assert sync.watermark == T0 + timedelta(seconds=1)
+
+    table.put("u3", "L", vec(2), T0 + timedelta(seconds=10))
+    table.put("u1", "L", vec(3), T0 + timedelta(seconds=11))  # re-enrolled
+    touched = sync.poll_once()
+
+    assert table.queries[-1] == ("changes", T0 + timedelta(seconds=1) - timedelta(seconds=2))
+    assert touched == 3  # u2 again through the overlap; harmless
+    assert identify(index, vec(2)) == "u3"
+    assert identify(index, vec(3)) == "u1"
+    assert identify(index, vec(0)) is None
+    assert sync.watermark == T0 + timedelta(seconds=11)
+
+
+def test_late_commit_inside_the_overlap_is_picked_up(table):
+    table.put("u1", "L", vec(0), T0 + timedelta(seconds=10))
+    index = GalleryIndex()
+    sync = GallerySync(table.connect, index, overlap=2.0, reconcile_every=0)
+    sync.snapshot()
+
+    # Committed after the last poll but stamped before its watermark
+    table.put("late", "L", vec(4), T0 + timedelta(seconds=9))
+    sync.poll_once()
+
+    assert identify(index, vec(4)) == "late"
+
+
+def test_deletes_are_found_by_the_periodic_reconcile(table):
+    table.put("u1", "L", vec(0), T0)
+    table.put("u2", "L", vec(1), T0)
+    index = GalleryIndex()
+    sync = GallerySync(table.connect, index, reconcile_every=2)
+    sync.snapshot()
+
+    del table.rows["u2"]
+    sync.poll_once()
+    assert identify(index, vec(1)) == "u2"  # not a reconcile poll
+    sync.poll_once()
+    assert identify(index, vec(1)) is None
+    assert len(index) == 1
+
+
+def test_lazy_target_gets_deltas_only(table):
+    table.put("u1", "L", vec(0), T0)
+    applied = []
+    target = SimpleNamespace(apply_changes=lambda upserts, removed: applied.append(([u for u, _, _ in upserts], removed)))
+    sync = GallerySync(table.connect, target, load_snapshot=False, reconcile_every=0)
+
+    sync.snapshot()
+    assert applied == []
+    assert ("snapshot", None) not in table.queries
+
+    table.put("u2", "M", vec(1), T0 + timedelta(seconds=30))
+    sync.poll_once()
+    assert applied == [(["u1", "u2"], [])]  # u1 again through the overlap
+    sync.poll_once()
+    assert applied[-1] == (["u2"], [])
+
+
+def test_failed_startup_snapshot_is_retried(table):
+    table.put("u1", "L", vec(0), T0)
+    table.down = True
+    index = GalleryIndex()
+    sync = GallerySync(table.connect, index, interval=0.01)
+    sync.start()
+    try:
+        assert not sync.synced
+        table.down = False
+        for _ in range(200):
+            if sync.synced:
+                break
+            sync._stop.wait(0.01)
+        assert sync.synced
+        assert identify(index, vec(0)) == "u1"
+    finally:
+        sync.stop()
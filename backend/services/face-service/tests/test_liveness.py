@@ -0,0 +1,119 @@
+import cv2
+import numpy as np
+import pytest
+
+from app.liveness import liveness_detector as liveness
+
+SIDE = 160
+
+
+def natural(seed=0):
+    # 1/f-like texture: noise octaves, coarse ones weighted most
+    rng = np.random.default_rng(seed)
+    img = np.zeros((SIDE, SIDE), np.float32)
+    for octave in range(1, 7):
+        side = max(2, SIDE >> octave)
+        noise = rng.normal(0, 1, (side, side)).astype(np.float32)
+        img += cv2.resize(noise, (SIDE, SIDE), interpolation=cv2.INTER_CUBIC) * 0.6 ** (6 - octave)
+    img += rng.normal(0, 0.15, img.shape).astype(np.float32)
+    img = (img - img.min()) / (img.max() - img.min()) * 200 + 25
+    return cv2.cvtColor(img.astype(np.uint8), cv2.COLOR_GRAY2BGR)
+
+
+def flat_print():
+    # Smooth shading, no micro-texture
+    y, x = np.mgrid[0:SIDE, 0:SIDE]
+    img = 100 + 40 * np.exp(-((x - SIDE / 2) ** 2 + (y - SIDE / 2) ** 2) / 3000)
+    return cv2.cvtColor(img.astype(np.uint8), cv2.COLOR_GRAY2BGR)
+
+
+def moire_screen():
+    # A soft face re-captured off a display: a fine pixel-grid beat on top
+    base = cv2.GaussianBlur(natural(1), (0, 0), 3).astype(np.float32)
+    y, x = np.mgrid[0:SIDE, 0:SIDE]
+    grid = 40 * np.sin(2 * np.pi * (x * 0.42 + y * 0.05))
+    return np.clip(base + grid[..., None], 0, 255).astype(np.uint8)
+
+
+def fine_grain():
+    return np.random.default_rng(2).integers(0, 256, (SIDE, SIDE, 3), dtype=np.uint8)
+
+
+class FakeModel:
+    def __init__(self, p):
+        self.p = p
+        self.calls = []
+
+    def score(self, crops):
+        crops = list(crops)
+        self.calls.append(len(crops))
+        return np.full(len(crops), self.p)
+
+
+@pytest.fixture
+def model(monkeypatch):
+    def install(p):
+        fake = FakeModel(p)
+        monkeypatch.setattr(liveness, "get_model", lambda: fake)
+        return fake
+    monkeypatch.setattr(liveness, "get_model", lambda: None)
+    return install
+
+
+def test_flat_print_rejected_before_the_model(model):
+    fake = model(1.0)
+    result = liveness.check_liveness([flat_print()])
+    assert result["is_live"] is False
+    assert result["decided_by"] == "cheap"
+    assert result["liveness_score"] <= liveness.REJECT
+    assert fake.calls == []
+
+
+def test_moire_screen_is_flagged_and_rejected(model):
+    fake = model(1.0)
+    _, _, _, moire = liveness.raw_features(moire_screen())
+    assert moire
+    result = liveness.check_liveness([moire_screen()])
+    assert (result["is_live"], result["decided_by"]) == (False, "cheap")
+    assert fake.calls == []
+
+
+def test_fine_grain_accepted_outright(model):
+    fake = model(0.0)
+    result = liveness.check_liveness([fine_grain()])
+    assert (result["is_live"], result["decided_by"]) == (True, "cheap")
+    assert result["liveness_score"] >= liveness.ACCEPT
+    assert fake.calls == []
+
+
+def test_natural_texture_escalates_to_the_model(model):
+    score = liveness.cheap_score(liveness.extract(natural()), None)
+    assert liveness.REJECT < score < liveness.ACCEPT
+
+    fake = model(0.9)
+    assert liveness.check_liveness([natural()]) == {"is_live": True, "liveness_score": 0.9, "decided_by": "model"}
+    fake = model(0.2)
+    result = liveness.check_liveness([natural(), fine_grain()])
+    assert (result["is_live"], result["decided_by"]) == (False, "model")
+    assert fake.calls == [1]  # only the ambiguous face ran through it
+
+
+def test_without_a_model_ambiguous_faces_use_the_threshold(model):
+    result = liveness.check_liveness([natural()])
+    assert result["decided_by"] == "threshold"
+    assert result["is_live"] == (result["liveness_score"] >= liveness.THRESHOLD)
+
+
+def test_repeated_still_rejected_but_jitter_is_motion(model):
+    face = natural()
+    assert liveness.check_liveness([face, face.copy()])["is_live"] is False
+
+    rng = np.random.default_rng(3)
+    jittered = np.clip(face.astype(int) + rng.integers(-3, 4, face.shape), 0, 255).astype(np.uint8)
+    features = [liveness.extract(face), liveness.extract(jittered)]
+    assert liveness.motion_scores(features) == [1.0, 1.0]
+    assert liveness.motion_scores(features[:1]) == [None]
+
+
+def test_no_faces_is_not_live():
+    assert liveness.check_liveness([])["is_live"] is False
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from app.similarity.matcher import GalleryIndex, as_vector, l2_normalize
+
+
+def unit(*values):
+    return l2_normalize(np.array(values, dtype=np.float32))
+
+
+def test_search_ranks_by_cosine_similarity():
+    index = GalleryIndex()
+    index.add("a", [1, 0, 0])
+    index.add("b", [0, 1, 0])
+    index.add("c", [1, 1, 0])
+
+    hits = index.search([1, 0.1, 0], k=2)
+
+    assert [user_id for user_id, _ in hits] == ["a", "c"]
+    assert hits[0][1] == pytest.approx(float(unit(1, 0.1, 0) @ unit(1, 0, 0)), abs=1e-6)
+
+
+def test_add_overwrites_existing_id():
+    index = GalleryIndex()
+    index.add("a", [1, 0, 0])
+    index.add("a", [0, 1, 0])
+
+    assert len(index) == 1
+    assert index.search([0, 1, 0])[0] == ("a", pytest.approx(1.0))
+
+
+def test_remove_swaps_last_row_into_the_hole():
+    index = GalleryIndex(capacity=1)
+    index.add_many(["a", "b", "c"], np.eye(3, dtype=np.float32))
+
+    assert index.remove("a")
+    assert not index.remove("a")
+    assert sorted(index.ids) == ["b", "c"]
+    assert index.search([0, 0, 1])[0] == ("c", pytest.approx(1.0))
+    assert index.search([0, 1, 0])[0] == ("b", pytest.approx(1.0))
+
+
+def test_add_many_with_repeated_new_id_keeps_last_vector_only():
+    index = GalleryIndex()
+    index.add_many(["a", "b", "a"], np.eye(3, dtype=np.float32))
+
+    assert len(index) == 2
+    assert sorted(index.ids) == ["a", "b"]
+    hits = index.search([0, 0, 1], k=3)
+    assert [user_id for user_id, _ in hits] == ["a", "b"]
+    assert hits[0][1] == pytest.approx(1.0)
+
+
+def test_add_many_updates_known_ids_in_place():
+    index = GalleryIndex()
+    index.add_many(["a", "b"], np.eye(3, dtype=np.float32)[:2])
+    index.add_many(["b", "c"], np.eye(3, dtype=np.float32)[[0, 2]])
+
+    assert len(index) == 3
+    assert {u for u, s in index.search([1, 0, 0], k=3) if s > 0.99} == {"a", "b"}
+
+
+def test_dimension_mismatch_is_rejected():
+    index = GalleryIndex()
+    index.add("a", [1, 0, 0])
+
+    with pytest.raises(ValueError):
+        index.add("b", [1, 0])
+    with pytest.raises(ValueError):
+        index.search([1, 0])
+
+
+def test_best_match_applies_threshold():
+    index = GalleryIndex()
+    index.add("a", [1, 0])
+
+    assert index.best_match([1, 0.05], threshold=0.9)[0] == "a"
+    assert index.best_match([0, 1], threshold=0.9) is None
+
+
+def test_empty_gallery_returns_no_hits():
+    assert GalleryIndex(dim=4).search_batch(np.ones((2, 4), dtype=np.float32)) == [[], []]
+
+
+def test_as_vector_decodes_blobs_and_fuses_sub_templates():
+    blob = np.array([3, 4], dtype=np.float32).tobytes()
+    assert as_vector(blob).tolist() == [3.0, 4.0]
+
+    fused = as_vector([[1, 0], [0, 1]])
+    assert fused == pytest.approx(unit(1, 1))
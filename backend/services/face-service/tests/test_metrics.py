@@ -0,0 +1,71 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.observability.metrics import Registry, timed
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram("t_seconds", "Latency", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        latency.observe(value, stage="detect")
+
+    text = registry.render()
+
+    assert '# TYPE t_seconds histogram' in text
+    assert 't_seconds_bucket{stage="detect",le="0.1"} 1' in text
+    assert 't_seconds_bucket{stage="detect",le="1.0"} 3' in text
+    assert 't_seconds_bucket{stage="detect",le="+Inf"} 4' in text
+    assert 't_seconds_sum{stage="detect"} 4.05' in text
+    assert 't_seconds_count{stage="detect"} 4' in text
+
+
+def test_counters_gauges_and_collect_callbacks():
+    registry = Registry()
+    hits = registry.counter("hits_total", "Hits", ("cache",))
+    hits.inc(cache="probe")
+    hits.inc(2, cache="probe")
+    registry.gauge("depth", "Queue depth", collect=lambda: 7)
+    registry.gauge("sizes", "Per shard", ("shard",), collect=lambda: {'a"b': 3})
+
+    text = registry.render()
+
+    assert 'hits_total{cache="probe"} 3' in text
+    assert "depth 7" in text
+    assert 'sizes{shard="a\\"b"} 3' in text  # label values are escaped
+    assert registry.counter("hits_total", "Hits", ("cache",)) is hits
+    with pytest.raises(ValueError):
+        registry.gauge("hits_total", "Hits")
+    with pytest.raises(ValueError):
+        hits.inc(lounge="x")
+
+
+def test_a_failing_callback_does_not_break_the_scrape():
+    registry = Registry()
+    registry.gauge("broken", "Raises", collect=lambda: 1 / 0)
+    registry.gauge("fine", "Works", collect=lambda: 1)
+
+    assert "fine 1" in registry.render()
+
+
+def test_metrics_endpoint_reports_stage_latency():
+    from app.main import app
+
+    with timed("db_write"):
+        pass
+
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://face") as client:
+            return await client.get("/metrics")
+
+    response = asyncio.run(go())
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert 'face_stage_seconds_count{stage="db_write"}' in body
+    for name in ("face_stage_inflight", "face_stage_rejected_total", "face_cache_hits_total",
+                 "face_probe_cache_entries", "face_db_pool_connections"):
+        assert f"# TYPE {name} " in body
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from app.application import pipeline
+from app.application.pipeline import Stage, StageOverloaded
+
+
+@pytest.fixture
+def executor():
+    pool = ThreadPoolExecutor(max_workers=4)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def test_full_queue_rejects_at_once_and_slots_are_returned(executor):
+    stage = Stage("detect", concurrency=1, max_queue=1, queue_timeout=5.0, executor=executor)
+    release = threading.Event()
+
+    async def go():
+        running = asyncio.ensure_future(stage.run(release.wait, 5))
+        queued = asyncio.ensure_future(stage.run(lambda: "second"))
+        await asyncio.sleep(0.05)
+        assert (stage.inflight, stage.waiting) == (2, 1)
+        started = time.perf_counter()
+        with pytest.raises(StageOverloaded) as rejected:
+            await stage.run(lambda: "third")
+        assert time.perf_counter() - started < 0.1  # no waiting behind the queue
+        release.set()
+        return rejected.value, await running, await queued
+
+    rejected, first, second = asyncio.run(go())
+    assert rejected.stage == "detect"
+    assert (first, second) == (True, "second")
+    assert (stage.inflight, stage.rejected) == (0, 1)
+
+
+def test_queue_timeout_rejects(executor):
+    stage = Stage("search", concurrency=1, max_queue=5, queue_timeout=0.05, executor=executor)
+    release = threading.Event()
+
+    async def go():
+        running = asyncio.ensure_future(stage.run(release.wait, 5))
+        await asyncio.sleep(0.01)
+        with pytest.raises(StageOverloaded):
+            await stage.run(lambda: None)
+        release.set()
+        await running
+
+    asyncio.run(go())
+    assert (stage.inflight, stage.rejected) == (0, 1)
+
+
+def client():
+    from app.main import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://face")
+
+
+def test_overloaded_stage_answers_503_with_retry_after(monkeypatch, executor):
+    monkeypatch.setitem(pipeline.stages, "detect", Stage("detect", 0, 0, 1.0, executor))
+
+    async def go():
+        async with client() as c:
+            return await c.post("/verify/frame", content=b"jpeg", headers={"content-type": "image/jpeg"})
+
+    response = asyncio.run(go())
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert response.json() == {"detail": "Face service busy (detect), retry shortly"}
+
+
+def test_event_loop_keeps_serving_while_a_stage_blocks(monkeypatch, executor):
+    from app.api import routes
+
+    monkeypatch.setitem(pipeline.stages, "detect", Stage("detect", 1, 1, 5.0, executor))
+    release = threading.Event()
+
+    def slow_detect(content):
+        release.wait(5)
+        raise routes.HTTPException(status_code=400, detail="no face")
+    monkeypatch.setattr(routes, "detect_single_face", slow_detect)
+
+    async def go():
+        async with client() as c:
+            verify = asyncio.ensure_future(
+                c.post("/verify/frame", content=b"jpeg", headers={"content-type": "image/jpeg"})
+            )
+            await asyncio.sleep(0.05)
+            started = time.perf_counter()
+            presence = await c.get("/presence")
+            elapsed = time.perf_counter() - started
+            release.set()
+            return presence, elapsed, await verify
+
+    presence, elapsed, verify = asyncio.run(go())
+    assert presence.status_code == 200 and elapsed < 1.0
+    assert verify.status_code == 400
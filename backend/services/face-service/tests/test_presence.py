@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+from app.application.presence import PresenceEngine
+
+T0 = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def at(seconds):
+    return T0 + timedelta(seconds=seconds)
+
+
+def kinds(events):
+    return [(e.kind, e.lounge_id) for e in events]
+
+
+def test_first_sighting_checks_in_and_repeats_only_refresh():
+    presence = PresenceEngine()
+
+    assert kinds(presence.observe("u", "A", at(0))) == [("checkin", "A")]
+    assert presence.observe("u", "A", at(60)) == []
+    assert presence.count("A") == 1
+    assert presence.is_present("u", "A")
+
+
+def test_lounge_change_within_debounce_is_ignored():
+    presence = PresenceEngine(debounce=30)
+    presence.observe("u", "A", at(0))
+
+    assert presence.observe("u", "B", at(10)) == []
+    assert presence.lounge_of("u") == "A"
+
+
+def test_alternating_kiosks_do_not_flap():
+    presence = PresenceEngine(debounce=30)
+    presence.observe("u", "A", at(0))
+    for second in range(10, 100, 10):
+        lounge = "B" if second % 20 else "A"
+        assert presence.observe("u", lounge, at(second)) == []
+    assert presence.lounge_of("u") == "A"
+
+
+def test_lounge_change_after_debounce_moves_the_user():
+    presence = PresenceEngine(debounce=30)
+    presence.observe("u", "A", at(0))
+
+    events = presence.observe("u", "B", at(31))
+
+    assert kinds(events) == [("checkout", "A"), ("checkin", "B")]
+    assert events[0].checkin_time == at(0)
+    assert presence.counts() == {"B": 1}
+
+
+def test_expire_checks_out_at_last_sighting():
+    presence = PresenceEngine(dwell=600)
+    presence.observe("u", "A", at(0))
+    presence.observe("u", "A", at(100))
+    presence.observe("v", "A", at(650))
+
+    events = presence.expire(at(701))
+
+    assert [(e.user_id, e.at) for e in events] == [("u", at(100))]
+    assert presence.occupants("A") == [("v", at(650))]
+
+
+def test_leave_is_debounced_after_checkin():
+    presence = PresenceEngine(debounce=30)
+    presence.observe("u", "A", at(0))
+
+    assert presence.leave("u", at(5)) == []
+    assert kinds(presence.leave("u", at(40))) == [("checkout", "A")]
+    assert not presence.is_present("u")
+
+
+def test_load_keeps_each_users_latest_session():
+    presence = PresenceEngine()
+    loaded = presence.load([("u", "A", at(0)), ("u", "B", at(50)), ("v", "A", at(10))], now=at(60))
+
+    assert loaded == 2
+    assert presence.lounge_of("u") == "B"
+    assert presence.occupants("A") == [("v", at(10))]
+
+
+def test_events_reach_on_event():
+    seen = []
+    presence = PresenceEngine(on_event=seen.append)
+    presence.observe("u", "A", at(0))
+
+    assert kinds(seen) == [("checkin", "A")]
@@ -0,0 +1,84 @@
+import numpy as np
+
+from app.application import probe_cache as probe_cache_module
+from app.application.probe_cache import ProbeCache, dhash
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def face(seed):
+    return np.random.default_rng(seed).integers(0, 256, (64, 64, 3), dtype=np.uint8)
+
+
+def test_near_identical_frames_hash_close():
+    a = face(0)
+    b = np.clip(a.astype(int) + 1, 0, 255).astype(np.uint8)  # JPEG-ish jitter
+    assert bin(dhash(a) ^ dhash(b)).count("1") <= 6
+    assert bin(dhash(a) ^ dhash(face(1))).count("1") > 6
+
+
+def test_hit_and_miss():
+    cache = ProbeCache()
+    h = dhash(face(0))
+    assert cache.get(("L", "k1"), h) is None
+    cache.put(("L", "k1"), h, {"user_id": "u1"})
+    assert cache.get(("L", "k1"), h) == {"user_id": "u1"}
+    # A different face at the same kiosk misses
+    assert cache.get(("L", "k1"), dhash(face(1))) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_decision_expires_after_ttl_even_when_hit(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(probe_cache_module.time, "monotonic", clock)
+    cache = ProbeCache(ttl=3.0)
+    h = dhash(face(0))
+    cache.put(("L", "k1"), h, "decision")
+    clock.now += 2.0
+    assert cache.get(("L", "k1"), h) == "decision"
+    clock.now += 1.5
+    assert cache.get(("L", "k1"), h) is None
+    assert len(cache) == 0
+
+
+def test_scopes_are_isolated():
+    cache = ProbeCache()
+    h = dhash(face(0))
+    cache.put(("L1", "k1"), h, "at k1")
+    assert cache.get(("L1", "k2"), h) is None
+    assert cache.get(("L2", "k1"), h) is None
+    cache.put(("L1", "k2"), h, "at k2")
+    assert cache.get(("L1", "k1"), h) == "at k1"
+    assert cache.get(("L1", "k2"), h) == "at k2"
+
+
+def test_least_recent_kiosk_dropped_past_max_entries():
+    cache = ProbeCache(max_entries=2)
+    h = dhash(face(0))
+    cache.put("a", h, 1)
+    cache.put("b", h, 2)
+    cache.get("a", h)
+    cache.put("c", h, 3)
+    assert cache.get("b", h) is None
+    assert cache.get("a", h) == 1 and cache.get("c", h) == 3
+
+
+def _request(peer, forwarded=None):
+    from starlette.requests import Request
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "headers": headers, "client": (peer, 5000)})
+
+
+def test_kiosk_scope_uses_forwarded_address_only_from_trusted_proxy(monkeypatch):
+    from app.api import routes
+    monkeypatch.setattr(routes, "TRUSTED_PROXIES", {"10.0.0.2"})
+    assert routes._kiosk(_request("10.0.0.2", "203.0.113.9"), "desk-1") == "desk-1"
+    assert routes._kiosk(_request("10.0.0.2", "198.51.100.1, 203.0.113.9"), None) == "203.0.113.9"
+    assert routes._kiosk(_request("10.0.0.7", "203.0.113.9"), None) == "10.0.0.7"
+    assert routes._kiosk(_request("10.0.0.2"), None) == "10.0.0.2"
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from app.similarity.matcher import GalleryIndex, l2_normalize
+from app.similarity.quantization import dequantize, quantize, storage_dtype
+
+
+@pytest.fixture
+def gallery():
+    rng = np.random.default_rng(7)
+    return l2_normalize(rng.standard_normal((500, 64)).astype(np.float32))
+
+
+def test_int8_round_trip_is_close(gallery):
+    codes, scales = quantize(gallery, np.int8)
+
+    assert codes.dtype == np.int8
+    assert np.abs(dequantize(codes, scales) - gallery).max() < 0.01
+
+
+def test_int8_index_agrees_with_float32(gallery):
+    exact = GalleryIndex(dim=64, dtype="float32")
+    compact = GalleryIndex(dim=64, dtype="int8")
+    ids = list(range(len(gallery)))
+    exact.add_many(ids, gallery)
+    compact.add_many(ids, gallery)
+    probes = l2_normalize(gallery[:50] + 0.05 * np.random.default_rng(1).standard_normal((50, 64)))
+
+    for want, got in zip(exact.search_batch(probes), compact.search_batch(probes)):
+        assert got[0][0] == want[0][0]
+        assert got[0][1] == pytest.approx(want[0][1], abs=5e-3)
+
+
+def test_int8_keeps_no_float32_copy(gallery):
+    compact = GalleryIndex(dim=64, dtype="int8")
+    compact.add_many(range(len(gallery)), gallery)
+
+    # codes plus one float32 scale per row
+    assert compact.nbytes == len(gallery) * (64 + 4)
+
+
+def test_float16_halves_memory_and_agrees_with_float32(gallery):
+    compact = GalleryIndex(dim=64, dtype="float16")
+    compact.add_many(range(len(gallery)), gallery)
+
+    assert compact.nbytes == len(gallery) * 64 * 2
+    assert compact.search(gallery[3])[0] == (3, pytest.approx(1.0, abs=1e-3))
+
+
+def test_unknown_dtype_is_rejected():
+    with pytest.raises(ValueError):
+        storage_dtype("bfloat16")
+
+
+def test_rerank_scores_candidates_against_exact_rows(gallery):
+    fetched = []
+
+    def exact_rows(keys):
+        fetched.append(sorted(keys))
+        return {key: gallery[key] for key in keys if key != 0}
+
+    compact = GalleryIndex(dim=64, dtype="int8", rerank=8, exact_rows=exact_rows)
+    compact.add_many(range(len(gallery)), gallery)
+    probe = gallery[5]
+
+    hits = compact.search(probe, k=3)
+
+    assert len(fetched[0]) == 8  # only the candidates are read
+    assert hits[0] == (5, pytest.approx(float(gallery[5] @ probe), abs=1e-6))
+    for user_id, score in hits[1:]:
+        assert score == pytest.approx(float(gallery[user_id] @ probe), abs=1e-6)
+
+
+def test_rerank_falls_back_to_compact_scores_when_the_source_fails(gallery):
+    def broken(keys):
+        raise ConnectionError("database unavailable")
+
+    compact = GalleryIndex(dim=64, dtype="int8", rerank=8, exact_rows=broken)
+    compact.add_many(range(len(gallery)), gallery)
+
+    assert compact.search(gallery[5])[0] == (5, pytest.approx(1.0, abs=5e-3))
+
+
+def test_rerank_is_off_for_float32_or_without_a_source():
+    assert GalleryIndex(dtype="float32", rerank=8, exact_rows=dict).rerank == 0
+    assert GalleryIndex(dtype="int8", rerank=8).rerank == 0
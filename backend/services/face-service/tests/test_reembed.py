@@ -0,0 +1,142 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import cv2
+import numpy as np
+import pytest
+
+from app.embedding import reembed
+from app.embedding.reembed import ImageSource, embed_chunk, run_pass
+
+USERS = [f"user-{i}" for i in range(7)]
+
+
+class Database:
+    """face_embeddings_next and the job row; writes land only on commit()."""
+
+    def __init__(self):
+        self.table = {}
+        self.job = {"processed": 0, "failed": 0, "last_user_id": None, "watermark": datetime(2026, 1, 1)}
+        self.copies = 0
+        self._pending = []
+
+    def commit(self):
+        for apply in self._pending:
+            apply()
+        self._pending = []
+
+    def rollback(self):
+        self._pending = []
+
+    def copy(self, conn, rows, table):
+        assert table == "face_embeddings_next"
+        self.copies += 1
+        self._pending.append(lambda: self.table.update({r[0]: r for r in rows}))
+
+    def checkpoint(self, conn, name, processed, failed, last_user_id=None, watermark=None):
+        def apply():
+            self.job["processed"] += processed
+            self.job["failed"] += failed
+            self.job["last_user_id"] = last_user_id or self.job["last_user_id"]
+            if watermark is not None:
+                self.job["watermark"] = max(self.job["watermark"], watermark)
+        self._pending.append(apply)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    store = Database()
+    monkeypatch.setattr(reembed, "copy_face_templates", store.copy)
+    monkeypatch.setattr(reembed, "save_checkpoint", store.checkpoint)
+    monkeypatch.setattr(reembed, "fetch_user_lounges", lambda conn, ids: {})
+    return store
+
+
+@pytest.fixture
+def images(tmp_path):
+    for i, user_id in enumerate(USERS):
+        folder = tmp_path / user_id
+        folder.mkdir()
+        image = np.full((32, 32, 3), 10 * (i + 1), dtype=np.uint8)
+        (folder / "a.jpg").write_bytes(cv2.imencode(".jpg", image)[1].tobytes())
+        os.utime(folder / "a.jpg", (1_700_000_000, 1_700_000_000))
+    return tmp_path
+
+
+def embed_ids(entries):
+    return [(e["user_id"], None, None, e["lounge_id"], "ArcFace") for e in entries], 0
+
+
+def main_pass(database, source, embed=embed_ids, chunk=2):
+    return run_pass(
+        "job", database, lambda user_id: source.after(user_id, chunk),
+        database.job["last_user_id"], lambda entries: entries[-1]["user_id"], embed,
+    )
+
+
+def test_killed_run_resumes_after_its_last_committed_chunk(database, images):
+    source = ImageSource(str(images))
+    seen = []
+
+    def crash_on_third_chunk(entries):
+        seen.append([e["user_id"] for e in entries])
+        if len(seen) == 3:
+            raise KeyboardInterrupt  # the process is killed mid-chunk
+        return embed_ids(entries)
+
+    with pytest.raises(KeyboardInterrupt):
+        for _ in main_pass(database, source, crash_on_third_chunk):
+            pass
+    database.rollback()
+
+    assert database.job["last_user_id"] == "user-3"
+    assert sorted(database.table) == USERS[:4]
+
+    resumed = []
+    for stored, failed in main_pass(database, source, lambda e: resumed.append(e) or embed_ids(e)):
+        pass
+
+    assert [e["user_id"] for chunk in resumed for e in chunk] == USERS[4:]
+    assert sorted(database.table) == USERS
+    assert database.job["processed"] == len(USERS)
+
+
+def test_catch_up_pass_picks_up_re_enrolments_after_the_watermark(database, images):
+    for _ in main_pass(database, ImageSource(str(images))):
+        pass
+    newer = time.time()
+    os.utime(images / "user-2" / "a.jpg", (newer, newer))
+    source = ImageSource(str(images))
+    redone = []
+
+    for _ in run_pass(
+        "job", database, lambda since: source.since(since, 10), datetime.fromtimestamp(1_700_000_000),
+        reembed._newest, lambda e: redone.extend(x["user_id"] for x in e) or embed_ids(e), catch_up=True,
+    ):
+        pass
+
+    assert redone == ["user-2"]
+    assert database.job["watermark"] == datetime.fromtimestamp(newer)
+
+
+class MeanEmbedder:
+    def embed(self, faces):
+        return np.stack([np.full(4, face.mean() + 1, np.float32) for face in faces])
+
+
+def test_embed_chunk_fuses_per_user_and_counts_unreadable_users():
+    jpeg = cv2.imencode(".jpg", np.full((32, 32, 3), 100, np.uint8))[1].tobytes()
+    entries = [
+        {"user_id": "a", "lounge_id": "L", "crops": [jpeg, jpeg]},
+        {"user_id": "broken", "lounge_id": None, "crops": [b"not a jpeg"]},
+        {"user_id": "b", "lounge_id": None, "crops": [jpeg]},
+    ]
+    with ThreadPoolExecutor(max_workers=2) as decoders:
+        rows, failed = embed_chunk(entries, MeanEmbedder(), decoders, detect=False, slots=1,
+                                   model_name="ArcFace", max_templates=3)
+
+    assert failed == 1
+    assert [(r[0], r[3], r[4]) for r in rows] == [("a", "L", "ArcFace"), ("b", None, "ArcFace")]
+    assert np.linalg.norm(rows[0][1]) == pytest.approx(1.0)
@@ -0,0 +1,171 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.similarity import shards
+from app.similarity.shards import LoungeShardCache
+
+DIM = 8
+
+
+def vec(i):
+    v = np.zeros(DIM, np.float32)
+    v[i] = 1.0
+    return v
+
+
+# lounge -> members; one-hot vectors so every user is an exact match only for itself
+LOUNGES = {"A": {"a1": vec(0), "a2": vec(1)}, "B": {"b1": vec(2)}, "C": {"c1": vec(3)}}
+
+
+class Loader:
+    def __init__(self):
+        self.calls = []
+
+    def shard(self, lounge_id):
+        self.calls.append(lounge_id)
+        members = LOUNGES.get(lounge_id, {})
+        return list(members), list(members.values())
+
+    def everyone(self):
+        self.calls.append("global")
+        rows = {u: v for members in LOUNGES.values() for u, v in members.items()}
+        return list(rows), list(rows.values())
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = Clock()
+    monkeypatch.setattr(shards, "time", SimpleNamespace(monotonic=fake.monotonic))
+    return fake
+
+
+def make(**kwargs):
+    loader = Loader()
+    return loader, LoungeShardCache(loader.shard, loader.everyone, **kwargs)
+
+
+def test_least_recently_used_shard_is_evicted(clock):
+    loader, cache = make(max_shards=2)
+    cache.get("A")
+    cache.get("B")
+    cache.get("A")
+    cache.get("C")
+
+    assert cache.resident() == ["A", "C"]
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 3, 1)
+    cache.get("B")
+    assert loader.calls == ["A", "B", "C", "B"]
+
+
+def test_idle_shards_expire(clock):
+    loader, cache = make(idle_ttl=60)
+    cache.get("A")
+    clock.now = 30
+    cache.get("B")
+    clock.now = 70
+    cache.get("B")
+
+    assert cache.resident() == ["B"]
+    assert cache.evictions == 1
+    clock.now = 200
+    cache.evict_idle()
+    assert len(cache) == 0
+
+
+def test_lounge_match_then_global_fallback(clock):
+    _, cache = make()
+
+    assert cache.best_match("A", vec(0)) == ("a1", pytest.approx(1.0), "lounge")
+    assert cache.best_match("A", vec(2)) is None
+    assert cache.best_match("A", vec(2), fallback=True) == ("b1", pytest.approx(1.0), "global")
+    assert cache.best_match("A", vec(7), fallback=True) is None
+    assert cache.best_match(None, vec(3)) == ("c1", pytest.approx(1.0), "global")
+
+
+def test_changes_patch_resident_shards_and_follow_moves(clock):
+    loader, cache = make()
+    cache.get("A")
+    cache.get("B")
+    cache.global_index()
+
+    cache.apply_changes([("a1", "B", vec(0)), ("n1", "C", vec(5))], removed=["a2"])
+
+    assert cache.best_match("A", vec(0)) is None
+    assert cache.best_match("B", vec(0))[0] == "a1"
+    assert cache.best_match("A", vec(1)) is None
+    assert cache.best_match(None, vec(5))[0] == "n1"
+    assert "C" not in cache  # not resident, picks changes up when it loads
+    assert loader.calls == ["A", "B", "global"]
+
+
+# ── identify_face outcomes ───────────────────────────────────────────
+
+
+@pytest.fixture
+def usecases(monkeypatch, clock):
+    from app.application import face_usecases
+
+    loader = Loader()
+    seen = []
+    monkeypatch.setattr(face_usecases, "shard_cache", LoungeShardCache(loader.shard, loader.everyone))
+    monkeypatch.setattr(face_usecases, "presence", SimpleNamespace(observe=lambda u, l: seen.append((u, l))))
+    monkeypatch.setattr(face_usecases, "MATCH_THRESHOLD", 0.9)
+    return face_usecases, seen
+
+
+def test_identify_grants_members_and_records_presence(usecases):
+    usecases, seen = usecases
+    decision = usecases.identify_face(vec(0), "A")
+    assert (decision["matched"], decision["status"], decision["user_id"]) == (True, "granted", "a1")
+    assert seen == [("a1", "A")]
+
+
+def test_identify_other_lounge_is_not_a_grant(usecases):
+    usecases, seen = usecases
+    decision = usecases.identify_face(vec(2), "A", fallback=True)
+    assert (decision["matched"], decision["status"], decision["user_id"]) == (False, "other_lounge", "b1")
+    assert seen == []
+
+
+def test_identify_unknown_face_is_not_recognized(usecases):
+    usecases, seen = usecases
+    for fallback in (False, True):
+        decision = usecases.identify_face(vec(6), "A", fallback=fallback)
+        assert (decision["matched"], decision["status"], decision["user_id"]) == (False, "not_recognized", None)
+    assert usecases.identify_face(vec(2), "A")["status"] == "not_recognized"  # no fallback
+
+
+def test_gallery_resolved_at_startup_not_import(monkeypatch):
+    from app.application import face_usecases
+    from app.embedding import engine
+
+    queries = []
+
+    def query(fetch, *args):
+        queries.append(fetch.__name__)
+        return {"status": "complete", "target_model": "Facenet512"}
+
+    for name in ("GALLERY_TABLE", "MODEL_NAME", "global_snapshot"):
+        monkeypatch.setattr(face_usecases, name, getattr(face_usecases, name))
+    monkeypatch.setattr(face_usecases.gallery_sync, "table", face_usecases.gallery_sync.table)
+    monkeypatch.setattr(engine, "_model_name", engine._model_name)
+    monkeypatch.setattr(face_usecases, "_query", query)
+    monkeypatch.setattr(face_usecases, "REEMBED_JOB", "to-facenet")
+    monkeypatch.setattr(face_usecases, "GALLERY_SNAPSHOT", None)
+
+    assert face_usecases.GALLERY_TABLE == "face_embeddings"
+    face_usecases.configure_gallery()
+
+    assert queries == ["fetch_job"]
+    assert face_usecases.GALLERY_TABLE == face_usecases.gallery_sync.table == "face_embeddings_next"
+    assert engine.model_name() == "Facenet512"
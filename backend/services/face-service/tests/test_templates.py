@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from app.similarity.matcher import l2_normalize
+from app.similarity.templates import TemplateGallery, fuse_templates
+
+
+def test_fuse_drops_inconsistent_captures():
+    captures = np.array([[1, 0.1, 0], [1, -0.1, 0], [1, 0, 0.1], [0, 0, -1]], dtype=np.float32)
+
+    fused, templates = fuse_templates(captures, max_templates=5)
+
+    assert len(templates) == 3  # the capture pointing away is dropped
+    assert fused == pytest.approx(l2_normalize(l2_normalize(captures[:3]).mean(axis=0)), abs=1e-6)
+
+
+def test_fuse_keeps_everything_when_all_disagree():
+    captures = np.eye(3, dtype=np.float32)
+
+    _, templates = fuse_templates(captures, max_templates=3, min_consistency=0.99)
+
+    assert len(templates) == 3
+
+
+def test_fuse_picks_diverse_templates_first():
+    captures = np.array([[1, 0, 0], [0.99, 0.01, 0], [0.7, 0.7, 0]], dtype=np.float32)
+
+    _, templates = fuse_templates(captures, max_templates=2, min_consistency=0.0)
+
+    # The second pick is the capture farthest from the first
+    assert templates[1] == pytest.approx(l2_normalize(captures[2]), abs=1e-6)
+
+
+def test_max_and_mean_aggregates():
+    templates = np.array([[1, 0, 0], [0, 1, 0]], dtype=np.float32)
+    probe = [1, 0, 0]
+
+    best = TemplateGallery(aggregate="max")
+    best.add("a", templates)
+    mean = TemplateGallery(aggregate="mean")
+    mean.add("a", templates)
+
+    assert best.search(probe)[0] == ("a", pytest.approx(1.0))
+    assert mean.search(probe)[0] == ("a", pytest.approx(0.5))
+
+
+def test_re_adding_a_user_replaces_all_templates():
+    gallery = TemplateGallery(max_templates=3)
+    gallery.add("a", np.eye(3, dtype=np.float32))
+    gallery.add("a", np.array([[0, 0, 1]], dtype=np.float32))
+
+    assert len(gallery) == 1
+    assert len(gallery.index) == 1
+    assert gallery.search([1, 0, 0])[0][1] == pytest.approx(0.0, abs=1e-6)
+
+
+def test_search_returns_k_distinct_users():
+    gallery = TemplateGallery(max_templates=2)
+    gallery.add_many(["a", "b"], [np.array([[1, 0], [0.9, 0.1]], dtype=np.float32),
+                                  np.array([[0, 1], [0.1, 0.9]], dtype=np.float32)])
+
+    assert [u for u, _ in gallery.search([1, 0], k=2)] == ["a", "b"]
+
+
+def test_unknown_aggregate_is_rejected():
+    with pytest.raises(ValueError):
+        TemplateGallery(aggregate="median")
@@ -0,0 +1,74 @@
+import pytest
+
+from app.detection.tracker import FaceTracker, centroid_distance, iou
+
+
+def test_iou_and_centroid_distance():
+    assert iou((0, 0, 10, 10), (0, 0, 10, 10)) == 1.0
+    assert iou((0, 0, 10, 10), (20, 0, 10, 10)) == 0.0
+    assert iou((0, 0, 10, 10), (5, 0, 10, 10)) == pytest.approx(50 / 150)
+    assert centroid_distance((0, 0, 10, 10), (10, 0, 10, 10)) == pytest.approx(1.0)
+
+
+def run(tracker, speed, frames, detect_every):
+    x = 0
+    tracker.update([(x, 0, 100, 100)], now=0)
+    for frame in range(1, frames + 1):
+        x += speed
+        if frame % detect_every == 0:
+            tracker.update([(x, 0, 100, 100)], now=frame, frames=detect_every)
+        else:
+            tracker.predict()
+    return x
+
+
+@pytest.mark.parametrize("detect_every", [1, 3])
+def test_velocity_converges_to_true_speed(detect_every):
+    tracker = FaceTracker()
+    x = run(tracker, speed=10, frames=30, detect_every=detect_every)
+
+    (track,) = tracker.tracks.values()
+    assert track.velocity == pytest.approx((10.0, 0.0))
+    assert track.box[0] == x
+
+
+def test_velocity_spans_missed_detections():
+    tracker = FaceTracker()
+    tracker.update([(0, 0, 100, 100)], now=0)
+    tracker.update([], now=1, frames=2)  # detector missed the face
+    tracker.update([(40, 0, 100, 100)], now=2, frames=2)
+
+    (track,) = tracker.tracks.values()
+    assert track.velocity == pytest.approx((10.0, 0.0))
+
+
+def test_unmatched_tracks_are_dropped_after_max_missed():
+    tracker = FaceTracker(max_missed=2)
+    tracker.update([(0, 0, 50, 50)], now=0)
+    for now in range(1, 3):
+        tracker.update([], now=now)
+    assert len(tracker.tracks) == 1
+    tracker.update([], now=3)
+    assert not tracker.tracks
+
+
+def test_far_detection_opens_a_new_track():
+    tracker = FaceTracker()
+    tracker.update([(0, 0, 50, 50)], now=0)
+    tracker.update([(0, 0, 50, 50), (400, 0, 50, 50)], now=1)
+
+    assert len(tracker.active()) == 2
+
+
+def test_embedding_schedule():
+    tracker = FaceTracker(confident=0.8, retry=0.5, refresh=10.0)
+    (track,) = tracker.update([(0, 0, 50, 50)], now=0)
+    assert tracker.pending(now=0) == [track]
+
+    track.assign("u", 0.6, now=0)
+    assert tracker.pending(now=0.4) == []
+    assert tracker.pending(now=0.5) == [track]
+
+    track.assign("u", 0.9, now=1)
+    assert tracker.pending(now=5) == []
+    assert tracker.pending(now=11) == [track]
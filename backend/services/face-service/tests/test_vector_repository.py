@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from app.infrastructure import db
+from app.infrastructure.vector_repository import fetch_exact_rows, parse_vector
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    def execute(self, sql, params=()):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.cur = FakeCursor(rows)
+
+    def cursor(self):
+        return self.cur
+
+
+def test_parse_vector_accepts_pgvector_text_and_bytea():
+    assert parse_vector("[1,2.5,-3]").tolist() == [1.0, 2.5, -3.0]
+    assert parse_vector(np.array([1, 2], dtype=np.float32).tobytes()).tolist() == [1.0, 2.0]
+
+
+def test_fetch_exact_rows_maps_users_and_template_slots(monkeypatch):
+    monkeypatch.setattr(db, "PREPARE_STATEMENTS", False)
+    templates = np.array([[1, 0, 0], [0, 1, 0]], dtype=np.float32)
+    conn = FakeConnection([
+        ("plain", "[0,0,2]", None),
+        ("multi", "[1,1,0]", templates.tobytes()),
+    ])
+
+    rows = fetch_exact_rows(conn, ["plain", ("multi", 1), ("multi", 5), ("plain", 0), "gone"])
+
+    (_, params), = conn.cur.executed
+    assert sorted(params[0]) == ["gone", "multi", "plain"]
+    assert set(rows) == {"plain", ("multi", 1), ("plain", 0)}
+    assert rows["plain"].tolist() == [0.0, 0.0, 2.0]
+    assert rows[("multi", 1)].tolist() == [0.0, 1.0, 0.0]
+
+
+def test_fetch_exact_rows_fuses_templates_like_a_single_vector_gallery(monkeypatch):
+    monkeypatch.setattr(db, "PREPARE_STATEMENTS", False)
+    templates = np.array([[1, 0], [0, 1]], dtype=np.float32)
+    conn = FakeConnection([("multi", "[0.6,0.8]", templates.tobytes())])
+
+    rows = fetch_exact_rows(conn, ["multi"])
+
+    assert rows["multi"] == pytest.approx(np.full(2, np.sqrt(0.5)))
+    assert fetch_exact_rows(FakeConnection([]), []) == {}
@@ -0,0 +1,81 @@
+import numpy as np
+
+from app.application.video_pipeline import TrackingRecognizer
+
+BOX = (40, 30, 60, 80)
+
+
+class Recorder:
+    def __init__(self, live=True):
+        self.live = live
+        self.embedded = []
+        self.checked = []
+
+    def embed(self, crops):
+        self.embedded.extend(crops)
+        return np.ones((len(crops), 4), np.float32)
+
+    def search(self, embeddings, k):
+        return [[("user-1", 0.95)] for _ in embeddings]
+
+    def liveness(self, crops):
+        self.checked.append(len(crops))
+        return {"is_live": self.live}
+
+
+def frame(seed):
+    return np.random.default_rng(seed).integers(0, 256, (200, 240, 3), dtype=np.uint8)
+
+
+def recognizer(rec, **kwargs):
+    return TrackingRecognizer(lambda f: [BOX], rec.embed, rec.search, detect_every=1, **kwargs)
+
+
+def test_liveness_waits_for_enough_track_frames():
+    rec = Recorder()
+    tracking = recognizer(rec, liveness=rec.liveness, liveness_frames=3)
+    for i in range(2):
+        tracks = tracking.process(frame(i), now=float(i))
+        assert not tracks[0].identified and rec.embedded == []
+    tracks = tracking.process(frame(2), now=2.0)
+    assert rec.checked == [3]
+    assert tracks[0].user_id == "user-1"
+    assert tracking.embeddings == 1
+
+
+def test_track_failing_liveness_is_not_embedded():
+    rec = Recorder(live=False)
+    tracking = recognizer(rec, liveness=rec.liveness, liveness_frames=2)
+    for i in range(4):
+        tracks = tracking.process(frame(i), now=i * 0.1)
+    assert rec.embedded == []
+    assert tracking.spoofs == 1  # retried only after the tracker's retry delay
+    assert not tracks[0].identified
+
+
+def test_without_liveness_a_new_track_is_embedded_at_once():
+    rec = Recorder()
+    tracks = recognizer(rec).process(frame(0), now=0.0)
+    assert tracks[0].user_id == "user-1"
+    assert rec.checked == []
+
+
+def test_frozen_feed_fails_the_motion_check():
+    from app.liveness.liveness_detector import check_liveness
+    rec = Recorder()
+    tracking = recognizer(rec, liveness=check_liveness, liveness_frames=3)
+    still = frame(0)
+    for i in range(3):
+        tracking.process(still.copy(), now=i * 0.1)
+    assert tracking.spoofs == 1 and rec.embedded == []
+
+
+def test_crops_keep_the_boxs_aspect_ratio_by_default():
+    rec = Recorder()
+    recognizer(rec).process(frame(0), now=0.0)
+    x, y, w, h = BOX
+    assert rec.embedded[0].shape == (h, w, 3)
+
+    rec = Recorder()
+    recognizer(rec, crop_size=(32, 32)).process(frame(0), now=0.0)
+    assert rec.embedded[0].shape == (32, 32, 3)
@@ -0,0 +1,127 @@
+import time
+
+import numpy as np
+import pytest
+
+import fake_worker
+from app.application.pipeline import StageOverloaded
+from app.embedding import worker_pool
+
+
+def crop(value):
+    return np.full((8, 8, 3), value, dtype=np.uint8)
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def flags(tmp_path, monkeypatch):
+    die, hold = tmp_path / "die", tmp_path / "hold"
+    monkeypatch.setenv("FAKE_WORKER_DIE", str(die))
+    monkeypatch.setenv("FAKE_WORKER_HOLD", str(hold))
+    yield die, hold
+    hold.unlink(missing_ok=True)
+
+
+@pytest.fixture
+def pool(monkeypatch, flags):
+    monkeypatch.setattr(worker_pool, "_worker_main", fake_worker.run)
+    pools = []
+
+    def make(**kwargs):
+        kwargs.setdefault("slots", 4)
+        kwargs.setdefault("timeout", 30.0)
+        kwargs.setdefault("respawn_backoff", 0.0)
+        kwargs.setdefault("dim", fake_worker.DIM)
+        pools.append(worker_pool.InferencePool(1, input_size=(8, 8), pin=False, **kwargs).start(timeout=60))
+        return pools[-1]
+
+    yield make
+    for instance in pools:
+        instance.stop()
+
+
+def test_embeddings_come_back_through_shared_memory(pool):
+    p = pool()
+
+    out = p.embed([crop(10), crop(20)])
+
+    assert out.shape == (2, fake_worker.DIM)
+    assert out[:, 0].tolist() == [10.0, 20.0]
+    wait_for(lambda: p.pending == 0)
+
+
+def test_output_slots_sized_for_the_models_embedding(pool, monkeypatch):
+    # VGG-Face embeddings are 4096-D; none may be truncated
+    monkeypatch.setenv("FAKE_WORKER_DIM", "4096")
+    p = pool(model_name="VGG-Face", dim=None)
+
+    out = p.embed([crop(7)])
+
+    assert p.dim == 4096
+    assert out.shape == (1, 4096) and (out == 7.0).all()
+
+
+def test_worker_refuses_mismatched_embedding_size(pool):
+    with pytest.raises(RuntimeError, match="4-D embeddings, slots hold 512"):
+        pool(dim=512)
+
+
+def test_unknown_model_needs_an_explicit_dim():
+    with pytest.raises(ValueError, match="pass dim"):
+        worker_pool.InferencePool(1, model_name="Custom", input_size=(8, 8))
+
+
+def test_full_ring_is_overloaded_and_returns_the_slots(pool):
+    p = pool(slots=2)
+
+    with pytest.raises(StageOverloaded):
+        p.submit([crop(1)] * 3)
+    assert p.pending == 0
+
+
+def test_cancelled_future_frees_its_slot_and_the_listener_survives(pool, flags):
+    _, hold = flags
+    p = pool(slots=2)
+    hold.touch()
+    futures = p.submit([crop(1), crop(2)])
+    assert all(future.cancel() for future in futures)
+    hold.unlink()
+
+    # the worker still answers; settling a cancelled future must not raise
+    wait_for(lambda: p.pending == 0)
+
+    assert p._listener.is_alive()
+    assert p.embed([crop(5)])[0, 0] == 5.0
+
+
+def test_worker_death_fails_its_crops_and_respawns(pool, flags):
+    die, _ = flags
+    p = pool()
+    die.touch()
+
+    (future,) = p.submit([crop(1)])
+    with pytest.raises(RuntimeError, match="exited"):
+        future.result(timeout=10)
+
+    assert p.worker_deaths == 1
+    wait_for(lambda: p.pending == 0)
+    assert p.embed([crop(7)])[0, 0] == 7.0
+
+
+def test_unanswered_crop_times_out(pool, flags):
+    _, hold = flags
+    p = pool(timeout=0.2)
+    hold.touch()
+
+    (future,) = p.submit([crop(1)])
+
+    with pytest.raises(TimeoutError):
+        future.result(timeout=10)
+    hold.unlink()
+    wait_for(lambda: p.pending == 0)
@@ -0,0 +1,57 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from app.application.verification_usecases import (
+    parse_boarding_passes,
+    scan_boarding_pass,
+    scan_boarding_passes,
+)
+from app.schemas.boarding_schema import (
+    ParseRequest,
+    ScanBatchRequest,
+    ScanBatchResponse,
+    ScanRequest,
+    ScanResult,
+)
+import base64
+import binascii
+
+router = APIRouter()
+
+MAX_BATCH = 64
+
+
+def _decode_base64(data: str) -> bytes:
+    # Accept data URLs as sent by the mobile app
+    if data.startswith("data:"):
+        data = data.split(",", 1)[-1]
+    try:
+        return base64.b64decode(data, validate=True)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid base64 image")
+
+
+def _check_batch(items):
+    if not items:
+        raise HTTPException(status_code=400, detail="Empty batch")
+    if len(items) > MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"Maximum {MAX_BATCH} items per batch")
+
+
+@router.post("/boarding-pass/scan", response_model=ScanResult)
+async def scan(payload: ScanRequest):
+    content = _decode_base64(payload.image_base64)
+    return await run_in_threadpool(scan_boarding_pass, content)
+
+
+@router.post("/boarding-pass/scan/batch", response_model=ScanBatchResponse)
+async def scan_batch(payload: ScanBatchRequest):
+    _check_batch(payload.images_base64)
+    contents = [_decode_base64(image) for image in payload.images_base64]
+    return {"results": await run_in_threadpool(scan_boarding_passes, contents)}
+
+
+@router.post("/boarding-pass/parse", response_model=ScanBatchResponse)
+async def parse(payload: ParseRequest):
+    # Parsing is microseconds per pass; no need to leave the event loop
+    _check_batch(payload.payloads)
+    return {"results": parse_boarding_passes(payload.payloads)}
@@ -0,0 +1,64 @@
+"""
+Boarding-pass scanning: barcode first, AI only when there is no barcode.
+
+Every BCBP barcode encodes the pass verbatim, so decoding it and slicing
+the fixed-width fields is exact and takes milliseconds. Scans that carry
+no readable BCBP barcode come back with needs_fallback=True and the
+caller (the scan-boarding-pass edge function) sends the image on to its
+Gemini/OCR path.
+"""
+from app.domain.boarding_pass import BoardingPass
+from app.infrastructure.iata_parser import BCBPError, parse, parse_many
+from app.infrastructure.qr_decoder import BarcodeDecodeError, decode_barcodes, decode_barcodes_many
+
+
+def _from_barcodes(barcodes, reference=None):
+    for barcode_format, text in barcodes:
+        try:
+            bcbp = parse(text)
+        except BCBPError:
+            continue  # some passes also carry a plain URL QR code
+        return {
+            "found": True,
+            "needs_fallback": False,
+            "barcode_format": barcode_format,
+            "raw_data": text,
+            "boarding_pass": BoardingPass.from_bcbp(bcbp, reference).to_dict(),
+        }
+    reason = "No BCBP data in barcode" if barcodes else "No barcode found"
+    return {"found": False, "needs_fallback": True, "reason": reason}
+
+
+def scan_boarding_pass(content, reference=None):
+    """Encoded image bytes -> scan result (see module docstring)."""
+    try:
+        barcodes = decode_barcodes(content)
+    except BarcodeDecodeError as exc:
+        return {"found": False, "needs_fallback": True, "reason": str(exc)}
+    return _from_barcodes(barcodes, reference)
+
+
+def scan_boarding_passes(contents, reference=None):
+    """scan_boarding_pass over a batch, decoded in parallel."""
+    results = []
+    for barcodes in decode_barcodes_many(contents):
+        if isinstance(barcodes, BarcodeDecodeError):
+            results.append({"found": False, "needs_fallback": True, "reason": str(barcodes)})
+        else:
+            results.append(_from_barcodes(barcodes, reference))
+    return results
+
+
+def parse_boarding_passes(payloads, reference=None):
+    """Already-decoded BCBP strings (e.g. from a kiosk scanner) -> results."""
+    results = []
+    for payload, bcbp in zip(payloads, parse_many(payloads)):
+        if isinstance(bcbp, BCBPError):
+            results.append({"found": False, "reason": str(bcbp)})
+        else:
+            results.append({
+                "found": True,
+                "raw_data": payload,
+                "boarding_pass": BoardingPass.from_bcbp(bcbp, reference).to_dict(),
+            })
+    return results
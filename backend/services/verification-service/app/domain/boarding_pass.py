@@ -0,0 +1,77 @@
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional
+
+# IATA compartment codes (booking class of the first leg)
+_CLASSES = {
+    **dict.fromkeys("FAP", "First"),
+    **dict.fromkeys("JCDIZR", "Business"),
+    **dict.fromkeys("WEO", "Premium Economy"),
+}
+
+
+def travel_class(compartment):
+    if not compartment:
+        return None
+    return _CLASSES.get(compartment, "Economy")
+
+
+def _leg(leg, reference):
+    flight_date = leg.flight_date(reference)
+    return {
+        "flight_number": leg.flight,
+        "departure_airport_code": leg["from_airport"],
+        "arrival_airport_code": leg["to_airport"],
+        "departure_date": flight_date.isoformat() if flight_date else None,
+        "seat": leg.seat,
+        "booking_reference": leg["pnr"],
+    }
+
+
+@dataclass
+class BoardingPass:
+    """
+    The fields the scan-boarding-pass function stores in boarding_passes.
+    Barcodes carry no times, gate or airport names, so those stay None,
+    and `airline` is the carrier code; the caller resolves names.
+    """
+
+    passenger_name: Optional[str] = None
+    flight_number: Optional[str] = None
+    airline: Optional[str] = None
+    departure_airport_code: Optional[str] = None
+    departure_airport_name: Optional[str] = None
+    arrival_airport_code: Optional[str] = None
+    arrival_airport_name: Optional[str] = None
+    departure_date: Optional[str] = None
+    departure_time: Optional[str] = None
+    boarding_time: Optional[str] = None
+    gate: Optional[str] = None
+    seat: Optional[str] = None
+    booking_reference: Optional[str] = None
+    travel_class: Optional[str] = None
+    sequence_number: Optional[str] = None
+    legs: List[dict] = field(default_factory=list)
+
+    @classmethod
+    def from_bcbp(cls, bcbp, reference=None):
+        """From a parsed BCBP; the first leg is the one shown on the pass."""
+        leg = bcbp.legs[0]
+        flight_date = leg.flight_date(reference)
+        sequence = leg["sequence_number"]
+        name = bcbp.passenger_name
+        return cls(
+            passenger_name=name.title() if name else None,
+            flight_number=leg.flight,
+            airline=leg["carrier"] or None,
+            departure_airport_code=leg["from_airport"] or None,
+            arrival_airport_code=leg["to_airport"] or None,
+            departure_date=flight_date.isoformat() if flight_date else None,
+            seat=leg.seat,
+            booking_reference=leg["pnr"] or None,
+            travel_class=travel_class(leg["compartment"]),
+            sequence_number=sequence.lstrip("0") or None if sequence else None,
+            legs=[_leg(l, reference) for l in bcbp.legs],
+        )
+
+    def to_dict(self):
+        return asdict(self)
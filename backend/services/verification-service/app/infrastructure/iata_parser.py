@@ -0,0 +1,269 @@
+"""
+IATA Bar Coded Boarding Pass (BCBP, Resolution 792) parser.
+
+A BCBP string is fixed-width: a 23-character unique header, then per leg
+35 mandatory characters and a 2-digit hex size of the leg's variable part
+(conditional items, then free airline use). The first leg's variable part
+may open with ">" + version + a unique conditional block; every leg may
+carry a repeated conditional block. Conditional blocks can stop after any
+item, so their own hex sizes decide which items are present. An optional
+"^" security block follows the last leg.
+
+Parsing only walks those size fields and records offsets; fields are
+sliced out of one memoryview over the input and decoded to str when read,
+so a pass that is only checked for route and date never materializes the
+rest.
+"""
+from datetime import date, timedelta
+
+
+class BCBPError(ValueError):
+    """Raised for input that is not a BCBP string."""
+
+
+def _layout(*fields):
+    offsets, pos = {}, 0
+    for name, width in fields:
+        offsets[name] = (pos, width)
+        pos += width
+    return offsets, pos
+
+
+HEADER, HEADER_SIZE = _layout(
+    ("format_code", 1),
+    ("number_of_legs", 1),
+    ("passenger_name", 20),
+    ("electronic_ticket", 1),
+)
+LEG, LEG_SIZE = _layout(
+    ("pnr", 7),
+    ("from_airport", 3),
+    ("to_airport", 3),
+    ("carrier", 3),
+    ("flight_number", 5),
+    ("julian_date", 3),
+    ("compartment", 1),
+    ("seat", 4),
+    ("sequence_number", 5),
+    ("passenger_status", 1),
+)
+UNIQUE_CONDITIONAL, _ = _layout(
+    ("passenger_description", 1),
+    ("checkin_source", 1),
+    ("issuance_source", 1),
+    ("issue_date", 4),
+    ("document_type", 1),
+    ("issuer", 3),
+    ("baggage_tag", 13),
+    ("baggage_tag_2", 13),
+    ("baggage_tag_3", 13),
+)
+REPEATED_CONDITIONAL, _ = _layout(
+    ("airline_numeric_code", 3),
+    ("serial_number", 10),
+    ("selectee", 1),
+    ("document_verification", 1),
+    ("marketing_carrier", 3),
+    ("frequent_flyer_airline", 3),
+    ("frequent_flyer_number", 16),
+    ("id_ad_indicator", 1),
+    ("free_baggage", 3),
+    ("fast_track", 1),
+)
+
+_GT, _CARET, _FORMAT = ord(">"), ord("^"), ord("M")
+
+
+def _hex(buf, pos):
+    try:
+        return int(str(buf[pos:pos + 2], "ascii"), 16)
+    except (ValueError, UnicodeDecodeError):
+        raise BCBPError(f"Expected a hex field size at offset {pos}")
+
+
+class Record:
+    """
+    A fixed-width block at `base` in `buf`. Items that do not fit before
+    `end` (truncated conditional blocks) read as None.
+    """
+
+    __slots__ = ("_buf", "_base", "_end", "_layout")
+
+    def __init__(self, buf, base, end, layout):
+        self._buf = buf
+        self._base = base
+        self._end = end
+        self._layout = layout
+
+    def raw(self, name):
+        """The field as a memoryview slice (no copy), or None if absent."""
+        offset, width = self._layout[name]
+        start = self._base + offset
+        if start + width > self._end:
+            return None
+        return self._buf[start:start + width]
+
+    def __getitem__(self, name):
+        view = self.raw(name)
+        return None if view is None else str(view, "ascii").strip()
+
+    def __contains__(self, name):
+        return self.raw(name) is not None
+
+    def to_dict(self):
+        return {name: self[name] for name in self._layout if name in self}
+
+
+class Leg(Record):
+    __slots__ = ("conditional", "airline_use")
+
+    def __init__(self, buf, base, end):
+        super().__init__(buf, base, end, LEG)
+        self.conditional = None  # Record over REPEATED_CONDITIONAL
+        self.airline_use = None  # memoryview
+
+    @property
+    def flight(self):
+        """Carrier and number without zero padding, e.g. "AI 839" or "6E 2341A"."""
+        number = self["flight_number"]
+        digits = number.rstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+        return f"{self['carrier']} {digits.lstrip('0') or '0'}{number[len(digits):]}"
+
+    @property
+    def seat(self):
+        seat = self["seat"]
+        return seat.lstrip("0") or None if seat else None
+
+    def flight_date(self, reference=None):
+        return resolve_julian(self["julian_date"], reference)
+
+    def to_dict(self, reference=None):
+        out = super().to_dict()
+        out["flight"] = self.flight
+        flight_date = self.flight_date(reference)
+        out["flight_date"] = flight_date.isoformat() if flight_date else None
+        if self.conditional is not None:
+            out.update(self.conditional.to_dict())
+        if self.airline_use is not None:
+            out["airline_use"] = str(self.airline_use, "ascii")
+        return out
+
+
+class BoardingPassBarcode:
+    """Result of parse(): header, legs and optional conditional/security data."""
+
+    __slots__ = ("header", "legs", "version", "conditional", "security_type", "security")
+
+    def __init__(self, header, legs, version=None, conditional=None, security_type=None, security=None):
+        self.header = header
+        self.legs = legs
+        self.version = version
+        self.conditional = conditional  # Record over UNIQUE_CONDITIONAL
+        self.security_type = security_type
+        self.security = security  # memoryview
+
+    @property
+    def passenger_name(self):
+        """"SURNAME/GIVEN MR" as "GIVEN SURNAME"."""
+        return display_name(self.header["passenger_name"])
+
+    def to_dict(self, reference=None):
+        out = self.header.to_dict()
+        out["passenger_display_name"] = self.passenger_name
+        out["version"] = self.version
+        if self.conditional is not None:
+            out.update(self.conditional.to_dict())
+        out["legs"] = [leg.to_dict(reference) for leg in self.legs]
+        if self.security is not None:
+            out["security_type"] = self.security_type
+            out["security"] = str(self.security, "ascii")
+        return out
+
+
+def parse(data):
+    """
+    Parse a BCBP string (str, bytes, bytearray or memoryview). Bytes-like
+    input is not copied.
+    """
+    buf = memoryview(data.encode("ascii", "replace") if isinstance(data, str) else data)
+    if buf.format != "B":
+        buf = buf.cast("B")
+    size = len(buf)
+    if size < HEADER_SIZE + LEG_SIZE + 2 or buf[0] != _FORMAT:
+        raise BCBPError("Not an IATA BCBP 'M' format string")
+    count = buf[1] - 48
+    if not 1 <= count <= 9:
+        raise BCBPError(f"Invalid number of legs {chr(buf[1])!r}")
+
+    header = Record(buf, 0, HEADER_SIZE, HEADER)
+    legs = []
+    version = unique = None
+    pos = HEADER_SIZE
+    for index in range(count):
+        if pos + LEG_SIZE + 2 > size:
+            raise BCBPError(f"Truncated leg {index + 1}")
+        leg = Leg(buf, pos, pos + LEG_SIZE)
+        pos += LEG_SIZE
+        variable_end = min(pos + 2 + _hex(buf, pos), size)
+        pos += 2
+
+        if index == 0 and pos + 4 <= variable_end and buf[pos] == _GT:
+            version = chr(buf[pos + 1])
+            unique_end = min(pos + 4 + _hex(buf, pos + 2), variable_end)
+            unique = Record(buf, pos + 4, unique_end, UNIQUE_CONDITIONAL)
+            pos = unique_end
+        if version is not None and pos + 2 <= variable_end:
+            repeated_end = min(pos + 2 + _hex(buf, pos), variable_end)
+            leg.conditional = Record(buf, pos + 2, repeated_end, REPEATED_CONDITIONAL)
+            pos = repeated_end
+        if pos < variable_end:
+            leg.airline_use = buf[pos:variable_end]
+        pos = variable_end
+        legs.append(leg)
+
+    security_type = security = None
+    if pos + 4 <= size and buf[pos] == _CARET:
+        security_type = chr(buf[pos + 1])
+        length = _hex(buf, pos + 2)
+        security = buf[pos + 4:min(pos + 4 + length, size)]
+    return BoardingPassBarcode(header, legs, version, unique, security_type, security)
+
+
+def parse_many(payloads):
+    """Parse a batch; invalid entries come back as their BCBPError."""
+    results = []
+    for payload in payloads:
+        try:
+            results.append(parse(payload))
+        except BCBPError as exc:
+            results.append(exc)
+    return results
+
+
+# ── field helpers ──────────────────────────────────────────────────────
+
+_TITLES = {"MR", "MRS", "MS", "MISS", "MSTR", "DR", "PROF", "CHD", "INF"}
+
+
+def display_name(raw):
+    if not raw:
+        return None
+    surname, _, given = raw.partition("/")
+    words = given.split()
+    while words and words[-1] in _TITLES:
+        words.pop()
+    return " ".join(words + [surname]).strip() or None
+
+
+def resolve_julian(value, reference=None):
+    """Day-of-year "045" as the date nearest to `reference` (default today)."""
+    if not value or not value.isdigit() or not 1 <= int(value) <= 366:
+        return None
+    reference = reference or date.today()
+    day = int(value)
+    candidates = []
+    for year in (reference.year - 1, reference.year, reference.year + 1):
+        candidate = date(year, 1, 1) + timedelta(days=day - 1)
+        if candidate.year == year:  # day 366 only exists in leap years
+            candidates.append(candidate)
+    return min(candidates, key=lambda d: abs(d - reference)) if candidates else None
@@ -0,0 +1,68 @@
+"""
+Barcode decoding for boarding passes.
+
+BCBP is printed as PDF417 on paper passes and as QR, Aztec or DataMatrix
+on mobile ones. zxing-cpp reads all four in one call; without it only QR
+codes can be read, through OpenCV.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+try:
+    import zxingcpp
+except ImportError:
+    zxingcpp = None
+
+# Larger photos are scaled down before decoding; barcode modules stay well
+# above a pixel at this size and detection cost grows with area
+MAX_SIDE = int(os.getenv("VERIFY_BARCODE_MAX_SIDE", "1600"))
+DECODE_WORKERS = int(os.getenv("VERIFY_DECODE_WORKERS", str(os.cpu_count() or 1)))
+
+_FORMATS = zxingcpp.barcode_formats_from_str("PDF417,QRCode,Aztec,DataMatrix") if zxingcpp else None
+_executor = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix="barcode")
+
+
+class BarcodeDecodeError(ValueError):
+    """The upload is not a readable image."""
+
+
+def decode_image(content):
+    """Encoded image bytes -> grayscale ndarray, downscaled to MAX_SIDE."""
+    array = np.frombuffer(content, dtype=np.uint8)
+    image = cv2.imdecode(array, cv2.IMREAD_GRAYSCALE) if array.size else None
+    if image is None:
+        raise BarcodeDecodeError("Could not decode image")
+    side = max(image.shape)
+    if side > MAX_SIDE:
+        scale = MAX_SIDE / side
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return image
+
+
+def read_barcodes(image):
+    """[(format, text)] for every boarding-pass barcode found in `image`."""
+    if zxingcpp is not None:
+        return [(str(b.format), b.text) for b in zxingcpp.read_barcodes(image, formats=_FORMATS) if b.text]
+    found, texts, _, _ = cv2.QRCodeDetector().detectAndDecodeMulti(image)
+    return [("QRCode", text) for text in texts if text] if found else []
+
+
+def decode_barcodes(content):
+    return read_barcodes(decode_image(content))
+
+
+def decode_barcodes_many(contents):
+    """
+    Decode a batch on the decoder pool (OpenCV and zxing release the GIL).
+    Unreadable images come back as their BarcodeDecodeError.
+    """
+    def safe(content):
+        try:
+            return decode_barcodes(content)
+        except BarcodeDecodeError as exc:
+            return exc
+
+    return list(_executor.map(safe, contents))
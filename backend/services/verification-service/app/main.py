@@ -0,0 +1,16 @@
+from fastapi import FastAPI
+
+from app.api.routes import router
+from app.infrastructure.qr_decoder import zxingcpp
+
+app = FastAPI(title="AeroFace Verification Service")
+app.include_router(router)
+
+
+@app.get("/health")
+def health():
+    return {
+        "status": "ok",
+        # Without zxing-cpp only QR codes are readable (no PDF417/Aztec)
+        "barcode_backend": "zxing-cpp" if zxingcpp is not None else "opencv-qr",
+    }
@@ -0,0 +1,28 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class ScanRequest(BaseModel):
+    image_base64: str
+
+
+class ScanBatchRequest(BaseModel):
+    images_base64: List[str]
+
+
+class ParseRequest(BaseModel):
+    payloads: List[str]
+
+
+class ScanResult(BaseModel):
+    found: bool
+    needs_fallback: bool = False
+    reason: Optional[str] = None
+    barcode_format: Optional[str] = None
+    raw_data: Optional[str] = None
+    boarding_pass: Optional[dict] = None
+
+
+class ScanBatchResponse(BaseModel):
+    results: List[ScanResult]
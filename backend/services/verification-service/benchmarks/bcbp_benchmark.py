@@ -0,0 +1,218 @@
+"""
+Boarding-pass fast-path benchmark: BCBP parsing and barcode decoding.
+
+    python benchmarks/bcbp_benchmark.py --passes 100000
+    python benchmarks/bcbp_benchmark.py --passes 20000 --images 200 --json out.json
+
+Builds a corpus of synthetic BCBP strings (1-4 legs, with and without
+conditional/security sections, some truncated mid-section the way real
+passes are) and times:
+
+    parse         parse() + first-leg route/date, the check-in hot path
+    parse_full    parse() + every field decoded (to_dict)
+    domain        parse() + BoardingPass.from_bcbp, what the API returns
+    parse_many    batch throughput over the whole corpus
+    decode_*      image -> barcode -> parse per symbology (needs zxing-cpp)
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from app.application.verification_usecases import scan_boarding_pass, scan_boarding_passes
+from app.domain.boarding_pass import BoardingPass
+from app.infrastructure.iata_parser import parse, parse_many
+from app.infrastructure.qr_decoder import zxingcpp
+
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+AIRPORTS = ["DEL", "BOM", "BLR", "HYD", "MAA", "CCU", "DXB", "LHR", "SIN", "JFK", "FRA", "CDG"]
+CARRIERS = ["AI", "6E", "UK", "SG", "EK", "BA", "SQ", "LH"]
+COMPARTMENTS = "FJCWYYYYMB"
+
+
+# ── synthetic corpus ───────────────────────────────────────────────────
+
+def _word(rng, low, high):
+    return "".join(rng.choice(list(LETTERS), rng.integers(low, high + 1)))
+
+
+def _hex(size):
+    return f"{size:02X}"
+
+
+def encode_bcbp(name, legs, conditional=None, security=None, version="6"):
+    """
+    A BCBP string. `legs` are dicts of the mandatory leg fields plus an
+    optional "conditional" (repeated section) and "airline_use" string;
+    `conditional` is the unique conditional section body.
+    """
+    out = ["M", str(len(legs)), f"{name:<20.20}", "E"]
+    for index, leg in enumerate(legs):
+        out.append(
+            f"{leg['pnr']:<7}{leg['from']:<3}{leg['to']:<3}{leg['carrier']:<3}"
+            f"{leg['flight']:<5}{leg['julian']:03d}{leg['compartment']}"
+            f"{leg['seat']:>4}{leg['sequence']:05d}{leg.get('status', '0')}"
+        )
+        variable = ""
+        if conditional is not None:
+            if index == 0:
+                variable += ">" + version + _hex(len(conditional)) + conditional
+            repeated = leg.get("conditional", "")
+            variable += _hex(len(repeated)) + repeated
+        variable += leg.get("airline_use", "")
+        out.append(_hex(len(variable)) + variable)
+    if security is not None:
+        out.append("^1" + _hex(len(security)) + security)
+    return "".join(out)
+
+
+def synthetic_pass(rng, today):
+    legs = []
+    origin = rng.choice(AIRPORTS)
+    for _ in range(int(rng.choice([1, 1, 1, 2, 2, 3, 4]))):
+        destination = rng.choice([a for a in AIRPORTS if a != origin])
+        flight_date = today + timedelta(days=int(rng.integers(-2, 30)))
+        leg = {
+            "pnr": _word(rng, 6, 6),
+            "from": origin,
+            "to": destination,
+            "carrier": rng.choice(CARRIERS),
+            "flight": f"{int(rng.integers(1, 9999)):04d}" + ("A" if rng.random() < 0.05 else ""),
+            "julian": flight_date.timetuple().tm_yday,
+            "compartment": rng.choice(list(COMPARTMENTS)),
+            "seat": f"{int(rng.integers(1, 60)):03d}{rng.choice(list('ABCDEF'))}",
+            "sequence": int(rng.integers(1, 400)),
+        }
+        if rng.random() < 0.7:
+            ff = _word(rng, 8, 12)
+            leg["conditional"] = (
+                f"098{int(rng.integers(10**9, 10**10))}00{leg['carrier']:<3}{leg['carrier']:<3}{ff:<16}"
+                f"0{'20K' if rng.random() < 0.5 else '1PC'}{'Y' if rng.random() < 0.2 else 'N'}"
+            )[: int(rng.choice([13, 18, 42]))]  # sections may stop after any item
+        if rng.random() < 0.3:
+            leg["airline_use"] = _word(rng, 4, 20)
+        legs.append(leg)
+        origin = destination
+
+    name = f"{_word(rng, 3, 12)}/{_word(rng, 3, 10)}" + (" MR" if rng.random() < 0.5 else "")
+    conditional = None
+    if rng.random() < 0.8:
+        issued = (today - timedelta(days=int(rng.integers(0, 60))))
+        conditional = (
+            f"{rng.integers(0, 9)}WW{issued.year % 10}{issued.timetuple().tm_yday:03d}B{legs[0]['carrier']:<3}"
+            + (f"0{int(rng.integers(10**11, 10**12))}" if rng.random() < 0.3 else "")
+        )
+    security = _word(rng, 40, 80) if rng.random() < 0.3 else None
+    return encode_bcbp(name, legs, conditional, security)
+
+
+def corpus(count, seed=0):
+    rng = np.random.default_rng(seed)
+    today = date.today()
+    return [synthetic_pass(rng, today) for _ in range(count)]
+
+
+# ── timing ─────────────────────────────────────────────────────────────
+
+def summarize(name, latencies, **extra):
+    row = {
+        "name": name,
+        "p50_us": float(np.percentile(latencies, 50)),
+        "p95_us": float(np.percentile(latencies, 95)),
+        "p99_us": float(np.percentile(latencies, 99)),
+        **extra,
+    }
+    print(f"{name:<18} p50={row['p50_us']:.2f}us p95={row['p95_us']:.2f}us p99={row['p99_us']:.2f}us "
+          + " ".join(f"{k}={v:.1f}" if isinstance(v, float) else f"{k}={v}" for k, v in extra.items()))
+    return row
+
+
+def time_each(fn, items):
+    latencies = np.empty(len(items))
+    for i, item in enumerate(items):
+        start = time.perf_counter()
+        fn(item)
+        latencies[i] = (time.perf_counter() - start) * 1e6
+    return latencies
+
+
+def first_leg(payload):
+    leg = parse(payload).legs[0]
+    return leg["from_airport"], leg["to_airport"], leg.flight_date()
+
+
+def barcode_images(payloads, symbology, scale):
+    import cv2
+
+    images = []
+    for payload in payloads:
+        if hasattr(zxingcpp, "create_barcode"):  # zxing-cpp >= 2.3
+            barcode = zxingcpp.create_barcode(payload, symbology)
+            image = np.asarray(zxingcpp.write_barcode_to_image(barcode, scale=scale))
+        else:
+            image = np.asarray(zxingcpp.write_barcode(symbology, payload, quiet_zone=10))
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_NEAREST)
+        images.append(cv2.imencode(".png", image)[1].tobytes())
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--passes", type=int, default=100_000, help="corpus size")
+    parser.add_argument("--images", type=int, default=100, help="barcode images per symbology (0 = skip)")
+    parser.add_argument("--scale", type=int, default=3, help="pixels per barcode module")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    payloads = corpus(args.passes, args.seed)
+    print(f"[bcbp] {len(payloads)} passes, mean length {np.mean([len(p) for p in payloads]):.0f} chars")
+    encoded = [p.encode("ascii") for p in payloads]
+
+    rows = [
+        summarize("parse", time_each(first_leg, encoded)),
+        summarize("parse_full", time_each(lambda p: parse(p).to_dict(), encoded)),
+        summarize("domain", time_each(lambda p: BoardingPass.from_bcbp(parse(p)), encoded)),
+    ]
+    start = time.perf_counter()
+    parse_many(encoded)
+    elapsed = time.perf_counter() - start
+    rows.append(summarize("parse_many", np.array([elapsed / len(encoded) * 1e6]),
+                          passes_per_s=len(encoded) / elapsed))
+
+    if args.images and zxingcpp is None:
+        print("[bcbp] zxing-cpp not installed; skipping barcode decoding")
+    elif args.images:
+        sample = payloads[: args.images]
+        for symbology in ("PDF417", "QRCode", "Aztec"):
+            images = barcode_images(sample, getattr(zxingcpp.BarcodeFormat, symbology), args.scale)
+            results = []
+            latencies = time_each(lambda image: results.append(scan_boarding_pass(image)), images)
+            found = sum(r["found"] for r in results)
+            start = time.perf_counter()
+            scan_boarding_passes(images)
+            elapsed = time.perf_counter() - start
+            rows.append(summarize(f"decode_{symbology.lower()}", latencies, found=found,
+                                  batch_per_s=len(images) / elapsed))
+
+    if args.json:
+        environment = {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "zxing_cpp": getattr(zxingcpp, "__version__", None) if zxingcpp else None,
+            "cpus": os.cpu_count(),
+            "machine": platform.machine(),
+        }
+        with open(args.json, "w") as f:
+            json.dump({"params": vars(args), "environment": environment, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+from datetime import date
+
+import pytest
+
+from app.infrastructure.iata_parser import BCBPError, display_name, parse, parse_many, resolve_julian
+
+HEADER = "M1DESMARAIS/LUC       E"
+LEG = "ABC123 YULFRAAC 0834 326J001A0025 1"
+SIMPLE = HEADER + LEG + "00"
+
+
+def variable(*parts):
+    body = "".join(parts)
+    return f"{len(body):02X}{body}"
+
+
+def test_mandatory_fields():
+    bp = parse(SIMPLE)
+
+    (leg,) = bp.legs
+    assert bp.header["passenger_name"] == "DESMARAIS/LUC"
+    assert bp.passenger_name == "LUC DESMARAIS"
+    assert (leg["from_airport"], leg["to_airport"]) == ("YUL", "FRA")
+    assert leg.flight == "AC 834"
+    assert leg.seat == "1A"
+    assert leg.conditional is None and leg.airline_use is None
+    assert bp.version is None and bp.security is None
+
+
+def test_bytes_and_str_parse_the_same():
+    assert parse(SIMPLE.encode()).to_dict() == parse(SIMPLE).to_dict()
+
+
+def test_conditional_blocks_airline_use_and_security():
+    unique = "1" + "W" + "K" + "6225" + "B" + "AC "
+    repeated = "014" + "1234567890" + "0" + "0" + "AC " + "AC " + "1234567890123   "
+    bcbp = (HEADER[:1] + "2" + HEADER[2:]
+            + LEG + variable(">5", variable(unique), variable(repeated), "FREE")
+            + "DEF456 FRAGVALH 3664A327C012C0002 1" + variable(variable("014")))
+    bcbp += "^1" + variable("SIGNATURE")
+
+    bp = parse(bcbp)
+
+    first, second = bp.legs
+    assert bp.version == "5"
+    assert bp.conditional["issuer"] == "AC"
+    assert "baggage_tag" not in bp.conditional  # block stops after the issuer
+    assert first.conditional["frequent_flyer_number"] == "1234567890123"
+    assert str(first.airline_use, "ascii") == "FREE"
+    assert second.flight == "LH 3664A"
+    assert second.conditional["airline_numeric_code"] == "014"
+    assert second.conditional["serial_number"] is None
+    assert (bp.security_type, str(bp.security, "ascii")) == ("1", "SIGNATURE")
+
+
+@pytest.mark.parametrize("payload", ["", "not a boarding pass", "M0" + SIMPLE[2:], SIMPLE[:-2] + "ZZ"])
+def test_invalid_input_raises(payload):
+    with pytest.raises(BCBPError):
+        parse(payload)
+
+
+def test_truncated_second_leg_raises():
+    with pytest.raises(BCBPError, match="Truncated leg 2"):
+        parse(HEADER[:1] + "2" + HEADER[2:] + LEG + "00")
+
+
+def test_parse_many_returns_errors_in_place():
+    results = parse_many([SIMPLE, "junk"])
+
+    assert results[0].legs[0]["pnr"] == "ABC123"
+    assert isinstance(results[1], BCBPError)
+
+
+def test_display_name_drops_titles():
+    assert display_name("SHARMA/RAHUL KUMAR MR") == "RAHUL KUMAR SHARMA"
+    assert display_name("SHARMA/") == "SHARMA"
+    assert display_name("") is None
+
+
+def test_julian_date_resolves_nearest_year():
+    assert resolve_julian("326", date(2026, 11, 1)) == date(2026, 11, 22)
+    assert resolve_julian("005", date(2026, 12, 30)) == date(2027, 1, 5)
+    assert resolve_julian("360", date(2027, 1, 3)) == date(2026, 12, 26)
+    assert resolve_julian("366", date(2025, 6, 1)) == date(2024, 12, 31)
+    assert resolve_julian("000") is None
+    assert resolve_julian("   ") is None
@@ -10,6 +10,8 @@ import { createClient } from "https://esm.sh/@supabase/supabase-js@2.38.4";
 //  Universal Boarding Pass Parser — works with ANY airport worldwide
 //
 //  Architecture (v6):
+//   FAST:     Image → verification-service barcode decode → BCBP fields
+//            Only when VERIFICATION_SERVICE_URL is set; no AI call.
 //   PRIMARY:  Raw image/PDF → Gemini Vision (multimodal) → JSON
 //            Single API call, no intermediate OCR needed.
 //   FALLBACK: Vision API OCR → regex parser
@@ -1604,6 +1606,60 @@ function parseBoardingPassText(rawText: string): ParsedBoardingPass {
   return result;
 }
 
+// ═══════════════════════════════════════════════════════════════════
+//  Barcode fast path — verification-service (BCBP)
+//
+//  Every IATA boarding pass carries its data in a PDF417/QR/Aztec
+//  barcode. The verification service decodes it and slices the fixed-
+//  width BCBP fields: exact, a few ms, no AI call. Returns null when
+//  the service is not configured or the scan has no BCBP barcode.
+// ═══════════════════════════════════════════════════════════════════
+
+async function parseWithBarcodeService(
+  base64Content: string
+): Promise<{ parsed: ParsedBoardingPass; rawText: string } | null> {
+  const serviceUrl = Deno.env.get("VERIFICATION_SERVICE_URL");
+  if (!serviceUrl) return null;
+
+  try {
+    const res = await fetch(`${serviceUrl.replace(/\/$/, "")}/boarding-pass/scan`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ image_base64: base64Content }),
+      signal: AbortSignal.timeout(5000),
+    });
+    if (!res.ok) {
+      console.error("[barcode] Service error:", res.status);
+      return null;
+    }
+
+    const data = await res.json();
+    if (!data.found) {
+      console.log("[barcode] No BCBP barcode:", data.reason);
+      return null;
+    }
+
+    const { legs: _legs, ...parsed } = data.boarding_pass;
+    const result = parsed as ParsedBoardingPass;
+    // The barcode carries codes only; resolve names like the other paths
+    if (result.airline) {
+      result.airline = AIRLINE_LOOKUP[result.airline] || result.airline;
+    }
+    if (result.departure_airport_code) {
+      result.departure_airport_name = AIRPORT_LOOKUP[result.departure_airport_code] || `Airport ${result.departure_airport_code}`;
+    }
+    if (result.arrival_airport_code) {
+      result.arrival_airport_name = AIRPORT_LOOKUP[result.arrival_airport_code] || `Airport ${result.arrival_airport_code}`;
+    }
+
+    console.log(`[barcode] ✓ ${data.barcode_format}: DEP=${result.departure_airport_code}, ARR=${result.arrival_airport_code}, Flight=${result.flight_number}`);
+    return { parsed: result, rawText: data.raw_data };
+  } catch (err: any) {
+    console.error("[barcode] Error:", err.message);
+    return null;
+  }
+}
+
 // ═══════════════════════════════════════════════════════════════════
 //  Gemini Vision — Direct multimodal parsing (PRIMARY)
 //
@@ -1811,16 +1867,23 @@ async function handleScan(req: Request): Promise<Response> {
   }
 
   try {
-    // ===== PRIMARY: Send raw image/PDF directly to Gemini Vision =====
-    // Single API call — Gemini reads the document visually, no OCR needed
-    console.log("[scan] Sending", isPdf ? "PDF" : "image", "directly to Gemini Vision...");
-    const geminiResult = await parseWithGeminiVision(content, isPdf);
-
     let parsed: ParsedBoardingPass;
     let rawText = "";
     let confidence = 0.9;
 
-    if (geminiResult && (geminiResult.parsed.departure_airport_code || geminiResult.parsed.arrival_airport_code)) {
+    // ===== FAST PATH: decode the BCBP barcode (images only) =====
+    const barcodeResult = isPdf ? null : await parseWithBarcodeService(content);
+
+    // ===== PRIMARY: Send raw image/PDF directly to Gemini Vision =====
+    // Single API call — Gemini reads the document visually, no OCR needed
+    const geminiResult = barcodeResult ? null : await parseWithGeminiVision(content, isPdf);
+
+    if (barcodeResult) {
+      parsed = barcodeResult.parsed;
+      rawText = barcodeResult.rawText;
+      confidence = 1.0;
+      console.log("[scan] ✓ Boarding pass read from its barcode");
+    } else if (geminiResult && (geminiResult.parsed.departure_airport_code || geminiResult.parsed.arrival_airport_code)) {
       parsed = geminiResult.parsed;
       rawText = geminiResult.rawText;
       console.log("[scan] ✓ Gemini Vision successfully parsed boarding pass");
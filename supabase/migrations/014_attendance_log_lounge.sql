@@ -0,0 +1,20 @@
+-- ═══════════════════════════════════════════════════════════════════
+-- 014: Record which lounge each attendance_log session belongs to
+-- The face-service presence engine writes lounge check-ins here and
+-- rebuilds per-lounge occupancy from the open sessions at startup
+-- ═══════════════════════════════════════════════════════════════════
+
+-- Add lounge_id column (nullable — sessions logged before 014 have none)
+DO $$ BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'attendance_log' AND column_name = 'lounge_id'
+    ) THEN
+        ALTER TABLE attendance_log ADD COLUMN lounge_id UUID;
+    END IF;
+END $$;
+
+-- Open sessions per lounge (presence rebuild, occupancy reports)
+CREATE INDEX IF NOT EXISTS idx_attendance_lounge_open
+    ON attendance_log(lounge_id, checkin_time DESC)
+    WHERE checkout_time IS NULL;
@@ -0,0 +1,21 @@
+-- ═══════════════════════════════════════════════════════════════════
+-- 015: Multi-image enrolment templates on face_embeddings
+-- `embedding` keeps the fused (mean, renormalized) template so every
+-- existing reader and the ivfflat index keep working; `templates` holds
+-- up to a few sub-templates as packed float32 for max/mean scoring
+-- ═══════════════════════════════════════════════════════════════════
+
+DO $$ BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'face_embeddings' AND column_name = 'templates'
+    ) THEN
+        ALTER TABLE face_embeddings ADD COLUMN templates BYTEA;
+    END IF;
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'face_embeddings' AND column_name = 'template_count'
+    ) THEN
+        ALTER TABLE face_embeddings ADD COLUMN template_count SMALLINT NOT NULL DEFAULT 1;
+    END IF;
+END $$;
@@ -0,0 +1,109 @@
+-- ═══════════════════════════════════════════════════════════════════
+-- 016: Re-embedding between face models (e.g. Facenet 128-D → ArcFace 512-D)
+--
+--   • face_enrolment_crops  — aligned enrolment crops (JPEG), the source the
+--                             re-embedding job streams through the new model
+--   • face_embeddings_next  — same shape as face_embeddings but without a
+--                             fixed dimension; filled by the job while the
+--                             service keeps reading face_embeddings
+--   • face_reembed_jobs     — one checkpoint row per job; the service
+--                             switches its reads to face_embeddings_next
+--                             once the job's status is 'complete'
+--   • attendance_log        — drops its foreign key to face_embeddings, which
+--                             users enrolled after a cutover are never in
+-- ═══════════════════════════════════════════════════════════════════
+
+
+-- ── 1. Enrolment crops ────────────────────────────────────────────
+CREATE TABLE IF NOT EXISTS face_enrolment_crops (
+    user_id     VARCHAR(100) NOT NULL,
+    seq         SMALLINT     NOT NULL,
+    crop        BYTEA        NOT NULL,
+    lounge_id   UUID,
+    created_at  TIMESTAMP    DEFAULT NOW(),
+    PRIMARY KEY (user_id, seq)
+);
+
+-- Catch-up pass: crops written after the job's watermark
+CREATE INDEX IF NOT EXISTS idx_face_enrolment_crops_created
+    ON face_enrolment_crops(created_at);
+
+
+-- ── 2. Target-model embeddings ────────────────────────────────────
+CREATE TABLE IF NOT EXISTS face_embeddings_next (
+    user_id         VARCHAR(100) PRIMARY KEY,
+    embedding       vector       NOT NULL,
+    templates       BYTEA,
+    template_count  SMALLINT     NOT NULL DEFAULT 1,
+    lounge_id       UUID,
+    model_name      VARCHAR(50)  NOT NULL,
+    created_at      TIMESTAMP    DEFAULT NOW(),
+    updated_at      TIMESTAMP    DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_face_embeddings_next_lounge
+    ON face_embeddings_next(lounge_id);
+
+CREATE INDEX IF NOT EXISTS idx_face_embeddings_next_updated
+    ON face_embeddings_next(updated_at);
+
+-- GallerySync polls updated_at, same trigger function as migration 011
+DROP TRIGGER IF EXISTS tr_face_embeddings_next_update_timestamp ON face_embeddings_next;
+CREATE TRIGGER tr_face_embeddings_next_update_timestamp
+    BEFORE UPDATE ON face_embeddings_next FOR EACH ROW
+    EXECUTE FUNCTION update_face_embeddings_timestamp();
+
+
+-- ── 3. Job checkpoints ────────────────────────────────────────────
+CREATE TABLE IF NOT EXISTS face_reembed_jobs (
+    name          TEXT         PRIMARY KEY,
+    source_model  VARCHAR(50)  NOT NULL,
+    target_model  VARCHAR(50)  NOT NULL,
+    status        VARCHAR(20)  NOT NULL DEFAULT 'running'
+                  CHECK (status IN ('running', 'complete')),
+    last_user_id  VARCHAR(100),            -- keyset cursor of the main pass
+    watermark     TIMESTAMP,               -- newest crop created_at embedded
+    processed     BIGINT       NOT NULL DEFAULT 0,
+    failed        BIGINT       NOT NULL DEFAULT 0,
+    started_at    TIMESTAMP    DEFAULT NOW(),
+    updated_at    TIMESTAMP    DEFAULT NOW(),
+    completed_at  TIMESTAMP
+);
+
+
+-- ── 4. Attendance after cutover ───────────────────────────────────
+-- After a cutover, enrolments land only in face_embeddings_next, so the
+-- migration 011 foreign key would reject every check-in of a newly
+-- enrolled user. Attendance is a visit history keyed by the auth user id,
+-- not by whichever table holds the current template; it also no longer
+-- disappears when a template row is deleted or re-created.
+ALTER TABLE attendance_log DROP CONSTRAINT IF EXISTS fk_attendance_user;
+
+
+-- ── 5. Row-Level Security ─────────────────────────────────────────
+ALTER TABLE face_enrolment_crops ENABLE ROW LEVEL SECURITY;
+ALTER TABLE face_embeddings_next ENABLE ROW LEVEL SECURITY;
+ALTER TABLE face_reembed_jobs    ENABLE ROW LEVEL SECURITY;
+
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_policies WHERE policyname = 'Service role manages enrolment crops') THEN
+        CREATE POLICY "Service role manages enrolment crops"
+            ON face_enrolment_crops FOR ALL TO service_role
+            USING (true) WITH CHECK (true);
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_policies WHERE policyname = 'Service role manages next face embeddings') THEN
+        CREATE POLICY "Service role manages next face embeddings"
+            ON face_embeddings_next FOR ALL TO service_role
+            USING (true) WITH CHECK (true);
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_policies WHERE policyname = 'Service role manages reembed jobs') THEN
+        CREATE POLICY "Service role manages reembed jobs"
+            ON face_reembed_jobs FOR ALL TO service_role
+            USING (true) WITH CHECK (true);
+    END IF;
+END $$;
+
+
+-- ═══════════════════════════════════════════════════════════════════
+-- End of migration 016
+-- ═══════════════════════════════════════════════════════════════════
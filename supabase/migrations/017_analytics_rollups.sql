@@ -0,0 +1,431 @@
+-- ═══════════════════════════════════════════════════════════════════
+-- 017: Pre-aggregated attendance and revenue rollups
+--
+--   • lounge_rollups_hourly / _daily / _totals — per-lounge buckets:
+--       visits, dwell-time histogram, revenue, transactions and a
+--       HyperLogLog sketch of the members seen (BYTEA, merged by the
+--       crm-service; see app/domain/analytics.py)
+--   • lounge_rollup_cursors — how far the crm-service rollup engine has
+--       folded each event stream, as (timestamp, id)
+--   • triggers that correct already-folded buckets when a folded
+--       attendance session or transaction is edited or deleted, and
+--       that count an event inserted behind the engine's cursor
+--   • get_lounge_stats reads revenue from the buckets plus the not yet
+--       folded tail, so it stays exact whether or not the engine runs
+--   • get_attendance_summary uses a sargable range predicate
+--
+-- Buckets are UTC, like CURRENT_DATE on the database. Dwell time is
+-- attributed to the hour the session started.
+-- ═══════════════════════════════════════════════════════════════════
+
+
+-- ── 1. Buckets ────────────────────────────────────────────────────
+CREATE TABLE IF NOT EXISTS lounge_rollups_hourly (
+    lounge_id      UUID          NOT NULL,
+    bucket_start   TIMESTAMP     NOT NULL,
+    visits         INTEGER       NOT NULL DEFAULT 0,
+    dwell_count    INTEGER       NOT NULL DEFAULT 0,
+    dwell_seconds  BIGINT        NOT NULL DEFAULT 0,
+    dwell_lt15     INTEGER       NOT NULL DEFAULT 0,   -- minutes
+    dwell_lt30     INTEGER       NOT NULL DEFAULT 0,
+    dwell_lt60     INTEGER       NOT NULL DEFAULT 0,
+    dwell_lt120    INTEGER       NOT NULL DEFAULT 0,
+    dwell_lt240    INTEGER       NOT NULL DEFAULT 0,
+    dwell_ge240    INTEGER       NOT NULL DEFAULT 0,
+    revenue        NUMERIC(14,2) NOT NULL DEFAULT 0,
+    transactions   INTEGER       NOT NULL DEFAULT 0,
+    members        BYTEA,
+    updated_at     TIMESTAMPTZ   DEFAULT NOW(),
+    PRIMARY KEY (lounge_id, bucket_start)
+);
+
+CREATE TABLE IF NOT EXISTS lounge_rollups_daily (
+    lounge_id      UUID          NOT NULL,
+    day            DATE          NOT NULL,
+    visits         INTEGER       NOT NULL DEFAULT 0,
+    dwell_count    INTEGER       NOT NULL DEFAULT 0,
+    dwell_seconds  BIGINT        NOT NULL DEFAULT 0,
+    dwell_lt15     INTEGER       NOT NULL DEFAULT 0,
+    dwell_lt30     INTEGER       NOT NULL DEFAULT 0,
+    dwell_lt60     INTEGER       NOT NULL DEFAULT 0,
+    dwell_lt120    INTEGER       NOT NULL DEFAULT 0,
+    dwell_lt240    INTEGER       NOT NULL DEFAULT 0,
+    dwell_ge240    INTEGER       NOT NULL DEFAULT 0,
+    revenue        NUMERIC(14,2) NOT NULL DEFAULT 0,
+    transactions   INTEGER       NOT NULL DEFAULT 0,
+    members        BYTEA,
+    updated_at     TIMESTAMPTZ   DEFAULT NOW(),
+    PRIMARY KEY (lounge_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS lounge_rollup_totals (
+    lounge_id      UUID          PRIMARY KEY,
+    visits         BIGINT        NOT NULL DEFAULT 0,
+    dwell_count    BIGINT        NOT NULL DEFAULT 0,
+    dwell_seconds  BIGINT        NOT NULL DEFAULT 0,
+    dwell_lt15     BIGINT        NOT NULL DEFAULT 0,
+    dwell_lt30     BIGINT        NOT NULL DEFAULT 0,
+    dwell_lt60     BIGINT        NOT NULL DEFAULT 0,
+    dwell_lt120    BIGINT        NOT NULL DEFAULT 0,
+    dwell_lt240    BIGINT        NOT NULL DEFAULT 0,
+    dwell_ge240    BIGINT        NOT NULL DEFAULT 0,
+    revenue        NUMERIC(16,2) NOT NULL DEFAULT 0,
+    transactions   BIGINT        NOT NULL DEFAULT 0,
+    members        BYTEA,
+    updated_at     TIMESTAMPTZ   DEFAULT NOW()
+);
+
+
+-- ── 2. Stream cursors ─────────────────────────────────────────────
+--   attendance_checkin   (checkin_time, id)   → visits, members
+--   attendance_checkout  (checkout_time, id)  → dwell
+--   transactions         (created_at, id)     → revenue
+CREATE TABLE IF NOT EXISTS lounge_rollup_cursors (
+    stream      TEXT         PRIMARY KEY,
+    last_ts     TIMESTAMPTZ  NOT NULL DEFAULT '-infinity',
+    last_id     TEXT         NOT NULL DEFAULT '',
+    updated_at  TIMESTAMPTZ  DEFAULT NOW()
+);
+
+INSERT INTO lounge_rollup_cursors (stream) VALUES
+    ('attendance_checkin'), ('attendance_checkout'), ('transactions')
+ON CONFLICT (stream) DO NOTHING;
+
+-- Keyset scans behind each cursor
+CREATE INDEX IF NOT EXISTS idx_attendance_checkin_id
+    ON attendance_log(checkin_time, id);
+
+CREATE INDEX IF NOT EXISTS idx_attendance_checkout_id
+    ON attendance_log(checkout_time, id)
+    WHERE checkout_time IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_lt_created_id
+    ON lounge_transactions(created_at, id);
+
+
+-- ── 3. Applying deltas from SQL ───────────────────────────────────
+-- Same dwell bins as DWELL_BINS in crm-service app/domain/analytics.py
+CREATE OR REPLACE FUNCTION rollup_dwell_bin(p_seconds DOUBLE PRECISION)
+RETURNS INTEGER AS $$
+    SELECT CASE
+        WHEN p_seconds < 15 * 60  THEN 0
+        WHEN p_seconds < 30 * 60  THEN 1
+        WHEN p_seconds < 60 * 60  THEN 2
+        WHEN p_seconds < 120 * 60 THEN 3
+        WHEN p_seconds < 240 * 60 THEN 4
+        ELSE 5
+    END;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Add (or with negative values, remove) one contribution to the hour,
+-- day and all-time buckets of p_lounge_id at p_at (UTC)
+CREATE OR REPLACE FUNCTION rollup_apply(
+    p_lounge_id     UUID,
+    p_at            TIMESTAMP,
+    p_visits        INTEGER DEFAULT 0,
+    p_dwell_seconds DOUBLE PRECISION DEFAULT NULL,
+    p_dwell_sign    INTEGER DEFAULT 0,
+    p_revenue       NUMERIC DEFAULT 0,
+    p_transactions  INTEGER DEFAULT 0
+)
+RETURNS VOID AS $$
+DECLARE
+    b  INTEGER := CASE WHEN p_dwell_seconds IS NULL THEN -1 ELSE rollup_dwell_bin(p_dwell_seconds) END;
+    ds BIGINT  := COALESCE(round(p_dwell_seconds), 0)::BIGINT * p_dwell_sign;
+BEGIN
+    IF p_lounge_id IS NULL THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO lounge_rollups_hourly AS r (
+        lounge_id, bucket_start, visits, dwell_count, dwell_seconds,
+        dwell_lt15, dwell_lt30, dwell_lt60, dwell_lt120, dwell_lt240, dwell_ge240,
+        revenue, transactions
+    ) VALUES (
+        p_lounge_id, date_trunc('hour', p_at), p_visits, p_dwell_sign, ds,
+        (b = 0)::INT * p_dwell_sign, (b = 1)::INT * p_dwell_sign, (b = 2)::INT * p_dwell_sign,
+        (b = 3)::INT * p_dwell_sign, (b = 4)::INT * p_dwell_sign, (b = 5)::INT * p_dwell_sign,
+        p_revenue, p_transactions
+    )
+    ON CONFLICT (lounge_id, bucket_start) DO UPDATE SET
+        visits = r.visits + EXCLUDED.visits,
+        dwell_count = r.dwell_count + EXCLUDED.dwell_count,
+        dwell_seconds = r.dwell_seconds + EXCLUDED.dwell_seconds,
+        dwell_lt15 = r.dwell_lt15 + EXCLUDED.dwell_lt15,
+        dwell_lt30 = r.dwell_lt30 + EXCLUDED.dwell_lt30,
+        dwell_lt60 = r.dwell_lt60 + EXCLUDED.dwell_lt60,
+        dwell_lt120 = r.dwell_lt120 + EXCLUDED.dwell_lt120,
+        dwell_lt240 = r.dwell_lt240 + EXCLUDED.dwell_lt240,
+        dwell_ge240 = r.dwell_ge240 + EXCLUDED.dwell_ge240,
+        revenue = r.revenue + EXCLUDED.revenue,
+        transactions = r.transactions + EXCLUDED.transactions,
+        updated_at = NOW();
+
+    INSERT INTO lounge_rollups_daily AS r (
+        lounge_id, day, visits, dwell_count, dwell_seconds,
+        dwell_lt15, dwell_lt30, dwell_lt60, dwell_lt120, dwell_lt240, dwell_ge240,
+        revenue, transactions
+    ) VALUES (
+        p_lounge_id, p_at::DATE, p_visits, p_dwell_sign, ds,
+        (b = 0)::INT * p_dwell_sign, (b = 1)::INT * p_dwell_sign, (b = 2)::INT * p_dwell_sign,
+        (b = 3)::INT * p_dwell_sign, (b = 4)::INT * p_dwell_sign, (b = 5)::INT * p_dwell_sign,
+        p_revenue, p_transactions
+    )
+    ON CONFLICT (lounge_id, day) DO UPDATE SET
+        visits = r.visits + EXCLUDED.visits,
+        dwell_count = r.dwell_count + EXCLUDED.dwell_count,
+        dwell_seconds = r.dwell_seconds + EXCLUDED.dwell_seconds,
+        dwell_lt15 = r.dwell_lt15 + EXCLUDED.dwell_lt15,
+        dwell_lt30 = r.dwell_lt30 + EXCLUDED.dwell_lt30,
+        dwell_lt60 = r.dwell_lt60 + EXCLUDED.dwell_lt60,
+        dwell_lt120 = r.dwell_lt120 + EXCLUDED.dwell_lt120,
+        dwell_lt240 = r.dwell_lt240 + EXCLUDED.dwell_lt240,
+        dwell_ge240 = r.dwell_ge240 + EXCLUDED.dwell_ge240,
+        revenue = r.revenue + EXCLUDED.revenue,
+        transactions = r.transactions + EXCLUDED.transactions,
+        updated_at = NOW();
+
+    INSERT INTO lounge_rollup_totals AS r (
+        lounge_id, visits, dwell_count, dwell_seconds,
+        dwell_lt15, dwell_lt30, dwell_lt60, dwell_lt120, dwell_lt240, dwell_ge240,
+        revenue, transactions
+    ) VALUES (
+        p_lounge_id, p_visits, p_dwell_sign, ds,
+        (b = 0)::INT * p_dwell_sign, (b = 1)::INT * p_dwell_sign, (b = 2)::INT * p_dwell_sign,
+        (b = 3)::INT * p_dwell_sign, (b = 4)::INT * p_dwell_sign, (b = 5)::INT * p_dwell_sign,
+        p_revenue, p_transactions
+    )
+    ON CONFLICT (lounge_id) DO UPDATE SET
+        visits = r.visits + EXCLUDED.visits,
+        dwell_count = r.dwell_count + EXCLUDED.dwell_count,
+        dwell_seconds = r.dwell_seconds + EXCLUDED.dwell_seconds,
+        dwell_lt15 = r.dwell_lt15 + EXCLUDED.dwell_lt15,
+        dwell_lt30 = r.dwell_lt30 + EXCLUDED.dwell_lt30,
+        dwell_lt60 = r.dwell_lt60 + EXCLUDED.dwell_lt60,
+        dwell_lt120 = r.dwell_lt120 + EXCLUDED.dwell_lt120,
+        dwell_lt240 = r.dwell_lt240 + EXCLUDED.dwell_lt240,
+        dwell_ge240 = r.dwell_ge240 + EXCLUDED.dwell_ge240,
+        revenue = r.revenue + EXCLUDED.revenue,
+        transactions = r.transactions + EXCLUDED.transactions,
+        updated_at = NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+-- Has the engine folded the event at (p_ts, p_id) of p_stream? FOR SHARE
+-- waits out an engine transaction that is folding it right now.
+CREATE OR REPLACE FUNCTION rollup_folded(p_stream TEXT, p_ts TIMESTAMPTZ, p_id TEXT, p_numeric_id BOOLEAN)
+RETURNS BOOLEAN AS $$
+DECLARE
+    c lounge_rollup_cursors%ROWTYPE;
+BEGIN
+    IF p_ts IS NULL THEN
+        RETURN FALSE;
+    END IF;
+    SELECT * INTO c FROM lounge_rollup_cursors WHERE stream = p_stream FOR SHARE;
+    IF NOT FOUND OR p_ts > c.last_ts THEN
+        RETURN FALSE;
+    END IF;
+    IF p_ts < c.last_ts THEN
+        RETURN TRUE;
+    END IF;
+    IF p_numeric_id THEN
+        RETURN c.last_id <> '' AND p_id::BIGINT <= c.last_id::BIGINT;
+    END IF;
+    RETURN p_id <= c.last_id;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- ── 4. Corrections for late, edited and deleted events ────────────
+-- Unique-member sketches cannot un-see a member; only counters move.
+-- An insert stamped behind a cursor (a late commit, a backfill) is one
+-- the engine will never read, so the trigger counts it. rollup_folded's
+-- FOR SHARE lock is held until the inserting transaction commits, so an
+-- engine run cannot move the cursor past a row it cannot yet see.
+CREATE OR REPLACE FUNCTION rollup_attendance_change()
+RETURNS TRIGGER AS $$
+DECLARE
+    visit_changed BOOLEAN := TRUE;
+BEGIN
+    -- A plain check-out only sets checkout_time; leave the visit alone then
+    IF TG_OP = 'UPDATE' THEN
+        visit_changed := OLD.checkin_time IS DISTINCT FROM NEW.checkin_time
+            OR OLD.lounge_id IS DISTINCT FROM NEW.lounge_id;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        IF visit_changed AND rollup_folded('attendance_checkin', OLD.checkin_time, OLD.id::TEXT, TRUE) THEN
+            PERFORM rollup_apply(OLD.lounge_id, OLD.checkin_time, p_visits => -1);
+        END IF;
+        IF rollup_folded('attendance_checkout', OLD.checkout_time, OLD.id::TEXT, TRUE) THEN
+            PERFORM rollup_apply(OLD.lounge_id, OLD.checkin_time,
+                p_dwell_seconds => EXTRACT(EPOCH FROM OLD.checkout_time - OLD.checkin_time), p_dwell_sign => -1);
+        END IF;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        -- Re-add what the engine will not see again (behind its cursor)
+        IF visit_changed AND rollup_folded('attendance_checkin', NEW.checkin_time, NEW.id::TEXT, TRUE) THEN
+            PERFORM rollup_apply(NEW.lounge_id, NEW.checkin_time, p_visits => 1);
+        END IF;
+        IF rollup_folded('attendance_checkout', NEW.checkout_time, NEW.id::TEXT, TRUE) THEN
+            PERFORM rollup_apply(NEW.lounge_id, NEW.checkin_time,
+                p_dwell_seconds => EXTRACT(EPOCH FROM NEW.checkout_time - NEW.checkin_time), p_dwell_sign => 1);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS tr_attendance_rollup ON attendance_log;
+CREATE TRIGGER tr_attendance_rollup
+    AFTER INSERT OR UPDATE OF checkin_time, checkout_time, lounge_id OR DELETE ON attendance_log
+    FOR EACH ROW EXECUTE FUNCTION rollup_attendance_change();
+
+CREATE OR REPLACE FUNCTION rollup_transaction_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        IF OLD.status = 'completed'
+           AND rollup_folded('transactions', OLD.created_at, OLD.id::TEXT, FALSE) THEN
+            PERFORM rollup_apply(OLD.lounge_id, (OLD.transaction_date AT TIME ZONE 'UTC'),
+                p_revenue => -OLD.amount, p_transactions => -1);
+        END IF;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        IF NEW.status = 'completed'
+           AND rollup_folded('transactions', NEW.created_at, NEW.id::TEXT, FALSE) THEN
+            PERFORM rollup_apply(NEW.lounge_id, (NEW.transaction_date AT TIME ZONE 'UTC'),
+                p_revenue => NEW.amount, p_transactions => 1);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS tr_transactions_rollup ON lounge_transactions;
+CREATE TRIGGER tr_transactions_rollup
+    AFTER INSERT OR UPDATE OF amount, status, lounge_id, transaction_date, created_at OR DELETE
+    ON lounge_transactions
+    FOR EACH ROW EXECUTE FUNCTION rollup_transaction_change();
+
+
+-- ── 5. get_lounge_stats from the buckets ──────────────────────────
+-- Revenue = folded buckets + the transactions past the engine's cursor
+-- (all of them if the engine has never run), so the result matches the
+-- raw-table version in 009 at a cost independent of history length.
+CREATE OR REPLACE FUNCTION get_lounge_stats(p_lounge_id UUID)
+RETURNS JSON AS $$
+DECLARE
+  result JSON;
+  c      lounge_rollup_cursors%ROWTYPE;
+BEGIN
+  SELECT * INTO c FROM lounge_rollup_cursors WHERE stream = 'transactions';
+
+  WITH tail AS (
+    SELECT amount, transaction_date FROM lounge_transactions
+    WHERE lounge_id = p_lounge_id
+      AND status = 'completed'
+      AND (c.last_ts IS NULL
+           OR created_at > c.last_ts
+           OR (created_at = c.last_ts AND id::TEXT > c.last_id))
+  )
+  SELECT json_build_object(
+    'total_revenue', COALESCE((
+      SELECT revenue FROM lounge_rollup_totals WHERE lounge_id = p_lounge_id
+    ), 0) + COALESCE((SELECT SUM(amount) FROM tail), 0),
+    'today_revenue', COALESCE((
+      SELECT SUM(revenue) FROM lounge_rollups_hourly
+      WHERE lounge_id = p_lounge_id AND bucket_start >= CURRENT_DATE
+    ), 0) + COALESCE((
+      SELECT SUM(amount) FROM tail WHERE transaction_date >= CURRENT_DATE
+    ), 0),
+    'month_revenue', COALESCE((
+      SELECT SUM(revenue) FROM lounge_rollups_daily
+      WHERE lounge_id = p_lounge_id AND day >= date_trunc('month', CURRENT_DATE)
+    ), 0) + COALESCE((
+      SELECT SUM(amount) FROM tail WHERE transaction_date >= date_trunc('month', CURRENT_DATE)
+    ), 0),
+    'total_members', (
+      SELECT COUNT(DISTINCT user_id) FROM lounge_memberships
+      WHERE lounge_id = p_lounge_id
+    ),
+    'active_members', (
+      SELECT COUNT(DISTINCT user_id) FROM lounge_memberships
+      WHERE lounge_id = p_lounge_id AND status = 'active'
+    ),
+    'pending_members', (
+      SELECT COUNT(DISTINCT user_id) FROM lounge_memberships
+      WHERE lounge_id = p_lounge_id AND status = 'pending'
+    ),
+    'total_transactions', COALESCE((
+      SELECT transactions FROM lounge_rollup_totals WHERE lounge_id = p_lounge_id
+    ), 0) + (SELECT COUNT(*) FROM tail)
+  ) INTO result;
+
+  RETURN result;
+END;
+$$ LANGUAGE plpgsql STABLE SECURITY DEFINER;
+
+
+-- ── 6. Sargable attendance summary ────────────────────────────────
+-- DATE(checkin_time) BETWEEN … could not use an index on checkin_time
+CREATE OR REPLACE FUNCTION get_attendance_summary(
+    p_start_date DATE DEFAULT CURRENT_DATE,
+    p_end_date   DATE DEFAULT CURRENT_DATE
+)
+RETURNS TABLE (
+    session_user_id  VARCHAR(100),
+    session_date     DATE,
+    total_checkins   BIGINT,
+    avg_duration_hrs NUMERIC
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        al.user_id            AS session_user_id,
+        DATE(al.checkin_time) AS session_date,
+        COUNT(*)              AS total_checkins,
+        ROUND(AVG(
+            EXTRACT(EPOCH FROM (COALESCE(al.checkout_time, NOW()) - al.checkin_time)) / 3600
+        )::numeric, 2)       AS avg_duration_hrs
+    FROM attendance_log al
+    WHERE al.checkin_time >= p_start_date
+      AND al.checkin_time <  p_end_date + 1
+    GROUP BY al.user_id, DATE(al.checkin_time)
+    ORDER BY session_date DESC, total_checkins DESC;
+END;
+$$ LANGUAGE plpgsql STABLE SECURITY DEFINER;
+
+
+-- ── 7. Row-Level Security ─────────────────────────────────────────
+ALTER TABLE lounge_rollups_hourly ENABLE ROW LEVEL SECURITY;
+ALTER TABLE lounge_rollups_daily  ENABLE ROW LEVEL SECURITY;
+ALTER TABLE lounge_rollup_totals  ENABLE ROW LEVEL SECURITY;
+ALTER TABLE lounge_rollup_cursors ENABLE ROW LEVEL SECURITY;
+
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_policies WHERE policyname = 'Owners read hourly rollups') THEN
+        CREATE POLICY "Owners read hourly rollups"
+            ON lounge_rollups_hourly FOR SELECT TO authenticated
+            USING (lounge_id IN (SELECT id FROM lounges WHERE owner_id = auth.uid()));
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_policies WHERE policyname = 'Owners read daily rollups') THEN
+        CREATE POLICY "Owners read daily rollups"
+            ON lounge_rollups_daily FOR SELECT TO authenticated
+            USING (lounge_id IN (SELECT id FROM lounges WHERE owner_id = auth.uid()));
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_policies WHERE policyname = 'Owners read rollup totals') THEN
+        CREATE POLICY "Owners read rollup totals"
+            ON lounge_rollup_totals FOR SELECT TO authenticated
+            USING (lounge_id IN (SELECT id FROM lounges WHERE owner_id = auth.uid()));
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_policies WHERE policyname = 'Service role manages rollup cursors') THEN
+        CREATE POLICY "Service role manages rollup cursors"
+            ON lounge_rollup_cursors FOR ALL TO service_role
+            USING (true) WITH CHECK (true);
+    END IF;
+END $$;
+
+
+-- ═══════════════════════════════════════════════════════════════════
+-- End of migration 017
+-- ═══════════════════════════════════════════════════════════════════
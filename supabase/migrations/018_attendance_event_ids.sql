@@ -0,0 +1,40 @@
+-- ═══════════════════════════════════════════════════════════════════
+-- 018: Client event ids on attendance sessions
+-- The face-service attendance recorder replays its spool after a crash;
+-- each check-in carries the id it was spooled with, so a replayed
+-- check-in is skipped (ON CONFLICT (event_id) DO NOTHING) instead of
+-- opening a second session. Rows written before 018 have no id.
+-- ═══════════════════════════════════════════════════════════════════
+
+DO $$ BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'attendance_log' AND column_name = 'event_id'
+    ) THEN
+        ALTER TABLE attendance_log ADD COLUMN event_id UUID;
+    END IF;
+END $$;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_attendance_log_event
+    ON attendance_log(event_id);
+
+-- The kiosk scripts' session table (lounge_face_attendance.py), when present
+DO $$ BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.tables WHERE table_name = 'lounge_attendance'
+    ) THEN
+        IF NOT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'lounge_attendance' AND column_name = 'event_id'
+        ) THEN
+            ALTER TABLE lounge_attendance ADD COLUMN event_id UUID;
+        END IF;
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_lounge_attendance_event
+            ON lounge_attendance(event_id);
+    END IF;
+END $$;
+
+
+-- ═══════════════════════════════════════════════════════════════════
+-- End of migration 018
+-- ═══════════════════════════════════════════════════════════════════